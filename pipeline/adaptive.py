@@ -0,0 +1,179 @@
+"""
+Adaptive detection stride.
+
+Players on a cricket field move little between consecutive frames, so the
+detector only needs to run on keyframes. In between, each track is moved
+along with the constant velocity measured between its last two keyframes.
+The stride shrinks as soon as motion picks up or players appear/disappear,
+and grows again during quiet periods.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+
+class AdaptiveStrideTracker:
+    """
+    Wraps a PlayerTracker (anything with track_frame()) and runs it every
+    `stride` frames, predicting tracks on the frames in between.
+    Output format is unchanged: [id, x1, y1, x2, y2, conf].
+    """
+
+    def __init__(self, tracker, min_stride: int = 1, max_stride: int = 5,
+                 low_motion: float = 0.01, high_motion: float = 0.04):
+        """
+        Args:
+            tracker: Wrapped tracker, called on keyframes
+            min_stride: Smallest stride (1 = detect every frame)
+            max_stride: Largest stride used in quiet periods
+            low_motion: Per-frame foot motion (in box heights) below which the
+                stride grows
+            high_motion: Per-frame foot motion above which the stride shrinks
+        """
+        self.tracker = tracker
+        self.min_stride = max(1, min_stride)
+        self.max_stride = max(self.min_stride, max_stride)
+        self.low_motion = low_motion
+        self.high_motion = high_motion
+
+        self.stride = self.min_stride
+        self.frames = 0
+        self.detector_calls = 0
+        self._since_keyframe = 0
+        self._force_keyframe = True
+        # id -> (box [x1, y1, x2, y2], conf, velocity [dx1, dy1, dx2, dy2] per frame)
+        self._tracks: Dict[int, tuple] = {}
+        self._frame_size = None
+
+    def force_keyframe(self) -> None:
+        """Run the detector on the next frame (e.g. after a scene cut)."""
+        self._force_keyframe = True
+        self.stride = self.min_stride
+
+    def reset(self) -> None:
+        """Forget all tracks (here and in the wrapped tracker); the next frame is a keyframe."""
+        self._tracks.clear()
+        if hasattr(self.tracker, "reset"):
+            self.tracker.reset()
+        self.force_keyframe()
+
+    def track_frame(self, frame) -> List[list]:
+        """Same contract as PlayerTracker.track_frame()."""
+        self.frames += 1
+        self._frame_size = frame.shape[1], frame.shape[0]
+        self._since_keyframe += 1
+
+        if self._force_keyframe or self._since_keyframe >= self.stride:
+            return self._keyframe(frame)
+        return self._predict()
+
+    def track_batch(self, frames, batch_size=None) -> List[List[list]]:
+        """
+        Same contract as PlayerTracker.track_batch(). The keyframes of the
+        batch are chosen with the stride at its start and detected in one
+        track_batch() call of the wrapped tracker; stride changes they cause
+        apply from the next batch.
+        """
+        frames = list(frames)
+        if len(frames) <= 1:
+            return [self.track_frame(frame) for frame in frames]
+
+        keyframes = []
+        since, force = self._since_keyframe, self._force_keyframe
+        for index in range(len(frames)):
+            since += 1
+            if force or since >= self.stride:
+                keyframes.append(index)
+                since, force = 0, False
+        keyframe_tracks = {}
+        if keyframes:
+            batch_tracks = self.tracker.track_batch([frames[i] for i in keyframes], batch_size)
+            keyframe_tracks = dict(zip(keyframes, batch_tracks))
+
+        results = []
+        for index, frame in enumerate(frames):
+            self.frames += 1
+            self._frame_size = frame.shape[1], frame.shape[0]
+            self._since_keyframe += 1
+            if index in keyframe_tracks:
+                results.append(self._update_keyframe(keyframe_tracks[index]))
+            else:
+                results.append(self._predict())
+        return results
+
+    def predict_frame(self, frame) -> List[list]:
+        """
+        Advance one frame without running the detector, whatever the stride
+        (used by the stream processor when a frame is over its latency budget).
+        """
+        self.frames += 1
+        self._frame_size = frame.shape[1], frame.shape[0]
+        self._since_keyframe += 1
+        return self._predict()
+
+    def skip_frame(self, frame) -> None:
+        """
+        Advance one frame on which nothing is tracked (e.g. a replay rejected
+        by the scene gate), so velocities are still measured over the frames
+        that really passed; a gap of at least a stride ends on a keyframe.
+        """
+        self.frames += 1
+        self._frame_size = frame.shape[1], frame.shape[0]
+        self._since_keyframe += 1
+
+    def _keyframe(self, frame) -> List[list]:
+        return self._update_keyframe(self.tracker.track_frame(frame))
+
+    def _update_keyframe(self, tracks) -> List[list]:
+        """Velocities and the next stride from the tracks of a keyframe."""
+        self.detector_calls += 1
+        elapsed = max(1, self._since_keyframe)
+        self._since_keyframe = 0
+        self._force_keyframe = False
+
+        previous = self._tracks
+        current = {}
+        motions = []
+        for track in tracks:
+            box = np.asarray(track[1:5], dtype=np.float64)
+            conf = float(track[5]) if len(track) > 5 else 1.0
+            velocity = np.zeros(4)
+            if track[0] in previous:
+                velocity = (box - previous[track[0]][0]) / elapsed
+                # Foot motion per frame, relative to the player's height
+                foot_dx = (velocity[0] + velocity[2]) / 2
+                motions.append(np.hypot(foot_dx, velocity[3]) / max(box[3] - box[1], 1.0))
+            current[track[0]] = (box, conf, velocity)
+
+        lost = len(previous.keys() - current.keys())
+        new = len(current.keys() - previous.keys())
+        self._tracks = current
+        self._adapt(motions, lost, new)
+        return tracks
+
+    def _adapt(self, motions, lost: int, new: int) -> None:
+        motion = float(np.median(motions)) if motions else 0.0
+        if lost or new or motion > self.high_motion:
+            self.stride = max(self.min_stride, self.stride // 2)
+        elif motion < self.low_motion:
+            self.stride = min(self.max_stride, self.stride + 1)
+
+    def _predict(self) -> List[list]:
+        width, height = self._frame_size
+        limits = np.array([width - 1, height - 1, width - 1, height - 1], dtype=np.float64)
+
+        predicted = []
+        for track_id, (box, conf, velocity) in self._tracks.items():
+            x1, y1, x2, y2 = np.clip(box + velocity * self._since_keyframe, 0, limits).astype(int)
+            if x2 > x1 and y2 > y1:
+                predicted.append([track_id, int(x1), int(y1), int(x2), int(y2), conf])
+        return predicted
+
+    def stats(self) -> Dict[str, float]:
+        """Frames seen, detector calls and the resulting saving."""
+        return {
+            "frames": self.frames,
+            "detector_calls": self.detector_calls,
+            "calls_per_frame": self.detector_calls / self.frames if self.frames else 0.0,
+            "stride": self.stride,
+        }
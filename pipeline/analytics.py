@@ -0,0 +1,300 @@
+"""
+Per-player movement analytics in real pitch metres.
+
+ViewTransformer maps the calibrated rectangle onto a 300x500 pixel area of
+the map (offset by 50 px); PitchGeometry converts map coordinates into
+metres of that rectangle and into heatmap cells.
+
+For every player, positions are smoothed with a trailing moving average
+over `window` samples. Distance is the path length of the smoothed
+positions, speed its per-sample rate of change, and a sprint is a run of at
+least `sprint_frames` samples at or above `sprint_speed`. A gap of more than
+`max_gap` frames (player lost) starts a new segment: no distance is counted
+across it and smoothing restarts.
+
+The same metrics are available in two forms:
+* analyze_history(): bulk, over a whole match's columnar history
+  (TrajectoryStore.history() or a trajectories .npz), with no Python loop
+  over points;
+* PlayerAnalytics: incremental, one vectorized update per frame.
+Both give the same numbers for the same input.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Calibrated rectangle on the map: x, y, width, height (see ViewTransformer)
+MAP_RECT = (50, 50, 300, 500)
+# Real size (width, length) in metres of the calibrated rectangle
+DEFAULT_FIELD_SIZE = (60.0, 100.0)
+
+METRIC_COLUMNS = ("id", "samples", "seconds", "distance_m", "mean_speed", "peak_speed", "sprints")
+
+
+class PitchGeometry:
+    """Map pixels -> pitch metres -> heatmap cells."""
+
+    def __init__(self, field_size: Tuple[float, float] = DEFAULT_FIELD_SIZE,
+                 map_rect: Tuple[int, int, int, int] = MAP_RECT, cell_size: float = 2.0):
+        """
+        Args:
+            field_size: (width, length) in metres of the calibrated rectangle
+            map_rect: (x, y, width, height) of that rectangle on the map
+            cell_size: Heatmap cell edge in metres
+        """
+        self.field_size = (float(field_size[0]), float(field_size[1]))
+        self.origin = np.array(map_rect[:2], dtype=np.float64)
+        self.scale = np.array([field_size[0] / map_rect[2], field_size[1] / map_rect[3]], dtype=np.float64)
+        self.cell_size = float(cell_size)
+        self.grid_shape = (int(np.ceil(self.field_size[1] / cell_size)),
+                           int(np.ceil(self.field_size[0] / cell_size)))
+
+    def to_metres(self, points) -> np.ndarray:
+        """(N, 2) map coordinates -> (N, 2) metres from the rectangle's top-left corner."""
+        return (np.asarray(points, dtype=np.float64).reshape(-1, 2) - self.origin) * self.scale
+
+    def cells(self, metres: np.ndarray) -> np.ndarray:
+        """Flat heatmap cell index of each point; -1 for points outside the rectangle."""
+        rows, cols = self.grid_shape
+        col = np.floor(metres[:, 0] / self.cell_size).astype(np.int64)
+        row = np.floor(metres[:, 1] / self.cell_size).astype(np.int64)
+        inside = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+        return np.where(inside, row * cols + col, -1)
+
+
+def _occupancy(cells: np.ndarray, slots: np.ndarray, num_slots: int, num_cells: int) -> np.ndarray:
+    """(num_slots, num_cells) sample counts with one bincount."""
+    valid = cells >= 0
+    flat = slots[valid] * num_cells + cells[valid]
+    return np.bincount(flat, minlength=num_slots * num_cells).reshape(num_slots, num_cells)
+
+
+def analyze_history(history: Dict[str, np.ndarray], fps: float,
+                    geometry: Optional[PitchGeometry] = None, window: int = 5, max_gap: int = 10,
+                    sprint_speed: float = 7.0, sprint_frames: int = 5) -> Dict[str, np.ndarray]:
+    """
+    Metrics of a whole match in one vectorized pass.
+
+    Args:
+        history: Columns "frame", "id", "x", "y" (map coordinates), any order
+        fps: Frame rate of the video
+        geometry: Map -> metres conversion (default PitchGeometry())
+        window: Samples in the trailing moving average of positions
+        max_gap: Missing frames after which a player's track is split
+        sprint_speed: Sprint threshold in m/s (7 m/s = 25 km/h)
+        sprint_frames: Consecutive fast samples that make a sprint
+
+    Returns:
+        Columns of METRIC_COLUMNS (one row per player, sorted by id) plus
+        "heatmaps": (players, rows, cols) seconds spent in each cell
+    """
+    geometry = geometry or PitchGeometry()
+    frames = np.asarray(history["frame"], dtype=np.int64)
+    ids = np.asarray(history["id"], dtype=np.int64)
+    order = np.lexsort((frames, ids))
+    frames, ids = frames[order], ids[order]
+    metres = geometry.to_metres(np.stack([history["x"], history["y"]], axis=1)[order])
+    n = len(frames)
+
+    player_ids, slots = np.unique(ids, return_inverse=True)
+    num_players = len(player_ids)
+    index = np.arange(n)
+
+    # Segment starts: a new player or a gap longer than max_gap
+    gaps = np.diff(frames, prepend=frames[:1])
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = (ids[1:] != ids[:-1]) | (gaps[1:] > max_gap)
+    segment_first = np.maximum.accumulate(np.where(starts, index, 0))
+
+    # Trailing moving average within each segment from one cumulative sum
+    cumulative = np.zeros((n + 1, 2))
+    np.cumsum(metres, axis=0, out=cumulative[1:])
+    first = np.maximum(segment_first, index - window + 1)
+    smoothed = (cumulative[index + 1] - cumulative[first]) / (index + 1 - first)[:, None]
+
+    step = np.zeros(n)
+    step[1:] = np.linalg.norm(np.diff(smoothed, axis=0), axis=1)
+    step[starts] = 0.0
+    dt = np.where(starts, 0.0, gaps / fps)
+    speed = np.divide(step, dt, out=np.zeros(n), where=dt > 0)
+
+    # Sprints: count a run of fast samples once it reaches sprint_frames
+    fast = (speed >= sprint_speed) & ~starts
+    last_slow = np.maximum.accumulate(np.where(fast, -1, index))
+    sprint_starts = fast & (index - last_slow == sprint_frames)
+
+    seconds = np.bincount(slots, weights=dt, minlength=num_players)
+    distance = np.bincount(slots, weights=step, minlength=num_players)
+    peak = np.zeros(num_players)
+    if n:
+        player_first = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        peak = np.maximum.reduceat(speed, player_first)
+
+    heatmaps = _occupancy(geometry.cells(metres), slots, num_players, geometry.grid_shape[0] * geometry.grid_shape[1])
+    return {
+        "id": player_ids,
+        "samples": np.bincount(slots, minlength=num_players),
+        "seconds": seconds,
+        "distance_m": distance,
+        "mean_speed": np.divide(distance, seconds, out=np.zeros(num_players), where=seconds > 0),
+        "peak_speed": peak,
+        "sprints": np.bincount(slots, weights=sprint_starts, minlength=num_players).astype(np.int64),
+        "heatmaps": heatmaps.reshape((num_players,) + geometry.grid_shape) / fps,
+    }
+
+
+class PlayerAnalytics:
+    """
+    Incremental version of analyze_history(): update() once per frame with
+    the players seen in that frame. Per-player state lives in arrays indexed
+    by slot, so an update is a handful of vectorized operations whatever the
+    number of players; heatmap samples are buffered and accumulated with
+    bincount in chunks.
+    """
+
+    def __init__(self, fps: float, geometry: Optional[PitchGeometry] = None, window: int = 5,
+                 max_gap: int = 10, sprint_speed: float = 7.0, sprint_frames: int = 5,
+                 initial_players: int = 64, chunk_size: int = 65536):
+        """
+        Args:
+            fps / geometry / window / max_gap / sprint_speed / sprint_frames: As for analyze_history()
+            initial_players: Initial per-player capacity, doubled when exceeded
+            chunk_size: Heatmap samples buffered before they are accumulated
+        """
+        self.fps = fps
+        self.geometry = geometry or PitchGeometry()
+        self.window = max(1, window)
+        self.max_gap = max_gap
+        self.sprint_speed = sprint_speed
+        self.sprint_frames = sprint_frames
+        self.num_cells = self.geometry.grid_shape[0] * self.geometry.grid_shape[1]
+
+        self._slots: Dict[int, int] = {}
+        self._allocate(initial_players)
+
+        self._chunk_cells = np.empty(chunk_size, dtype=np.int64)
+        self._chunk_slots = np.empty(chunk_size, dtype=np.int64)
+        self._chunk_rows = 0
+
+    def _allocate(self, capacity: int) -> None:
+        state = {
+            "last_frame": np.full(capacity, -1, dtype=np.int64),
+            "segment_length": np.zeros(capacity, dtype=np.int64),
+            "recent": np.zeros((capacity, self.window, 2)),      # last `window` raw positions
+            "window_sum": np.zeros((capacity, 2)),
+            "smoothed": np.zeros((capacity, 2)),
+            "samples": np.zeros(capacity, dtype=np.int64),
+            "seconds": np.zeros(capacity),
+            "distance": np.zeros(capacity),
+            "peak": np.zeros(capacity),
+            "fast_run": np.zeros(capacity, dtype=np.int64),
+            "sprints": np.zeros(capacity, dtype=np.int64),
+            "heatmaps": np.zeros((capacity, self.num_cells), dtype=np.int64),
+        }
+        for name, array in state.items():
+            old = getattr(self, "_" + name, None)
+            if old is not None:
+                array[:len(old)] = old
+            setattr(self, "_" + name, array)
+
+    def _slot_for(self, player_id: int) -> int:
+        slot = self._slots.get(player_id)
+        if slot is None:
+            slot = len(self._slots)
+            if slot >= len(self._samples):
+                self._allocate(2 * len(self._samples))
+            self._slots[player_id] = slot
+        return slot
+
+    def update(self, frame_idx: int, ids: Sequence[int], points) -> None:
+        """
+        Add one frame.
+
+        Args:
+            frame_idx: Frame number (frames must come in increasing order)
+            ids: (N,) unique player IDs of this frame
+            points: (N, 2) map coordinates
+        """
+        n = len(ids)
+        if n == 0:
+            return
+        slots = np.fromiter((self._slot_for(int(i)) for i in ids), dtype=np.int64, count=n)
+        metres = self.geometry.to_metres(points)
+
+        gaps = frame_idx - self._last_frame[slots]
+        starts = (self._last_frame[slots] < 0) | (gaps > self.max_gap)
+        self._last_frame[slots] = frame_idx
+
+        # Trailing moving average: running window sum over a per-player ring
+        length = np.where(starts, 0, self._segment_length[slots])
+        self._window_sum[slots] = np.where(starts[:, None], 0.0, self._window_sum[slots])
+        position = length % self.window
+        full = length >= self.window
+        self._window_sum[slots] -= np.where(full[:, None], self._recent[slots, position], 0.0)
+        self._recent[slots, position] = metres
+        self._window_sum[slots] += metres
+        length += 1
+        self._segment_length[slots] = length
+        smoothed = self._window_sum[slots] / np.minimum(length, self.window)[:, None]
+
+        step = np.where(starts, 0.0, np.linalg.norm(smoothed - self._smoothed[slots], axis=1))
+        dt = np.where(starts, 0.0, gaps / self.fps)
+        speed = np.divide(step, dt, out=np.zeros(n), where=dt > 0)
+        self._smoothed[slots] = smoothed
+
+        self._samples[slots] += 1
+        self._seconds[slots] += dt
+        self._distance[slots] += step
+        self._peak[slots] = np.maximum(self._peak[slots], speed)
+        fast = (speed >= self.sprint_speed) & ~starts
+        run = np.where(fast, self._fast_run[slots] + 1, 0)
+        self._fast_run[slots] = run
+        self._sprints[slots] += run == self.sprint_frames
+
+        # Heatmap samples, accumulated in chunks
+        if self._chunk_rows + n > len(self._chunk_cells):
+            self._flush()
+        self._chunk_cells[self._chunk_rows:self._chunk_rows + n] = self.geometry.cells(metres)
+        self._chunk_slots[self._chunk_rows:self._chunk_rows + n] = slots
+        self._chunk_rows += n
+
+    def _flush(self) -> None:
+        rows = self._chunk_rows
+        if rows:
+            num_slots = len(self._slots)
+            self._heatmaps[:num_slots] += _occupancy(self._chunk_cells[:rows], self._chunk_slots[:rows],
+                                                     num_slots, self.num_cells)
+            self._chunk_rows = 0
+
+    def results(self) -> Dict[str, np.ndarray]:
+        """Metrics so far, in the format of analyze_history()."""
+        self._flush()
+        ids = np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots))
+        slots = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+        order = np.argsort(ids)
+        ids, slots = ids[order], slots[order]
+        seconds, distance = self._seconds[slots], self._distance[slots]
+        return {
+            "id": ids,
+            "samples": self._samples[slots].copy(),
+            "seconds": seconds,
+            "distance_m": distance,
+            "mean_speed": np.divide(distance, seconds, out=np.zeros(len(ids)), where=seconds > 0),
+            "peak_speed": self._peak[slots],
+            "sprints": self._sprints[slots].copy(),
+            "heatmaps": self._heatmaps[slots].reshape((len(ids),) + self.geometry.grid_shape) / self.fps,
+        }
+
+
+def summary_records(results: Dict[str, np.ndarray]) -> List[Dict]:
+    """One JSON-ready dict per player (without the heatmaps)."""
+    columns = [results[name].tolist() for name in METRIC_COLUMNS]
+    return [{name: round(value, 3) if isinstance(value, float) else value
+             for name, value in zip(METRIC_COLUMNS, row)} for row in zip(*columns)]
+
+
+def save_heatmaps(path: str, results: Dict[str, np.ndarray], geometry: PitchGeometry) -> None:
+    """Per-player and total occupancy heatmaps (seconds per cell) as .npz."""
+    np.savez_compressed(path, ids=results["id"], heatmaps=results["heatmaps"].astype(np.float32),
+                        total=results["heatmaps"].sum(axis=0).astype(np.float32),
+                        cell_size=geometry.cell_size, field_size=np.array(geometry.field_size))
@@ -0,0 +1,336 @@
+"""
+Pluggable CPU inference backends for the person detector.
+
+* "torch":    ultralytics YOLO (PyTorch), the default
+* "onnx":     ONNX Runtime on an exported .onnx model
+* "openvino": OpenVINO on an exported *_openvino_model directory
+
+The ONNX Runtime and OpenVINO backends share a numpy pre/post-processing
+path (letterbox, confidence + class filter, NMS) that mirrors ultralytics,
+so every backend returns the same (N, 5) [x1, y1, x2, y2, score] arrays.
+export_model() produces the exported models, optionally INT8-quantised with
+calibration frames taken from the match video.
+
+onnxruntime, openvino and nncf are optional and only imported when the
+corresponding backend or export is used.
+"""
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+
+# ----------------------------------------------------------------------
+# Shared numpy pre/post-processing
+# ----------------------------------------------------------------------
+def letterbox(frame: np.ndarray, imgsz: int, color: int = 114) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Resize keeping aspect ratio and pad to an imgsz x imgsz square (as ultralytics LetterBox).
+
+    Returns:
+        (image, ratio, (pad_x, pad_y))
+    """
+    height, width = frame.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+    pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+
+    if (new_w, new_h) != (width, height):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                               value=(color, color, color))
+    return image, ratio, (pad_x, pad_y)
+
+
+def preprocess(frames: Sequence[np.ndarray], imgsz: int):
+    """
+    Letterbox BGR frames into one NCHW float32 RGB batch in [0, 1].
+
+    Returns:
+        (batch, [(ratio, (pad_x, pad_y)), ...])
+    """
+    batch = np.empty((len(frames), 3, imgsz, imgsz), dtype=np.float32)
+    transforms = []
+    for i, frame in enumerate(frames):
+        image, ratio, pad = letterbox(frame, imgsz)
+        # BGR HWC uint8 -> RGB CHW float
+        batch[i] = image[..., ::-1].transpose(2, 0, 1)
+        transforms.append((ratio, pad))
+    batch *= 1.0 / 255.0
+    return batch, transforms
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float, max_det: int = 300) -> np.ndarray:
+    """
+    Greedy non-maximum suppression on (N, 4) xyxy boxes (OpenCV's C++ NMS);
+    returns kept indices, best first. Scores must be positive.
+    """
+    if not len(boxes):
+        return np.empty(0, dtype=np.int64)
+    boxes = np.asarray(boxes, dtype=np.float64)
+    xywh = np.concatenate([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]], axis=1)
+    keep = cv2.dnn.NMSBoxes(xywh.tolist(), np.asarray(scores, dtype=np.float64).tolist(),
+                            0.0, float(iou_threshold))
+    return np.asarray(keep, dtype=np.int64).reshape(-1)[:max_det]
+
+
+def postprocess(output: np.ndarray, frames: Sequence[np.ndarray], transforms, conf: float,
+                iou: float, classes: Optional[Sequence[int]] = (0,)) -> List[np.ndarray]:
+    """
+    Decode raw YOLOv8 output (N, 4 + num_classes, anchors) into per-frame detections.
+
+    Returns:
+        One (K, 5) float32 [x1, y1, x2, y2, score] array per frame, in frame pixels
+    """
+    results = []
+    for pred, frame, (ratio, (pad_x, pad_y)) in zip(output, frames, transforms):
+        pred = pred.T  # (anchors, 4 + num_classes)
+        # Best class of each anchor, then the class filter (as ultralytics), so an
+        # anchor that is more likely another class is not kept as a person
+        class_scores = pred[:, 4:]
+        best = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(pred)), best]
+        mask = scores > conf
+        if classes is not None:
+            mask &= np.isin(best, list(classes))
+        boxes_xywh, scores = pred[mask, :4], scores[mask]
+
+        boxes = np.empty_like(boxes_xywh)
+        boxes[:, :2] = boxes_xywh[:, :2] - boxes_xywh[:, 2:] / 2
+        boxes[:, 2:] = boxes_xywh[:, :2] + boxes_xywh[:, 2:] / 2
+        keep = nms(boxes, scores, iou)
+        boxes, scores = boxes[keep], scores[keep]
+
+        # Undo the letterbox
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad_x) / ratio
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad_y) / ratio
+        height, width = frame.shape[:2]
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+        results.append(np.concatenate([boxes, scores[:, None]], axis=1).astype(np.float32))
+    return results
+
+
+# ----------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------
+class TorchBackend:
+    """ultralytics YOLO on PyTorch."""
+
+    name = "torch"
+
+    def __init__(self, model_path: str, imgsz: int = 1280):
+        from ultralytics import YOLO  # type: ignore
+        self.model = YOLO(model_path)
+        self.imgsz = imgsz
+
+    def detect(self, frames: Sequence[np.ndarray], conf: float = 0.25, iou: float = 0.45,
+               classes: Optional[Sequence[int]] = (0,), imgsz: Optional[int] = None) -> List[np.ndarray]:
+        results = self.model.predict(list(frames), conf=conf, iou=iou, imgsz=imgsz or self.imgsz,
+                                     classes=None if classes is None else list(classes), verbose=False)
+        detections = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                detections.append(np.empty((0, 5), dtype=np.float32))
+                continue
+            detections.append(np.concatenate([
+                boxes.xyxy.cpu().numpy(),  # type: ignore
+                boxes.conf.cpu().numpy()[:, None],  # type: ignore
+            ], axis=1).astype(np.float32))
+        return detections
+
+
+class _ExportedBackend(ABC):
+    """Common detect() for backends running an exported YOLOv8 graph."""
+
+    imgsz = 1280
+    static_shape = False
+    _size_warned = False
+
+    @abstractmethod
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        """Raw (N, 4 + num_classes, anchors) output of the graph for an NCHW batch."""
+
+    def detect(self, frames: Sequence[np.ndarray], conf: float = 0.25, iou: float = 0.45,
+               classes: Optional[Sequence[int]] = (0,), imgsz: Optional[int] = None) -> List[np.ndarray]:
+        frames = list(frames)
+        # Exported graphs have a fixed input size unless exported with dynamic=True
+        if self.static_shape and imgsz is not None and imgsz != self.imgsz and not self._size_warned:
+            print(f"Warning: {self.name} model has a fixed {self.imgsz}px input; inference at {imgsz}px "
+                  f"was requested and is run at {self.imgsz}px (export with dynamic=True to change it)")
+            self._size_warned = True
+        imgsz = self.imgsz if self.static_shape or imgsz is None else imgsz
+        batch, transforms = preprocess(frames, imgsz)
+        output = self._infer(batch)
+        return postprocess(output, frames, transforms, conf, iou, classes)
+
+
+class OnnxBackend(_ExportedBackend):
+    """ONNX Runtime (CPUExecutionProvider)."""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, imgsz: int = 1280, threads: Optional[int] = None):
+        import onnxruntime as ort  # type: ignore
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        height = model_input.shape[2]
+        self.static_shape = isinstance(height, int)
+        self.imgsz = height if self.static_shape else imgsz
+        self.static_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        if self.static_batch == 1 and len(batch) > 1:
+            return np.concatenate([self.session.run(None, {self.input_name: batch[i:i + 1]})[0]
+                                   for i in range(len(batch))])
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINOBackend(_ExportedBackend):
+    """OpenVINO Runtime on CPU."""
+
+    name = "openvino"
+
+    def __init__(self, model_path: str, imgsz: int = 1280, threads: Optional[int] = None):
+        import openvino as ov  # type: ignore
+
+        if os.path.isdir(model_path):
+            xml_files = [f for f in os.listdir(model_path) if f.endswith(".xml")]
+            if not xml_files:
+                raise FileNotFoundError(f"No OpenVINO .xml model in {model_path}")
+            model_path = os.path.join(model_path, xml_files[0])
+        core = ov.Core()
+        model = core.read_model(model_path)
+        config = {"PERFORMANCE_HINT": "THROUGHPUT"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.compiled = core.compile_model(model, "CPU", config)
+        shape = model.input(0).partial_shape
+        self.static_shape = shape[2].is_static
+        self.imgsz = shape[2].get_length() if self.static_shape else imgsz
+        self.static_batch = shape[0].get_length() if shape[0].is_static else None
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        if self.static_batch == 1 and len(batch) > 1:
+            return np.concatenate([self.compiled(batch[i:i + 1])[0] for i in range(len(batch))])
+        return self.compiled(batch)[0]
+
+
+def exported_model_path(weights: str, backend: str) -> str:
+    """Where ultralytics export puts the model for a backend (next to the .pt weights)."""
+    stem = os.path.splitext(weights)[0]
+    if backend == "onnx":
+        return stem + ".onnx"
+    if backend == "openvino":
+        return stem + "_openvino_model"
+    return weights
+
+
+def create_backend(name: str, model_path: str, imgsz: int = 1280, threads: Optional[int] = None):
+    """
+    Build a detector backend by name.
+
+    Args:
+        name: One of BACKENDS
+        model_path: .pt weights (torch), .onnx file (onnx) or OpenVINO model dir / .xml (openvino)
+        imgsz: Inference size for models without a fixed input shape
+        threads: Optional intra-op thread count (onnx / openvino)
+    """
+    if name == "torch":
+        return TorchBackend(model_path, imgsz)
+    if name == "onnx":
+        return OnnxBackend(model_path, imgsz, threads)
+    if name == "openvino":
+        return OpenVINOBackend(model_path, imgsz, threads)
+    raise ValueError(f"Unknown backend '{name}', expected one of {BACKENDS}")
+
+
+# ----------------------------------------------------------------------
+# Export + INT8 quantisation
+# ----------------------------------------------------------------------
+def sample_frames(video_path: str, count: int = 64) -> List[np.ndarray]:
+    """Evenly spaced frames of a video, used as INT8 calibration data."""
+    cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for index in np.linspace(0, max(total - 1, 0), count).astype(int):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def export_model(weights: str, backend: str, imgsz: int = 1280, int8: bool = False,
+                 calibration_frames: Optional[Sequence[np.ndarray]] = None) -> str:
+    """
+    Export YOLO weights for the onnx or openvino backend.
+
+    Args:
+        weights: ultralytics .pt weights
+        backend: "onnx" or "openvino"
+        imgsz: Fixed input size of the exported graph
+        int8: Quantise to INT8 (static, calibrated on calibration_frames)
+        calibration_frames: Sample BGR frames from the target camera (see sample_frames())
+
+    Returns:
+        Path of the exported model (file for onnx, directory for openvino)
+    """
+    from ultralytics import YOLO  # type: ignore
+
+    if backend not in ("onnx", "openvino"):
+        raise ValueError("export_model supports the 'onnx' and 'openvino' backends")
+    if int8 and not calibration_frames:
+        raise ValueError("INT8 export needs calibration_frames")
+
+    exported = YOLO(weights).export(format=backend, imgsz=imgsz, half=False)
+    if not int8:
+        return exported
+
+    calibration = [preprocess([frame], imgsz)[0] for frame in calibration_frames]
+
+    if backend == "onnx":
+        from onnxruntime.quantization import (CalibrationDataReader, QuantFormat,  # type: ignore
+                                              QuantType, quantize_static)
+        import onnxruntime as ort  # type: ignore
+
+        input_name = ort.InferenceSession(exported, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+        class _FrameReader(CalibrationDataReader):
+            def __init__(self):
+                self._batches = iter(calibration)
+
+            def get_next(self):
+                batch = next(self._batches, None)
+                return None if batch is None else {input_name: batch}
+
+        int8_path = exported.replace(".onnx", "_int8.onnx")
+        quantize_static(exported, int8_path, _FrameReader(), quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+        return int8_path
+
+    import nncf  # type: ignore
+    import openvino as ov  # type: ignore
+
+    core = ov.Core()
+    xml = [f for f in os.listdir(exported) if f.endswith(".xml")][0]
+    model = core.read_model(os.path.join(exported, xml))
+    quantized = nncf.quantize(model, nncf.Dataset(calibration), preset=nncf.QuantizationPreset.MIXED,
+                              subset_size=len(calibration))
+    int8_dir = exported.rstrip("/\\") + "_int8"
+    os.makedirs(int8_dir, exist_ok=True)
+    ov.save_model(quantized, os.path.join(int8_dir, xml))
+    return int8_dir
@@ -0,0 +1,212 @@
+"""
+Batch tracking of many matches with resumable jobs.
+
+A batch is a directory of videos or a JSON manifest of matches, each with its
+own calibration (explicit points, or a camera in the calibration cache, see
+pipeline/calibration.py). Matches are scheduled longest first on a pool of
+worker processes; every worker loads the model once (ClipWorker) and gets an
+explicit share of the cores for torch and OpenCV, optionally pinned to its
+own cores, so that the workers do not oversubscribe the CPU.
+
+Every match checkpoints its progress (pipeline/checkpoint.py). When the
+batch is run again after a crash or Ctrl+C, finished matches (those with a
+result.json) are skipped and interrupted ones continue from their last
+checkpoint.
+
+Manifest format (JSON):
+    [
+      {"video": "day1/match_01.mp4", "camera": "main_cam"},
+      {"video": "day1/match_02.mp4", "points": [[255, 140], [1890, 145], [2050, 980], [120, 980]],
+       "name": "final", "reid": true}
+    ]
+Relative video paths are relative to the manifest. Optional keys per match:
+name (output sub-directory), camera, points, and any make_job() setting.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+
+from pipeline.calibration import CalibrationStore, camera_name
+from pipeline.service import make_job
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+RESULT_FILE = "result.json"
+CHECKPOINT_FILE = "checkpoint.pkl"
+
+# Per-process worker, created once by the pool initializer
+_worker = None
+
+
+def load_matches(source: str) -> List[Dict[str, Any]]:
+    """
+    Matches of a batch.
+
+    Args:
+        source: Directory of videos, or a JSON manifest (see module docstring)
+
+    Returns:
+        [{"video": absolute path, ...manifest keys}, ...]
+    """
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source) if name.lower().endswith(VIDEO_EXTENSIONS))
+        return [{"video": os.path.abspath(os.path.join(source, name))} for name in names]
+
+    with open(source) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, dict):
+        manifest = manifest.get("matches", [])
+    base = os.path.dirname(os.path.abspath(source))
+    matches = []
+    for entry in manifest:
+        if isinstance(entry, str):
+            entry = {"video": entry}
+        entry = dict(entry)
+        entry["video"] = os.path.abspath(os.path.join(base, entry["video"]))
+        matches.append(entry)
+    return matches
+
+
+def plan_jobs(matches: List[Dict[str, Any]], output_dir: str, calibration_dir: str = "calibration",
+              force: bool = False, **config) -> List[Dict[str, Any]]:
+    """
+    Turn matches into service jobs, one output sub-directory per match.
+
+    The calibration of a match is its "points", else the cached calibration
+    of its "camera" (default: the video file name). Finished matches are
+    skipped unless force is set.
+
+    Args:
+        matches: Output of load_matches()
+        output_dir: Root directory of the batch outputs
+        calibration_dir: Calibration cache directory
+        force: Re-run finished matches (their checkpoints are discarded too)
+        **config: make_job() settings for every match (a match's own keys win)
+
+    Returns:
+        Jobs, longest video first
+
+    Raises:
+        ValueError: A match has no calibration, or two matches share a name
+    """
+    store = CalibrationStore(calibration_dir)
+    jobs, names = [], set()
+    for match in matches:
+        video = match["video"]
+        name = match.get("name") or camera_name(video)
+        if name in names:
+            raise ValueError(f"Two matches are named '{name}'; give them a \"name\" in the manifest")
+        names.add(name)
+
+        points, calibration = match.get("points"), None
+        if points is None:
+            camera = match.get("camera") or camera_name(video)
+            calibration = store.get(camera)
+            if calibration is None:
+                raise ValueError(f"No calibration for {video}: add \"points\" or calibrate camera "
+                                 f"'{camera}' with scripts/get_points.py")
+            points = CalibrationStore.points_for(calibration, _frame_size(video), camera)
+
+        match_dir = os.path.join(os.path.abspath(output_dir), name)
+        if os.path.exists(os.path.join(match_dir, RESULT_FILE)):
+            if not force:
+                print(f"Skipping finished match '{name}'")
+                continue
+            os.remove(os.path.join(match_dir, RESULT_FILE))
+            checkpoint = os.path.join(match_dir, CHECKPOINT_FILE)
+            if os.path.exists(checkpoint):
+                os.remove(checkpoint)
+
+        settings = dict(config)
+        settings.update({key: value for key, value in match.items()
+                         if key not in ("video", "name", "camera", "points")})
+        settings.setdefault("checkpoint", os.path.join(match_dir, CHECKPOINT_FILE))
+        if settings.get("tiles") is not None and calibration and calibration.get("tiling"):
+            # The camera's own tile settings, unless the match overrides them
+            settings["tiles"] = {**calibration["tiling"], **settings["tiles"]}
+        job = make_job(video, points, match_dir, **settings)
+        job["name"] = name
+        jobs.append(job)
+
+    # Longest first: the last long match does not start when the others are done
+    return sorted(jobs, key=lambda job: _frame_count(job["video"]), reverse=True)
+
+
+def _frame_size(video: str) -> Tuple[int, int]:
+    cap = cv2.VideoCapture(video)
+    size = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    return size
+
+
+def _frame_count(video: str) -> int:
+    cap = cv2.VideoCapture(video)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return count
+
+
+def _init_worker(threads: int, pin_cores: bool, counter, worker_config: Dict[str, Any]) -> None:
+    """Pool initializer: thread limits, optional core pinning, then the warm model."""
+    global _worker
+    from pipeline.segments import limit_threads
+    from pipeline.service import ClipWorker
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    if pin_cores and hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        first = (index * threads) % len(cores)
+        os.sched_setaffinity(0, cores[first:first + threads] or cores)
+    limit_threads(threads)
+    _worker = ClipWorker(threads=threads, **worker_config)
+
+
+def _run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Track one match in a pool process and record its result next to the outputs."""
+    print(f"[{_worker.name}] Match '{job['name']}': {job['video']}")
+    try:
+        result = _worker.process(job)
+    except Exception as exc:  # report the failure, keep the batch going
+        return {"id": job["id"], "status": "error", "video": job["video"],
+                "error": f"{type(exc).__name__}: {exc}", "worker": _worker.name}
+    result["name"] = job["name"]
+    path = os.path.join(job["output_dir"], RESULT_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(result, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return result
+
+
+def run_batch(jobs: List[Dict[str, Any]], workers: int = 1, threads: Optional[int] = None,
+              pin_cores: bool = False, **worker_config) -> Iterator[Dict[str, Any]]:
+    """
+    Track jobs on a pool of warm worker processes.
+
+    Args:
+        jobs: Output of plan_jobs()
+        workers: Worker processes (each loads the model once)
+        threads: torch / OpenCV threads per worker (default: the cores divided by the workers)
+        pin_cores: Pin each worker to its own block of `threads` cores (Linux)
+        **worker_config: ClipWorker arguments (model_path, batch_size, backend, ...)
+
+    Yields:
+        One result dict per job, in order of completion
+    """
+    import multiprocessing as mp
+
+    if not jobs:
+        return
+    workers = max(1, min(workers, len(jobs)))
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    # Spawned (not forked) so each worker initialises torch / OpenCV threads itself
+    context = mp.get_context("spawn")
+    counter = context.Value("i", 0)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(threads, pin_cores, counter, worker_config)) as pool:
+        futures = [pool.submit(_run_job, job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
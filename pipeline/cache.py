@@ -0,0 +1,135 @@
+"""
+On-disk cache of raw per-frame detections.
+
+YOLO is by far the most expensive step, yet its output does not depend on the
+ByteTrack settings, the boundary filter or the calibration points. Caching the
+detections (keyed by video content, model weights and detector settings) lets
+tracking be re-tuned by replaying them through a standalone ByteTrack.
+
+Layout of one cache entry (a directory named after the key):
+    boxes.f32    float32 rows [x1, y1, x2, y2, score], appended frame by frame
+    offsets.npy  int64 (frames + 1,) row offsets; frame i is rows[offsets[i]:offsets[i+1]]
+    meta.json    key inputs, frame/row counts and a "complete" flag
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+BOX_COLUMNS = 5
+_BOXES_FILE = "boxes.f32"
+_OFFSETS_FILE = "offsets.npy"
+_META_FILE = "meta.json"
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-1 of a file's content, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """A cache entry for one (video, weights, detector settings) combination."""
+
+    def __init__(self, root: str, video_path: str, model_path: str, params: Dict):
+        """
+        Args:
+            root: Cache directory (one sub-directory per entry)
+            video_path: Input video; its content hash is part of the key
+            model_path: YOLO weights or exported model; hashed if it is a local file,
+                else its name is used
+            params: Detector settings (conf, iou, imgsz, classes, ...)
+        """
+        self.key_inputs = {
+            "video": file_digest(video_path),
+            "weights": file_digest(model_path) if os.path.isfile(model_path) else os.path.basename(model_path),
+            "params": params,
+        }
+        key = hashlib.sha1(json.dumps(self.key_inputs, sort_keys=True).encode()).hexdigest()[:20]
+        self.path = os.path.join(root, key)
+
+    def _meta(self) -> Optional[Dict]:
+        meta_path = os.path.join(self.path, _META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def is_complete(self) -> bool:
+        """True if a previous run recorded detections for the whole video."""
+        meta = self._meta()
+        return bool(meta and meta.get("complete"))
+
+    def writer(self) -> "DetectionCacheWriter":
+        """Start (or restart) recording this entry."""
+        return DetectionCacheWriter(self.path, self.key_inputs)
+
+    def reader(self) -> "DetectionCacheReader":
+        """Memory-mapped access to a complete entry."""
+        if not self.is_complete():
+            raise FileNotFoundError(f"No complete detection cache at {self.path}")
+        return DetectionCacheReader(self.path)
+
+
+class DetectionCacheWriter:
+    """Appends per-frame detections to a cache entry."""
+
+    def __init__(self, path: str, key_inputs: Dict):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.key_inputs = key_inputs
+        self._offsets: List[int] = [0]
+        self._boxes = open(os.path.join(path, _BOXES_FILE), "wb")
+        self._write_meta(complete=False)
+
+    def _write_meta(self, complete: bool) -> None:
+        meta = dict(self.key_inputs, frames=len(self._offsets) - 1,
+                    rows=self._offsets[-1], complete=complete)
+        with open(os.path.join(self.path, _META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def append(self, detections: np.ndarray) -> None:
+        """Record one frame's (N, 5) [x1, y1, x2, y2, score] detections."""
+        rows = np.ascontiguousarray(detections, dtype=np.float32).reshape(-1, BOX_COLUMNS)
+        self._boxes.write(rows.tobytes())
+        self._offsets.append(self._offsets[-1] + len(rows))
+
+    def close(self, complete: bool = True) -> None:
+        """
+        Finish the entry. Pass complete=False when the video was not read to the
+        end (e.g. the run was stopped early); such entries are never replayed.
+        """
+        if self._boxes.closed:
+            return
+        self._boxes.close()
+        np.save(os.path.join(self.path, _OFFSETS_FILE), np.asarray(self._offsets, dtype=np.int64))
+        self._write_meta(complete=complete)
+
+
+class DetectionCacheReader:
+    """Per-frame views into a memory-mapped cache entry."""
+
+    def __init__(self, path: str):
+        self.offsets = np.load(os.path.join(path, _OFFSETS_FILE))
+        rows = int(self.offsets[-1])
+        if rows:
+            self.boxes = np.memmap(os.path.join(path, _BOXES_FILE), dtype=np.float32,
+                                   mode="r", shape=(rows, BOX_COLUMNS))
+        else:
+            self.boxes = np.empty((0, BOX_COLUMNS), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, frame_idx: int) -> np.ndarray:
+        """(N, 5) detections of one frame (a read-only view)."""
+        return self.boxes[self.offsets[frame_idx]:self.offsets[frame_idx + 1]]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for i in range(len(self)):
+            yield self[i]
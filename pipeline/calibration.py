@@ -0,0 +1,331 @@
+"""
+Per-camera calibration cache and homography tracking for moving cameras.
+
+CalibrationStore keeps, for every camera, the four clicked pitch corners
+(scripts/get_points.py) together with the frame they were clicked on, so a
+camera is calibrated once instead of pasting points into run_pipeline.py.
+
+HomographyTracker follows the camera after that. Every frame it follows ORB
+keypoints of a downscaled grey copy from the previous frame with LK optical
+flow (players masked out, as they move independently of the camera) and
+chains the RANSAC homography onto the current reference -> frame homography. The small
+errors of the chained steps add up, so their reprojection error is summed
+as a drift estimate; above `drift_threshold` (or when a step fails) the
+homography is re-estimated directly against the calibration frame. A new
+video of a calibrated camera is aligned the same way on its first frame.
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+_INDEX_FILE = "cameras.json"
+
+
+def camera_name(video_path: str) -> str:
+    """Default camera key of a video: its file name without extension."""
+    return os.path.splitext(os.path.basename(video_path))[0]
+
+
+class CalibrationStore:
+    """Calibration points and reference frames of every camera, in one directory."""
+
+    def __init__(self, root: str = "calibration"):
+        """
+        Args:
+            root: Directory holding cameras.json and one <camera>.png reference frame each
+        """
+        self.root = root
+        self.index_path = os.path.join(root, _INDEX_FILE)
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def cameras(self) -> List[str]:
+        return sorted(self._load())
+
+    def get(self, camera: str) -> Optional[Dict]:
+        """
+        Calibration of a camera, or None.
+
+        Returns:
+            {"source_points": [[x, y] x4], "frame_size": [w, h], "reference": path or None, "updated": ...}
+        """
+        entry = self._load().get(camera)
+        if entry and entry.get("reference"):
+            entry["reference"] = os.path.join(self.root, entry["reference"])
+        return entry
+
+    def save(self, camera: str, source_points: Sequence[Sequence[float]], frame_size: Tuple[int, int],
+             reference_frame: Optional[np.ndarray] = None) -> None:
+        """
+        Store (or replace) a camera's calibration. Other keys of an existing
+        entry, such as its "tiling" settings, are kept.
+
+        Args:
+            camera: Camera key
+            source_points: Pitch corners (Top-Left, Top-Right, Bottom-Right, Bottom-Left)
+            frame_size: (width, height) of the frame the points were clicked on
+            reference_frame: That frame; needed to re-align moved cameras and new videos
+        """
+        os.makedirs(self.root, exist_ok=True)
+        index = self._load()
+        reference = None
+        if reference_frame is not None:
+            reference = f"{camera}.png"
+            cv2.imwrite(os.path.join(self.root, reference), reference_frame)
+        index.setdefault(camera, {}).update({
+            "source_points": [[round(float(x), 2), round(float(y), 2)] for x, y in source_points],
+            "frame_size": [int(frame_size[0]), int(frame_size[1])],
+            "reference": reference,
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        # Write-then-rename so a crash never leaves a truncated index
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def points_for(entry: Dict, frame_size: Tuple[int, int], name: str = "") -> List[List[float]]:
+        """
+        Calibration points of an entry for a video of frame_size.
+
+        Points clicked on a frame of another resolution are scaled to the video,
+        with a warning; if the aspect ratio differs too, the view is probably
+        cropped or padded and the camera should be calibrated again.
+
+        Args:
+            entry: Output of get()
+            frame_size: (width, height) of the video
+            name: Camera or video named in the warning
+
+        Returns:
+            [[x, y] x4]
+        """
+        points = [[float(x), float(y)] for x, y in entry["source_points"]]
+        calibrated = entry.get("frame_size")
+        if not calibrated or not all(frame_size) or tuple(calibrated) == tuple(frame_size):
+            return points
+        scale_x, scale_y = frame_size[0] / calibrated[0], frame_size[1] / calibrated[1]
+        print(f"Warning: '{name}' was calibrated on a {calibrated[0]}x{calibrated[1]} frame, the video is "
+              f"{frame_size[0]}x{frame_size[1]}; the calibration points are scaled to it")
+        if abs(scale_x - scale_y) > 0.01 * max(scale_x, scale_y):
+            print(f"Warning: the aspect ratio differs too; re-calibrate '{name}' with scripts/get_points.py")
+        return [[x * scale_x, y * scale_y] for x, y in points]
+
+    @staticmethod
+    def reference_frame(entry: Dict) -> Optional[np.ndarray]:
+        """The calibration frame of an entry (None if it was not stored)."""
+        if not entry or not entry.get("reference"):
+            return None
+        return cv2.imread(entry["reference"])
+
+
+class HomographyTracker:
+    """Keeps the pitch corners up to date while the camera pans or zooms."""
+
+    def __init__(self, source_points: Sequence[Sequence[float]], reference_frame: np.ndarray,
+                 width: int = 480, max_features: int = 500, min_inliers: int = 20,
+                 ransac_threshold: float = 2.0, drift_threshold: float = 4.0, min_motion: float = 0.5,
+                 retry_interval: int = 5):
+        """
+        Args:
+            source_points: Pitch corners in the reference frame
+            reference_frame: Frame the corners were clicked on (same camera)
+            width: Width of the downscaled analysis image
+            max_features: ORB features per frame
+            min_inliers: RANSAC inliers needed to accept a homography
+            ransac_threshold: RANSAC reprojection threshold (analysis pixels)
+            drift_threshold: Summed reprojection error (analysis pixels) of the
+                chained frame-to-frame steps that triggers a full re-estimate
+            min_motion: Frame-corner displacement (analysis pixels) below which
+                the camera counts as still; slower motion accumulates against
+                the last anchor frame until it is large enough to apply
+            retry_interval: Frames between re-estimate attempts while the view is lost
+        """
+        self.reference_points = np.asarray(source_points, dtype=np.float64).reshape(-1, 2)
+        self.scale = width / reference_frame.shape[1]
+        self.width = width
+        self.min_inliers = min_inliers
+        self.ransac_threshold = ransac_threshold
+        self.drift_threshold = drift_threshold
+        self.min_motion = min_motion
+        self.retry_interval = max(1, retry_interval)
+        # Integer step for a cheap pre-decimation before the resize
+        self._step = max(1, int(1 / self.scale) // 2)
+
+        self._orb = cv2.ORB_create(nfeatures=max_features)
+        self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        self._to_small = np.diag([self.scale, self.scale, 1.0])
+        self._to_full = np.diag([1 / self.scale, 1 / self.scale, 1.0])
+
+        gray, mask = self._prepare(reference_frame)
+        self._reference_gray = gray
+        self._reference = self._describe(gray, mask)
+        # Anchor: last frame the homography was moved to (grey image, tracked points)
+        self._anchor = None
+        self.matrix = np.eye(3)      # reference frame -> current frame (full resolution)
+        self.drift = 0.0
+        self.lost = False            # No homography for the current frame (cut, replay, ...)
+        self.frames = 0
+        self.reestimates = 0
+        self._lost_frames = 0
+
+    def _prepare(self, frame: np.ndarray, boxes=None):
+        """Downscaled grey frame and the mask of the pixels usable for camera motion."""
+        height = frame.shape[0]
+        size = (self.width, max(1, int(round(height * self.scale))))
+        small = cv2.resize(frame[::self._step, ::self._step], size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        mask = None
+        if boxes is not None and len(boxes):
+            # Players move on their own: keep their features (including the
+            # strong corners along their outline) out of the camera motion
+            boxes = np.asarray(boxes, dtype=np.float64)[:, :4] * self.scale
+            pad = 0.25 * (boxes[:, 2:] - boxes[:, :2]) + 2
+            boxes = np.concatenate([boxes[:, :2] - pad, boxes[:, 2:] + pad], axis=1).astype(np.int32)
+            mask = np.full(gray.shape, 255, dtype=np.uint8)
+            for x1, y1, x2, y2 in boxes:
+                mask[max(y1, 0):max(y2 + 1, 0), max(x1, 0):max(x2 + 1, 0)] = 0
+        return gray, mask
+
+    def _describe(self, gray: np.ndarray, mask):
+        """ORB keypoints (as points) and descriptors."""
+        keypoints, descriptors = self._orb.detectAndCompute(gray, mask)
+        points = cv2.KeyPoint_convert(keypoints) if keypoints else np.empty((0, 2), dtype=np.float32)
+        return points, descriptors
+
+    def _detect(self, gray: np.ndarray, mask) -> np.ndarray:
+        keypoints = self._orb.detect(gray, mask)
+        return cv2.KeyPoint_convert(keypoints) if keypoints else np.empty((0, 2), dtype=np.float32)
+
+    def _fit(self, src: np.ndarray, dst: np.ndarray) -> Optional[Tuple[np.ndarray, float, np.ndarray]]:
+        """RANSAC homography src -> dst, its mean inlier error and the inlier mask, or None."""
+        if len(src) < self.min_inliers:
+            return None
+        homography, inliers = cv2.findHomography(src, dst, cv2.RANSAC, self.ransac_threshold)
+        if homography is None or int(inliers.sum()) < self.min_inliers:
+            return None
+        inliers = inliers.ravel().astype(bool)
+        projected = cv2.perspectiveTransform(src[inliers].reshape(-1, 1, 2), homography).reshape(-1, 2)
+        return homography, float(np.linalg.norm(projected - dst[inliers], axis=1).mean()), inliers
+
+    def _step_from_anchor(self, gray: np.ndarray):
+        """
+        Anchor -> current homography: the anchor's points are followed with
+        pyramidal LK flow (much cheaper than matching descriptors every frame).
+
+        Returns:
+            (homography, mean error, inlier points in the current frame) or None
+        """
+        anchor_gray, anchor_points = self._anchor
+        if len(anchor_points) < self.min_inliers:
+            return None
+        src = anchor_points.reshape(-1, 1, 2)
+        dst, status, _ = cv2.calcOpticalFlowPyrLK(anchor_gray, gray, src, None, winSize=(11, 11), maxLevel=2)
+        found = status.ravel() == 1
+        dst = dst.reshape(-1, 2)[found]
+        result = self._fit(src.reshape(-1, 2)[found], dst)
+        if result is None:
+            return None
+        homography, error, inliers = result
+        return homography, error, dst[inliers]
+
+    def _reestimate(self, gray: np.ndarray, mask) -> bool:
+        """Reference -> current homography by ORB descriptor matching."""
+        self.drift = 0.0
+        points, descriptors = self._describe(gray, mask)
+        ref_points, ref_descriptors = self._reference
+        if descriptors is None or ref_descriptors is None:
+            return False
+        matches = self._matcher.match(ref_descriptors, descriptors)
+        src = ref_points[[m.queryIdx for m in matches]]
+        dst = points[[m.trainIdx for m in matches]]
+        result = self._fit(src, dst)
+        if result is None:
+            return False
+        homography = result[0]
+
+        # Refine: ORB keypoints are coarse, so follow points from the reference
+        # warped into this view with LK flow and fit the remaining correction
+        warped = cv2.warpPerspective(self._reference_gray, homography, (gray.shape[1], gray.shape[0]))
+        corners = self._detect(warped, mask)
+        if len(corners) >= self.min_inliers:
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(warped, gray, corners.reshape(-1, 1, 2), None,
+                                                        winSize=(11, 11), maxLevel=2)
+            found = status.ravel() == 1
+            correction = self._fit(corners[found], moved.reshape(-1, 2)[found])
+            if correction is not None:
+                homography = correction[0] @ homography
+        self.matrix = self._to_full @ homography @ self._to_small
+        self.reestimates += 1
+        return True
+
+    def _corner_motion(self, homography: np.ndarray, shape) -> float:
+        height, width = shape
+        corners = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float64)
+        moved = cv2.perspectiveTransform(corners.reshape(-1, 1, 2), homography).reshape(-1, 2)
+        return float(np.abs(moved - corners).max())
+
+    def update(self, frame: np.ndarray, boxes=None) -> np.ndarray:
+        """
+        Follow the camera to the next frame.
+
+        Args:
+            frame: BGR video frame
+            boxes: Optional (N, 4) player boxes of this frame, masked out of the matching
+
+        Returns:
+            (4, 2) pitch corners in this frame (the last known ones if the view was lost)
+        """
+        self.frames += 1
+        if self.lost:
+            # Replays, crowd shots, ...: only try to find the pitch again now and then
+            self._lost_frames += 1
+            if self._lost_frames % self.retry_interval:
+                return self.source_points()
+        gray, mask = self._prepare(frame, boxes)
+
+        step = None
+        if self._anchor is not None and not self.lost:
+            step = self._step_from_anchor(gray)
+        points = None
+        if step is None:
+            # First frame, lost view or failed step: align with the calibration frame directly
+            self.lost = not self._reestimate(gray, mask)
+            self._lost_frames = 0
+        else:
+            homography, error, points = step
+            if self._corner_motion(homography, gray.shape) < self.min_motion:
+                return self.source_points()  # camera still: keep the anchor
+            self.matrix = self._to_full @ homography @ self._to_small @ self.matrix
+            self.drift += error
+            if self.drift > self.drift_threshold:
+                # A failed re-estimate (e.g. the camera looks elsewhere) keeps the chained result
+                self._reestimate(gray, mask)
+
+        # Keep following the surviving points (not the ones a player walked onto);
+        # detect new ones when too few are left
+        if points is not None and mask is not None:
+            cols = np.clip(points[:, 0].astype(np.int32), 0, mask.shape[1] - 1)
+            rows = np.clip(points[:, 1].astype(np.int32), 0, mask.shape[0] - 1)
+            points = points[mask[rows, cols] > 0]
+        if points is None or len(points) < 2 * self.min_inliers:
+            points = self._detect(gray, mask)
+        self._anchor = (gray, points)
+        return self.source_points()
+
+    def source_points(self) -> np.ndarray:
+        """Current (4, 2) pitch corners."""
+        return cv2.perspectiveTransform(self.reference_points.reshape(-1, 1, 2), self.matrix).reshape(-1, 2)
+
+    def stats(self) -> Dict[str, float]:
+        """Frames seen, full re-estimates and whether the view is currently lost."""
+        return {"frames": self.frames, "reestimates": self.reestimates, "lost": self.lost}
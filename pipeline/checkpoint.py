@@ -0,0 +1,62 @@
+"""
+Checkpoints of a running tracking job.
+
+A checkpoint is one pickle with everything needed to continue a video from
+the frame after it instead of from frame 0: the frame index, the tracker
+state (PlayerTracker.save_state()), the ID mapper and the trajectory store,
+plus the job's own bookkeeping (output sizes, elapsed time). It is written
+to a temporary file and renamed over the previous one, so a crash while
+saving leaves the last complete checkpoint in place.
+"""
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+CHECKPOINT_VERSION = 2
+
+
+def save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    """
+    Atomically write a checkpoint.
+
+    Args:
+        path: Checkpoint file
+        state: Picklable job state
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        pickle.dump({"version": CHECKPOINT_VERSION, **state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Read a checkpoint written by save_checkpoint().
+
+    Returns:
+        The saved state, or None if there is no usable checkpoint (missing,
+        unreadable or written by an incompatible version)
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as exc:
+        print(f"Warning: ignoring unreadable checkpoint {path} ({type(exc).__name__}: {exc})")
+        return None
+    if not isinstance(state, dict) or state.get("version") != CHECKPOINT_VERSION:
+        print(f"Warning: ignoring checkpoint {path} from another version")
+        return None
+    return state
+
+
+def remove_checkpoint(path: str) -> None:
+    """Delete a checkpoint once its job is complete."""
+    for name in (path, f"{path}.tmp"):
+        if os.path.exists(name):
+            os.remove(name)
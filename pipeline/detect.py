@@ -1,34 +1,82 @@
 from ultralytics import YOLO  # type: ignore
 
+from pipeline.backends import create_backend
+
+# ultralytics predict() defaults, used by the exported backends too
+BACKEND_PARAMS = {'conf': 0.25, 'iou': 0.7, 'imgsz': 640, 'classes': [0]}
+
 class PlayerDetector:
-    def __init__(self, model_version='yolov8n.pt'):
+    def __init__(self, model_version='yolov8n.pt', batch_size=1, backend='torch', threads=None):
         """
         Initialize the YOLO model.
         We use 'yolov8n.pt' (nano) because it downloads automatically and runs fast on CPU.
+
+        batch_size: Default number of frames per forward pass when detecting a list of frames.
+        backend: 'torch' (ultralytics), or 'onnx' / 'openvino' with model_version pointing
+                 at an exported model (see pipeline/backends.py).
+        threads: Intra-op thread count for the onnx / openvino backends.
         """
-        print(f"Loading YOLO model: {model_version}...")
-        self.model = YOLO(model_version)
+        print(f"Loading YOLO model: {model_version} ({backend})...")
+        self.backend_name = backend
+        if backend == 'torch':
+            self.model = YOLO(model_version)
+            self.backend = None
+        else:
+            self.model = None
+            self.backend = create_backend(backend, model_version, BACKEND_PARAMS['imgsz'], threads)
+        self.batch_size = max(1, int(batch_size))
+
+    @staticmethod
+    def _parse_result(result):
+        """Converts one ultralytics result into a list of [x1, y1, x2, y2, score]."""
+        detections = []
+        
+        # Extract the bounding box data
+        for box in result.boxes:
+            # Get coordinates (x1, y1, x2, y2)
+            x1, y1, x2, y2 = box.xyxy[0].tolist()
+            # Get confidence score
+            conf = float(box.conf[0])
+            
+            detections.append([x1, y1, x2, y2, conf])
+        return detections
 
     def detect(self, frame):
         """
-        Input: A single video frame (image).
+        Input: A single video frame (image), or a list of frames.
         Output: A list of bounding boxes for detected people: [x1, y1, x2, y2, score]
+                (one such list per frame when given a list of frames)
         """
+        if isinstance(frame, (list, tuple)):
+            return self.detect_batch(frame)
+        if self.backend is not None:
+            return self.detect_batch([frame])[0]
+
         # Run the model on the frame
         # verbose=False keeps the terminal output clean
         results = self.model(frame, classes=[0], verbose=False) 
         # classes=[0] forces it to ONLY look for people (Class ID 0)
 
         detections = []
-        
-        # Extract the bounding box data
         for result in results:
-            for box in result.boxes:
-                # Get coordinates (x1, y1, x2, y2)
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                # Get confidence score
-                conf = float(box.conf[0])
-                
-                detections.append([x1, y1, x2, y2, conf])
+            detections.extend(self._parse_result(result))
         
-        return detections
\ No newline at end of file
+        return detections
+
+    def detect_batch(self, frames, batch_size=None):
+        """
+        Detects people in several frames, batch_size frames per forward pass.
+        Output: One list of [x1, y1, x2, y2, score] per input frame.
+        """
+        batch_size = max(1, int(batch_size or self.batch_size))
+        frames = list(frames)
+
+        all_detections = []
+        for start in range(0, len(frames), batch_size):
+            if self.backend is not None:
+                detections = self.backend.detect(frames[start:start + batch_size], **BACKEND_PARAMS)
+                all_detections.extend(d.tolist() for d in detections)
+                continue
+            results = self.model(frames[start:start + batch_size], classes=[0], verbose=False)
+            all_detections.extend(self._parse_result(result) for result in results)
+        return all_detections
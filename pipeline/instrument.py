@@ -0,0 +1,196 @@
+"""
+Lightweight hot-path instrumentation.
+
+Per-stage latencies are recorded into fixed log-spaced histograms (constant
+memory, O(log buckets) per sample), from which p50/p95/p99 are read. Stages
+are timed either by wrapping a method of a pipeline object or with a
+`with instrumentation.stage(name):` block. A disabled Instrumentation does
+not patch anything and hands out a shared no-op context, so leaving the
+calls in place costs next to nothing.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, Optional
+
+import numpy as np
+
+# Bucket upper bounds in seconds: 10us .. 100s, 20 buckets per decade
+_BOUNDS = np.logspace(-5, 2, 141).tolist()
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram of one stage."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect_left(_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Upper bound (seconds) of the bucket containing the q-th percentile."""
+        if self.count == 0:
+            return 0.0
+        rank = q / 100.0 * self.count
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, rank))
+        return min(_BOUNDS[index] if index < len(_BOUNDS) else self.max, self.max)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": 1000 * self.total / self.count if self.count else 0.0,
+            "p50_ms": 1000 * self.percentile(50),
+            "p95_ms": 1000 * self.percentile(95),
+            "p99_ms": 1000 * self.percentile(99),
+            "max_ms": 1000 * self.max,
+            "total_s": self.total,
+        }
+
+
+class _NullStage:
+    """Shared no-op context used when instrumentation is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _StageTimer:
+    __slots__ = ("instrumentation", "name", "start")
+
+    def __init__(self, instrumentation: "Instrumentation", name: str):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.instrumentation.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Instrumentation:
+    """Collects per-stage latency histograms and exports JSON snapshots."""
+
+    def __init__(self, enabled: bool = True, snapshot_path: Optional[str] = None,
+                 snapshot_interval: float = 10.0):
+        """
+        Args:
+            enabled: When False every call is a no-op
+            snapshot_path: If set, a JSON snapshot is written here every
+                snapshot_interval seconds (and by write_snapshot())
+            snapshot_interval: Seconds between periodic snapshots
+        """
+        self.enabled = enabled
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        # Serialises snapshot writes (stages record from several threads)
+        self._snapshot_lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._last_snapshot = self._started
+
+    def _histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def record(self, name: str, seconds: float) -> None:
+        """Add one latency sample to a stage."""
+        if not self.enabled:
+            return
+        self._histogram(name).record(seconds)
+        if self.snapshot_path and time.perf_counter() - self._last_snapshot >= self.snapshot_interval:
+            self._periodic_snapshot()
+
+    def _periodic_snapshot(self) -> None:
+        # One thread writes; the others carry on instead of waiting for the disk
+        if not self._snapshot_lock.acquire(blocking=False):
+            return
+        try:
+            if time.perf_counter() - self._last_snapshot >= self.snapshot_interval:
+                self._write_snapshot(self.snapshot_path)
+        finally:
+            self._snapshot_lock.release()
+
+    def stage(self, name: str):
+        """Context manager timing the enclosed block as one sample of `name`."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageTimer(self, name)
+
+    def wrap(self, obj, method_name: str, stage_name: Optional[str] = None) -> None:
+        """
+        Time every call of obj.method_name (patched on the instance only).
+        Does nothing when disabled.
+        """
+        if not self.enabled:
+            return
+        method = getattr(obj, method_name)
+        name = stage_name or method_name
+        histogram = self._histogram(name)
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                histogram.record(time.perf_counter() - start)
+
+        setattr(obj, method_name, timed)
+
+    def snapshot(self) -> Dict:
+        """Current statistics of every stage."""
+        return {
+            "uptime_s": time.perf_counter() - self._started,
+            "stages": {name: h.summary() for name, h in list(self.histograms.items())},
+        }
+
+    def write_snapshot(self, path: Optional[str] = None) -> None:
+        """Write snapshot() as JSON (to snapshot_path by default)."""
+        with self._snapshot_lock:
+            self._write_snapshot(path or self.snapshot_path)
+
+    def _write_snapshot(self, path: Optional[str]) -> None:
+        self._last_snapshot = time.perf_counter()
+        if not path:
+            return
+        # Written aside and renamed, so readers never see a partial file
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def format_summary(self) -> str:
+        """Human-readable end-of-run table."""
+        if not self.histograms:
+            return "No stage timings recorded."
+        lines = [f"{'stage':<12} {'count':>8} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)"]
+        for name, s in self.snapshot()["stages"].items():
+            lines.append(f"{name:<12} {s['count']:>8} {s['mean_ms']:>9.2f} {s['p50_ms']:>9.2f} "
+                         f"{s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+        return "\n".join(lines)
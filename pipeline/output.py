@@ -0,0 +1,317 @@
+"""
+Output compositing and asynchronous multi-sink writing.
+
+FrameCompositor keeps a small pool of preallocated side-by-side output
+frames; the video frame and the map are rendered straight into views of a
+pooled buffer, so nothing is allocated or zero-filled per frame.
+
+OutputWriter hands each composed frame and its per-frame track record to
+pluggable sinks on a background thread and returns the buffer to the pool
+afterwards:
+
+* VideoSink:      encoded video (cv2.VideoWriter); concat_videos() joins the
+                  parts written by checkpointed jobs
+* PreviewSink:    downscaled preview; the window itself is shown from the
+                  main thread (show()), as GUI calls must stay there
+* TrackJsonlSink: one JSON line per frame
+* TrackCsvSink:   one CSV row per track
+
+Sinks that are not configured cost nothing; when no sink needs pixels
+(needs_frames is False), the caller can skip drawing altogether.
+"""
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+_END = object()
+
+
+class Canvas:
+    """One pooled output frame with views of its video and map areas."""
+
+    __slots__ = ("image", "video", "map")
+
+    def __init__(self, image: np.ndarray, frame_size: Tuple[int, int], map_size: Tuple[int, int]):
+        width, height = frame_size
+        map_width, map_height = map_size
+        self.image = image
+        self.video = image[:height, :width]
+        self.map = image[:map_height, width:width + map_width]
+
+
+class FrameCompositor:
+    """Pool of preallocated output frames (video on the left, map on the right)."""
+
+    def __init__(self, frame_size: Tuple[int, int], map_size: Tuple[int, int], pool_size: int = 8):
+        """
+        Args:
+            frame_size: (width, height) of the video frames
+            map_size: (width, height) of the pitch map
+            pool_size: Number of buffers; acquire() blocks while all of them
+                are still being written (backpressure from the sinks)
+        """
+        width, height = frame_size
+        map_width, map_height = map_size
+        self.frame_size = frame_size
+        self.map_size = map_size
+        self.output_size = (width + map_width, max(height, map_height))
+        self._free: "queue.Queue[Canvas]" = queue.Queue()
+        for _ in range(max(1, pool_size)):
+            # Zeroed once: areas outside the video and map views stay black
+            image = np.zeros((self.output_size[1], self.output_size[0], 3), dtype=np.uint8)
+            self._free.put(Canvas(image, frame_size, map_size))
+
+    def acquire(self, timeout: Optional[float] = None) -> Canvas:
+        """A free canvas; its content is stale until overwritten."""
+        return self._free.get(timeout=timeout)
+
+    def release(self, canvas: Canvas) -> None:
+        """Return a canvas to the pool once every sink is done with it."""
+        self._free.put(canvas)
+
+    def compose(self, frame: np.ndarray, pitch_map: Optional[np.ndarray] = None) -> Canvas:
+        """Copy a video frame (and optionally a rendered map) into a pooled canvas."""
+        canvas = self.acquire()
+        np.copyto(canvas.video, frame)
+        if pitch_map is not None:
+            np.copyto(canvas.map, pitch_map)
+        return canvas
+
+
+# ----------------------------------------------------------------------
+# Sinks
+# ----------------------------------------------------------------------
+class Sink:
+    """Output target; write() runs on the writer thread."""
+
+    name = "sink"
+    needs_frames = True
+
+    def write(self, frame: Optional[np.ndarray], record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class VideoSink(Sink):
+    """Encodes the composed frames to a video file."""
+
+    name = "encode"
+
+    def __init__(self, path: str, fps: float, size: Tuple[int, int], fourcc: int = 0x7634706D):
+        """
+        Args:
+            path: Output video path
+            fps: Frame rate
+            size: (width, height) of the composed frames
+            fourcc: Codec (default 'mp4v')
+        """
+        self.path = path
+        self.writer = cv2.VideoWriter(path, fourcc, fps, size)
+        if not self.writer.isOpened():
+            raise IOError(f"Could not create output video file: {path}")
+
+    def write(self, frame, record):
+        self.writer.write(frame)
+
+    def close(self):
+        self.writer.release()
+
+
+def concat_videos(paths: Sequence[str], output_path: str, fps: float, fourcc: int = 0x7634706D) -> int:
+    """
+    Join videos of the same frame size into one file, e.g. the parts of a
+    checkpointed job. The frames are re-encoded; the file only appears at
+    output_path once it is complete.
+
+    Returns:
+        Number of frames written
+    """
+    root, ext = os.path.splitext(output_path)
+    tmp_path = f"{root}.tmp{ext}"
+    writer = None
+    frames = 0
+    try:
+        for path in paths:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                raise IOError(f"Could not open video part: {path}")
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if writer is None:
+                    writer = cv2.VideoWriter(tmp_path, fourcc, fps, (frame.shape[1], frame.shape[0]))
+                    if not writer.isOpened():
+                        raise IOError(f"Could not create output video file: {output_path}")
+                writer.write(frame)
+                frames += 1
+            cap.release()
+    finally:
+        if writer is not None:
+            writer.release()
+    if writer is None:
+        raise IOError(f"No frames to join into {output_path}")
+    os.replace(tmp_path, output_path)
+    return frames
+
+
+class PreviewSink(Sink):
+    """
+    Downscaled preview. write() only resizes (on the writer thread) into a
+    reused buffer; show() displays the latest preview and must be called
+    from the main thread.
+    """
+
+    name = "preview"
+
+    def __init__(self, size: Tuple[int, int], scale: float = 0.5,
+                 window: str = "Cricket Tracking + Real Map"):
+        """
+        Args:
+            size: (width, height) of the composed frames
+            scale: Preview scale factor
+            window: Window title
+        """
+        self.window = window
+        self.preview_size = (max(1, int(size[0] * scale)), max(1, int(size[1] * scale)))
+        # Double buffer: the writer fills one while the main thread shows the other
+        self._buffers = [np.zeros((self.preview_size[1], self.preview_size[0], 3), dtype=np.uint8)
+                         for _ in range(2)]
+        self._latest = None
+        self._lock = threading.Lock()
+
+    def write(self, frame, record):
+        with self._lock:
+            target = self._buffers[1] if self._latest is self._buffers[0] else self._buffers[0]
+        cv2.resize(frame, self.preview_size, dst=target, interpolation=cv2.INTER_AREA)
+        with self._lock:
+            self._latest = target
+
+    def show(self) -> bool:
+        """Display the newest preview (main thread). Returns False when 'q' is pressed."""
+        with self._lock:
+            latest = self._latest
+            if latest is not None:
+                cv2.imshow(self.window, latest)
+        return not (cv2.waitKey(1) & 0xFF == ord('q'))
+
+
+class TrackJsonlSink(Sink):
+    """Per-frame track records as JSON lines ("-" writes to stdout)."""
+
+    name = "tracks"
+    needs_frames = False
+
+    def __init__(self, path: str, append: bool = False):
+        self.file = sys.stdout if path == "-" else open(path, "a" if append else "w")
+
+    def write(self, frame, record):
+        self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+
+class TrackCsvSink(Sink):
+    """One row per track: frame, id, x1, y1, x2, y2, conf."""
+
+    name = "tracks"
+    needs_frames = False
+
+    def __init__(self, path: str, append: bool = False):
+        self.file = open(path, "a" if append else "w", newline="")
+        self.csv = csv.writer(self.file)
+        if not append:
+            self.csv.writerow(["frame", "id", "x1", "y1", "x2", "y2", "conf"])
+
+    def write(self, frame, record):
+        self.csv.writerows([record["frame"], *track] for track in record["tracks"])
+
+    def close(self):
+        self.file.close()
+
+
+def track_sink(path: str, append: bool = False) -> Sink:
+    """JSONL or CSV track sink, chosen by file extension (append: continue an existing file)."""
+    return TrackCsvSink(path, append) if path.lower().endswith(".csv") else TrackJsonlSink(path, append)
+
+
+# ----------------------------------------------------------------------
+# Writer
+# ----------------------------------------------------------------------
+class OutputWriter:
+    """Feeds composed frames and track records to the sinks on a background thread."""
+
+    def __init__(self, sinks: Sequence[Sink], compositor: Optional[FrameCompositor] = None,
+                 queue_size: int = 8, instrumentation=None):
+        """
+        Args:
+            sinks: Output sinks
+            compositor: Pool the canvases come from (they are released after writing)
+            queue_size: Frames waiting for the writer before write() blocks
+            instrumentation: Optional Instrumentation; each sink is timed under its name
+        """
+        self.sinks: List[Sink] = list(sinks)
+        self.compositor = compositor
+        self.instrumentation = instrumentation
+        self.needs_frames = any(sink.needs_frames for sink in self.sinks)
+        self.frames_written = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="output-writer", daemon=True)
+        self._thread.start()
+
+    def sink(self, sink_type):
+        """The configured sink of a type, or None."""
+        return next((sink for sink in self.sinks if isinstance(sink, sink_type)), None)
+
+    def write(self, canvas: Optional[Canvas], record: Dict[str, Any]) -> None:
+        """Queue one frame (None if no sink needs pixels) and its track record."""
+        if self._error is not None:
+            raise self._error
+        self._queue.put((canvas, record))
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            canvas, record = item
+            try:
+                if self._error is None:
+                    frame = canvas.image if canvas is not None else None
+                    for sink in self.sinks:
+                        if frame is None and sink.needs_frames:
+                            continue
+                        if self.instrumentation is not None:
+                            with self.instrumentation.stage(sink.name):
+                                sink.write(frame, record)
+                        else:
+                            sink.write(frame, record)
+                    self.frames_written += 1
+            except BaseException as exc:  # re-raised from write() / close()
+                self._error = exc
+            finally:
+                if canvas is not None and self.compositor is not None:
+                    self.compositor.release(canvas)
+
+    def close(self) -> None:
+        """Flush the queue, close every sink and re-raise a sink error."""
+        self._queue.put(_END)
+        self._thread.join()
+        for sink in self.sinks:
+            sink.close()
+        if self._error is not None:
+            raise self._error
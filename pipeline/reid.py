@@ -0,0 +1,318 @@
+"""
+Appearance re-identification for fragmented track IDs.
+
+ByteTrack gives a player a new raw ID whenever it loses its track for too long
+(occlusion, a missed detection streak). IDMapper turns raw IDs into clean,
+consecutive player IDs; with a ReIDGallery it remembers recently lost
+players and gives a new raw ID the clean ID of the lost player it matches,
+instead of creating a new player.
+
+* Descriptor: normalised HSV colour histogram of the torso crop (shirt
+  colour survives changes of pose and scale better than the full box).
+* Gallery: fixed number of lost players (descriptor, last map position,
+  frame lost); the oldest entry is evicted when full, entries older than
+  max_age frames are ignored.
+* Matching: all new tracks against the whole gallery in one Hellinger
+  distance computation, gated by how far a player can have moved on the
+  map since it was lost, then greedy assignment by distance.
+
+Only new raw IDs are matched, and the descriptors of tracked players are
+refreshed every few frames, so the cost per frame stays small.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+# H, S, V bins of the torso histogram
+_HIST_BINS = [8, 4, 4]
+_HIST_RANGES = [0, 180, 0, 256, 0, 256]
+
+
+def torso_descriptor(frame: np.ndarray, box: Sequence[float]) -> Optional[np.ndarray]:
+    """
+    Colour descriptor of a player's torso.
+
+    Args:
+        frame: BGR video frame
+        box: [x1, y1, x2, y2] of the player
+
+    Returns:
+        (D,) float32 square root of the L1-normalised histogram (ready for a
+        dot-product Hellinger distance), or None if the crop is empty
+    """
+    x1, y1, x2, y2 = (float(v) for v in box[:4])
+    width, height = x2 - x1, y2 - y1
+    # Middle of the upper body: skips the head, the legs and most of the background
+    cx1 = int(max(0, x1 + 0.25 * width))
+    cx2 = int(min(frame.shape[1], x2 - 0.25 * width))
+    cy1 = int(max(0, y1 + 0.15 * height))
+    cy2 = int(min(frame.shape[0], y1 + 0.55 * height))
+    if cx2 <= cx1 or cy2 <= cy1:
+        return None
+    hsv = cv2.cvtColor(frame[cy1:cy2, cx1:cx2], cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1, 2], None, _HIST_BINS, _HIST_RANGES).ravel()
+    total = hist.sum()
+    if total <= 0:
+        return None
+    return np.sqrt(hist / total).astype(np.float32)
+
+
+class ReIDGallery:
+    """Fixed-size gallery of recently lost players."""
+
+    def __init__(self, capacity: int = 64, max_age: int = 250, max_distance: float = 0.4,
+                 gate_radius: float = 30.0, max_step: float = 3.0):
+        """
+        Args:
+            capacity: Lost players kept; the one lost longest ago is evicted first
+            max_age: Frames after which a lost player can no longer be matched
+            max_distance: Maximum Hellinger distance (0 = same colours, 1 = disjoint)
+            gate_radius: Map distance (pixels) always allowed between the
+                lost position and a new track
+            max_step: Additional map distance allowed per frame since the loss
+        """
+        self.capacity = capacity
+        self.max_age = max_age
+        self.max_distance = max_distance
+        self.gate_radius = gate_radius
+        self.max_step = max_step
+
+        self.descriptors = np.zeros((capacity, int(np.prod(_HIST_BINS))), dtype=np.float32)
+        self.positions = np.zeros((capacity, 2), dtype=np.float64)
+        self.ids = np.full(capacity, -1, dtype=np.int64)        # clean ID, -1 = free
+        self.lost_frames = np.zeros(capacity, dtype=np.int64)
+        self.matches = 0
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.ids >= 0))
+
+    def __contains__(self, player_id: int) -> bool:
+        return bool((self.ids == player_id).any())
+
+    def add(self, player_id: int, descriptor: np.ndarray, position, frame_idx: int) -> None:
+        """Remember a lost player (replaces an older entry of the same ID)."""
+        slots = np.flatnonzero(self.ids == player_id)
+        if not len(slots):
+            slots = np.flatnonzero(self.ids < 0)
+        # Full: evict the entry lost longest ago
+        slot = slots[0] if len(slots) else int(np.argmin(self.lost_frames))
+        self.ids[slot] = player_id
+        self.descriptors[slot] = descriptor
+        self.positions[slot] = position
+        self.lost_frames[slot] = frame_idx
+
+    def remove(self, player_id: int) -> None:
+        """Forget a player (e.g. the player's old track came back)."""
+        self.ids[self.ids == player_id] = -1
+
+    def match(self, descriptors: np.ndarray, positions: np.ndarray, frame_idx: int) -> np.ndarray:
+        """
+        Match new tracks against the gallery; matched entries are removed.
+
+        Args:
+            descriptors: (M, D) torso descriptors of the new tracks
+            positions: (M, 2) map positions of the new tracks
+            frame_idx: Current frame
+
+        Returns:
+            (M,) clean ID of the matched lost player, or -1
+        """
+        matched = np.full(len(descriptors), -1, dtype=np.int64)
+        age = frame_idx - self.lost_frames
+        valid = (self.ids >= 0) & (age <= self.max_age)
+        if not len(descriptors) or not valid.any():
+            return matched
+        columns = np.flatnonzero(valid)
+
+        # Hellinger distance of every (new track, lost player) pair in one product
+        similarity = descriptors @ self.descriptors[columns].T
+        cost = np.sqrt(np.clip(1.0 - similarity, 0.0, 1.0))
+        # Gate: a player cannot have run further than max_step per frame since it was lost
+        moved = np.linalg.norm(positions[:, None, :] - self.positions[columns][None, :, :], axis=2)
+        reachable = moved <= self.gate_radius + self.max_step * age[columns][None, :]
+        cost[~reachable | (cost > self.max_distance)] = np.inf
+
+        # Greedy assignment, best pair first (M and the gallery are small)
+        while np.isfinite(cost).any():
+            row, col = np.unravel_index(np.argmin(cost), cost.shape)
+            slot = columns[col]
+            matched[row] = self.ids[slot]
+            self.ids[slot] = -1
+            cost[row, :] = np.inf
+            cost[:, col] = np.inf
+            self.matches += 1
+        return matched
+
+
+class IDMapper:
+    """
+    Raw tracker IDs -> clean player IDs (1, 2, 3, ...).
+
+    Raw IDs that have not been seen for `forget_after` frames are dropped, so
+    the mapping stays bounded on long matches. With a gallery, players that
+    disappear are remembered and new raw IDs are re-identified first.
+    """
+
+    def __init__(self, gallery: Optional[ReIDGallery] = None, forget_after: int = 300,
+                 refresh_interval: int = 10, momentum: float = 0.7):
+        """
+        Args:
+            gallery: Optional ReIDGallery; without it, every new raw ID is a new player
+            forget_after: Frames after which an unseen raw ID is dropped
+                (longer than the tracker keeps lost tracks)
+            refresh_interval: Frames between descriptor updates of tracked players
+            momentum: Weight of the old descriptor in each update
+        """
+        self.gallery = gallery
+        self.forget_after = forget_after
+        self.refresh_interval = max(1, refresh_interval)
+        self.momentum = momentum
+
+        self.next_id = 1
+        self._clean: Dict[int, int] = {}         # raw ID -> clean ID
+        self._last_seen: Dict[int, int] = {}     # raw ID -> frame
+        self._present: set = set()               # raw IDs of the previous frame
+        # Latest appearance / position per clean ID of a tracked player (gallery only)
+        self._descriptors: Dict[int, np.ndarray] = {}
+        self._positions: Dict[int, np.ndarray] = {}
+        self._forgotten: List[int] = []         # clean IDs dropped since pop_forgotten()
+        # Raw IDs that lost their clean ID (re-identified under a newer raw ID, or
+        # forgotten while the player is still in the gallery) -> that clean ID
+        self._retired: Dict[int, int] = {}
+        self._frames = 0
+
+    def __len__(self) -> int:
+        """Number of distinct players issued so far."""
+        return self.next_id - 1
+
+    def _new_id(self) -> int:
+        clean_id = self.next_id
+        self.next_id += 1
+        return clean_id
+
+    def assign(self, frame_idx: int, raw_ids: Sequence[int], frame: Optional[np.ndarray] = None,
+               boxes=None, points=None) -> List[int]:
+        """
+        Clean IDs of one frame's tracks.
+
+        Args:
+            frame_idx: Frame number
+            raw_ids: Raw tracker IDs of this frame
+            frame / boxes / points: The video frame, (N, 4) boxes and (N, 2) map
+                positions; needed for re-identification only
+
+        Returns:
+            Clean IDs, in the order of raw_ids
+        """
+        raw_ids = [int(i) for i in raw_ids]
+        reid = self.gallery is not None and frame is not None
+        present = set(raw_ids)
+        new_rows = [row for row, raw in enumerate(raw_ids) if raw not in self._clean]
+
+        if reid:
+            points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+            # Players that just disappeared go to the gallery with their last appearance
+            for raw in self._present - present:
+                clean_id = self._clean.get(raw)
+                if clean_id in self._descriptors:
+                    self.gallery.add(clean_id, self._descriptors[clean_id], self._positions[clean_id],
+                                     self._last_seen[raw])
+            # Players whose raw ID came back are no longer lost
+            for raw in present - self._present:
+                if raw in self._clean:
+                    self.gallery.remove(self._clean[raw])
+
+        # A retired raw ID that the tracker reactivated gets its old clean ID back
+        matched = {}
+        for row in new_rows:
+            clean_id = self._restorable(raw_ids[row], present)
+            if clean_id is not None:
+                matched[row] = clean_id
+                self.gallery.remove(clean_id)
+        unmatched = [row for row in new_rows if row not in matched]
+
+        if reid and unmatched:
+            descriptors = [torso_descriptor(frame, boxes[row]) for row in unmatched]
+            rows = [row for row, d in zip(unmatched, descriptors) if d is not None]
+            if rows:
+                found = self.gallery.match(np.stack([d for d in descriptors if d is not None]),
+                                           points[rows], frame_idx)
+                matched.update((row, int(clean_id)) for row, clean_id in zip(rows, found) if clean_id >= 0)
+
+        clean_ids = []
+        for row, raw in enumerate(raw_ids):
+            if raw not in self._clean:
+                clean_id = matched.get(row)
+                if clean_id is not None:
+                    # The player's other raw ID no longer maps to this clean ID,
+                    # but gets it back if the tracker reactivates it
+                    for old_raw in [r for r, c in self._clean.items() if c == clean_id]:
+                        del self._clean[old_raw]
+                        self._last_seen.pop(old_raw, None)
+                        self._retired[old_raw] = clean_id
+                else:
+                    clean_id = self._new_id()
+                self._clean[raw] = clean_id
+                self._retired.pop(raw, None)
+            self._last_seen[raw] = frame_idx
+            clean_ids.append(self._clean[raw])
+
+        if reid:
+            self._update_appearance(raw_ids, clean_ids, frame, boxes, points, new_rows)
+        self._present = present
+
+        self._frames += 1
+        if self._frames % self.refresh_interval == 0:
+            self._forget(frame_idx)
+        return clean_ids
+
+    def _update_appearance(self, raw_ids, clean_ids, frame, boxes, points, new_rows) -> None:
+        refresh = self._frames % self.refresh_interval == 0
+        new_rows = set(new_rows)
+        for row, clean_id in enumerate(clean_ids):
+            self._positions[clean_id] = points[row]
+            old = self._descriptors.get(clean_id)
+            if old is not None and not refresh and row not in new_rows:
+                continue
+            descriptor = torso_descriptor(frame, boxes[row])
+            if descriptor is None:
+                continue
+            if old is not None:
+                descriptor = self.momentum * old + (1 - self.momentum) * descriptor
+                descriptor /= max(float(np.linalg.norm(descriptor)), 1e-6)
+            self._descriptors[clean_id] = descriptor
+
+    def _restorable(self, raw: int, present: set) -> Optional[int]:
+        """Old clean ID of a retired raw ID, if that player is not on screen under another raw ID."""
+        clean_id = self._retired.get(raw)
+        if clean_id is None or self.gallery is None:
+            return None
+        holders = [r for r, c in self._clean.items() if c == clean_id]
+        if any(r in present for r in holders):
+            return None
+        # A forgotten player can only come back while it is still in the gallery
+        if not holders and clean_id not in self.gallery:
+            return None
+        return clean_id
+
+    def _forget(self, frame_idx: int) -> None:
+        stale = [raw for raw, seen in self._last_seen.items() if frame_idx - seen > self.forget_after]
+        for raw in stale:
+            del self._last_seen[raw]
+            clean_id = self._clean.pop(raw)
+            self._descriptors.pop(clean_id, None)
+            self._positions.pop(clean_id, None)
+            self._forgotten.append(clean_id)
+            if self.gallery is not None:
+                self._retired[raw] = clean_id
+        if self._retired:
+            # Keep only retired raw IDs whose player can still be restored
+            mapped = set(self._clean.values())
+            self._retired = {raw: clean_id for raw, clean_id in self._retired.items()
+                             if clean_id in mapped or clean_id in self.gallery}
+
+    def pop_forgotten(self) -> List[int]:
+        """Clean IDs whose raw ID was dropped since the last call (to free their per-player state)."""
+        forgotten, self._forgotten = self._forgotten, []
+        return forgotten
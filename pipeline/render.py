@@ -0,0 +1,142 @@
+"""
+Incremental top-view map rendering.
+
+Trails live in a persistent layer that fades a little every frame. Each frame
+only the newest segment of every trail and the current player dots are drawn,
+then the layer is alpha-blended onto the ground image in one vectorized step,
+so the cost scales with the number of new points rather than with
+players x trail length.
+"""
+from typing import Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from pipeline.utils import generate_color
+
+
+class MapRenderer:
+    """Draws player dots and fading trajectory trails on the top-view map."""
+
+    def __init__(self, background: np.ndarray, trail_length: int = 50,
+                 line_thickness: int = 2, min_alpha: float = 0.05,
+                 max_gap: Optional[int] = None):
+        """
+        Args:
+            background: BGR ground image (map size)
+            trail_length: Frames after which a trail segment has faded to min_alpha
+            line_thickness: Trail line thickness in pixels
+            min_alpha: Opacity of a segment that is trail_length frames old
+            max_gap: Frames a player may be missing before its trail is no longer
+                connected to the next position (defaults to trail_length)
+
+        Raises:
+            ValueError: trail_length or max_gap is below 1
+        """
+        if trail_length < 1:
+            raise ValueError(f"trail_length must be at least 1, got {trail_length}")
+        if max_gap is not None and max_gap < 1:
+            raise ValueError(f"max_gap must be at least 1 frame, got {max_gap}")
+        self.background = background
+        self.line_thickness = line_thickness
+        self.max_gap = trail_length if max_gap is None else max_gap
+        self.decay = min_alpha ** (1.0 / trail_length)
+
+        height, width = background.shape[:2]
+        self._background_f = background.astype(np.float32)
+        # Premultiplied trail colour and its opacity
+        self._trail = np.zeros((height, width, 3), dtype=np.float32)
+        self._alpha = np.zeros((height, width, 1), dtype=np.float32)
+        self._inv_alpha = np.empty((height, width, 1), dtype=np.float32)
+        self._blend = np.empty((height, width, 3), dtype=np.float32)
+        self._output = np.empty_like(background)
+
+        self._palette: Dict[int, Tuple[int, int, int]] = {}
+        # player_id -> (x, y, frame) of the last drawn position
+        self._last: Dict[int, Tuple[int, int, int]] = {}
+        self._frame = 0
+
+    def color(self, player_id: int) -> Tuple[int, int, int]:
+        """Cached BGR colour of a player (see utils.generate_color)."""
+        color = self._palette.get(player_id)
+        if color is None:
+            color = generate_color(player_id)
+            self._palette[player_id] = color
+        return color
+
+    def update(self, ids: Sequence[int], points) -> None:
+        """
+        Fade the trail layer and add the newest segment of each player's trail.
+
+        Args:
+            ids: Player IDs visible in this frame
+            points: (N, 2) integer map coordinates of those players
+        """
+        self._frame += 1
+        self._trail *= self.decay
+        self._alpha *= self.decay
+
+        for player_id, (x, y) in zip(ids, np.asarray(points, dtype=np.int32).reshape(-1, 2).tolist()):
+            last = self._last.get(player_id)
+            if last is not None and self._frame - last[2] <= self.max_gap:
+                cv2.line(self._trail, last[:2], (x, y), self.color(player_id), self.line_thickness)
+                cv2.line(self._alpha, last[:2], (x, y), 1.0, self.line_thickness)
+            self._last[player_id] = (x, y, self._frame)
+
+        # Forget players whose trail can no longer be continued
+        if self._frame % self.max_gap == 0:
+            self._last = {pid: last for pid, last in self._last.items()
+                          if self._frame - last[2] <= self.max_gap}
+
+    def compose(self, ids: Sequence[int], points, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Blend the trail layer onto the background and draw the current dots.
+
+        Args:
+            ids: Player IDs visible in this frame
+            points: (N, 2) integer map coordinates of those players
+            out: Optional (h, w, 3) uint8 array, e.g. a view into the output
+                frame, to render into instead of the internal buffer
+
+        Returns:
+            The rendered map (out, or a buffer reused on the next call; copy it to keep it)
+        """
+        # background * (1 - alpha) + premultiplied trail, in place
+        np.subtract(1.0, self._alpha, out=self._inv_alpha)
+        np.multiply(self._background_f, self._inv_alpha, out=self._blend)
+        np.add(self._blend, self._trail, out=self._blend)
+        pitch_map = self._output if out is None else out
+        np.copyto(pitch_map, self._blend, casting="unsafe")
+
+        for player_id, (x, y) in zip(ids, np.asarray(points, dtype=np.int32).reshape(-1, 2).tolist()):
+            # Red dot (current position) with white border and ID label
+            cv2.circle(pitch_map, (x, y), 8, (0, 0, 255), -1)
+            cv2.circle(pitch_map, (x, y), 9, (255, 255, 255), 1)
+            cv2.putText(pitch_map, str(player_id), (x + 10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        return pitch_map
+
+    def draw(self, ids: Sequence[int], points, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """update() followed by compose() for one frame."""
+        self.update(ids, points)
+        return self.compose(ids, points, out)
+
+    def reset(self) -> None:
+        """Clear all trails."""
+        self._trail.fill(0)
+        self._alpha.fill(0)
+        self._last.clear()
+
+
+def draw_tracks(image: np.ndarray, tracks, ids: Sequence[int]) -> None:
+    """
+    Draw each player's box and "ID: n" label on a video frame, in place.
+
+    Args:
+        image: BGR frame (or a view into the output frame)
+        tracks: [id, x1, y1, x2, y2, conf] rows
+        ids: Displayed (cleaned) ID of each track
+    """
+    for track, clean_id in zip(tracks, ids):
+        x1, y1, x2, y2 = int(track[1]), int(track[2]), int(track[3]), int(track[4])
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(image, f"ID: {clean_id}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
@@ -0,0 +1,220 @@
+"""
+Cheap scene gate for broadcast footage.
+
+Broadcasts cut away from the calibrated main camera to replays, crowd shots,
+close-ups and graphics. On those shots the detector, the boundary filter and
+the homography are meaningless, and ByteTrack (persist=True) would carry
+stale tracks across the cut. SceneGate looks at a heavily downscaled copy of
+each frame (well under a millisecond at 1080p):
+
+* cut:       the colour histogram of the whole frame jumps between
+             consecutive frames, or the frame difference is very large
+* main view: the calibrated pitch area is mostly grass-coloured and its
+             colour histogram is close to the reference main-camera view
+
+SceneGatedTracker wraps a tracker, skips inference on non-main-view frames
+(returning no tracks) and resets the tracker on every cut.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+# Hue / saturation bins of the HSV histograms
+_HIST_BINS = [18, 8]
+_HIST_RANGES = [0, 180, 0, 256]
+
+
+class SceneState:
+    """Classification of one frame."""
+
+    __slots__ = ("cut", "main_view", "cut_distance", "view_distance", "grass_fraction")
+
+    def __init__(self, cut: bool, main_view: bool, cut_distance: float, view_distance: float,
+                 grass_fraction: float):
+        self.cut = cut                         # First frame of a new shot
+        self.main_view = main_view             # Calibrated main-camera view
+        self.cut_distance = cut_distance       # Histogram distance to the previous frame
+        self.view_distance = view_distance     # Pitch-area histogram distance to the reference
+        self.grass_fraction = grass_fraction   # Share of grass-coloured pixels on the pitch
+
+
+class SceneGate:
+    """Classifies frames as calibrated main-camera view or not, and detects cuts."""
+
+    def __init__(self, source_points: Sequence[Sequence[float]], frame_size: Sequence[int],
+                 reference: Optional[np.ndarray] = None, width: int = 96,
+                 cut_threshold: float = 0.45, diff_threshold: float = 45.0,
+                 view_threshold: float = 0.4, min_grass: float = 0.35):
+        """
+        Args:
+            source_points: Calibration points of the main camera (pitch corners)
+            frame_size: (width, height) of the video frames
+            reference: Optional main-camera frame. Without it, the first frame
+                that passes the grass test becomes the reference.
+            width: Width of the downscaled analysis image
+            cut_threshold: Bhattacharyya distance between consecutive frame
+                histograms above which a cut is reported
+            diff_threshold: Mean absolute grey-level difference (0-255) between
+                consecutive frames above which a cut is reported
+            view_threshold: Maximum pitch-area histogram distance to the
+                reference for the main view
+            min_grass: Minimum share of grass-coloured pixels on the pitch area
+                for the main view
+        """
+        frame_w, frame_h = int(frame_size[0]), int(frame_size[1])
+        self.scale = width / frame_w
+        self.size = (width, max(1, int(round(frame_h * self.scale))))
+        # Integer step for a cheap pre-decimation before the resize
+        self._step = max(1, int(1 / self.scale) // 2)
+
+        self.cut_threshold = cut_threshold
+        self.diff_threshold = diff_threshold
+        self.view_threshold = view_threshold
+        self.min_grass = min_grass
+
+        self.pitch_mask = np.zeros((self.size[1], self.size[0]), dtype=np.uint8)
+        self.set_pitch(source_points)
+
+        self._prev_hist = None
+        self._prev_gray = None
+        self.reference_hist = None
+        if reference is not None:
+            self.reference_hist = self._pitch_hist(self._hsv(reference)[0])
+
+        self.frames = 0
+        self.cuts = 0
+        self.main_view_frames = 0
+
+    def set_pitch(self, source_points: Sequence[Sequence[float]]) -> None:
+        """Move the pitch area, e.g. to the corners of a panning camera (HomographyTracker)."""
+        # Pitch polygon at the analysis scale
+        self.pitch_mask[:] = 0
+        polygon = np.round(np.asarray(source_points, dtype=np.float64) * self.scale).astype(np.int32)
+        cv2.fillPoly(self.pitch_mask, [polygon], 255)
+        self._pitch_pixels = max(1, int(np.count_nonzero(self.pitch_mask)))
+
+    def _hsv(self, frame: np.ndarray):
+        small = cv2.resize(frame[::self._step, ::self._step], self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2HSV), cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _pitch_hist(self, hsv: np.ndarray) -> np.ndarray:
+        hist = cv2.calcHist([hsv], [0, 1], self.pitch_mask, _HIST_BINS, _HIST_RANGES)
+        return cv2.normalize(hist, hist).flatten()
+
+    def update(self, frame: np.ndarray) -> SceneState:
+        """Classify the next frame of the video."""
+        hsv, gray = self._hsv(frame)
+        hist = cv2.calcHist([hsv], [0, 1], None, _HIST_BINS, _HIST_RANGES)
+        hist = cv2.normalize(hist, hist).flatten()
+
+        cut = False
+        cut_distance = 0.0
+        if self._prev_hist is not None:
+            cut_distance = cv2.compareHist(self._prev_hist, hist, cv2.HISTCMP_BHATTACHARYYA)
+            frame_diff = float(cv2.absdiff(gray, self._prev_gray).mean())
+            cut = cut_distance > self.cut_threshold or frame_diff > self.diff_threshold
+        self._prev_hist, self._prev_gray = hist, gray
+
+        # Grass: green hue with some saturation, inside the calibrated pitch area
+        grass = cv2.inRange(hsv, (30, 40, 40), (90, 255, 255))
+        grass_fraction = np.count_nonzero(cv2.bitwise_and(grass, self.pitch_mask)) / self._pitch_pixels
+
+        view_distance = 0.0
+        main_view = bool(grass_fraction >= self.min_grass)
+        if main_view:
+            pitch_hist = self._pitch_hist(hsv)
+            if self.reference_hist is None:
+                self.reference_hist = pitch_hist
+            view_distance = cv2.compareHist(self.reference_hist, pitch_hist, cv2.HISTCMP_BHATTACHARYYA)
+            main_view = bool(view_distance <= self.view_threshold)
+
+        self.frames += 1
+        self.cuts += int(cut)
+        self.main_view_frames += int(main_view)
+        return SceneState(cut, main_view, float(cut_distance), float(view_distance),
+                          float(grass_fraction))
+
+    def stats(self) -> Dict[str, float]:
+        """Frames seen, cuts and the share of frames that went to the detector."""
+        return {
+            "frames": self.frames,
+            "cuts": self.cuts,
+            "main_view_frames": self.main_view_frames,
+            "skipped_frames": self.frames - self.main_view_frames,
+        }
+
+
+class SceneGatedTracker:
+    """
+    Wraps a tracker (PlayerTracker, AdaptiveStrideTracker, ...): frames that
+    are not the calibrated main view return no tracks without running the
+    detector, and the tracker is reset on every cut so IDs do not leak
+    across shots. Output format is unchanged: [id, x1, y1, x2, y2, conf].
+    """
+
+    def __init__(self, tracker, gate: SceneGate):
+        self.tracker = tracker
+        self.gate = gate
+
+    def _reset(self) -> None:
+        if hasattr(self.tracker, "reset"):
+            self.tracker.reset()
+
+    def _skip(self, frame) -> List[list]:
+        # Frame-counting trackers (AdaptiveStrideTracker) still count the rejected frame
+        if hasattr(self.tracker, "skip_frame"):
+            self.tracker.skip_frame(frame)
+        return []
+
+    def track_frame(self, frame) -> List[list]:
+        """Same contract as PlayerTracker.track_frame()."""
+        scene = self.gate.update(frame)
+        if scene.cut:
+            self._reset()
+        return self.tracker.track_frame(frame) if scene.main_view else self._skip(frame)
+
+    def track_batch(self, frames, batch_size=None) -> List[List[list]]:
+        """
+        Same contract as PlayerTracker.track_batch(). Consecutive main-view
+        frames of the same shot are still tracked in batches; rejected frames
+        are skipped in order between them.
+        """
+        frames = list(frames)
+        all_tracks: List[List[list]] = [[] for _ in frames]
+        run: List[int] = []
+
+        def flush():
+            if run:
+                for index, tracks in zip(run, self.tracker.track_batch([frames[i] for i in run], batch_size)):
+                    all_tracks[index] = tracks
+                run.clear()
+
+        for index, frame in enumerate(frames):
+            scene = self.gate.update(frame)
+            if scene.cut:
+                flush()
+                self._reset()
+            if scene.main_view:
+                run.append(index)
+            else:
+                flush()
+                self._skip(frame)
+        flush()
+        return all_tracks
+
+    def predict_frame(self, frame) -> List[list]:
+        """
+        Same contract as AdaptiveStrideTracker.predict_frame(); a wrapped
+        tracker without predict_frame() runs track_frame() instead.
+        """
+        scene = self.gate.update(frame)
+        if scene.cut:
+            self._reset()
+        if not scene.main_view:
+            return self._skip(frame)
+        predict = getattr(self.tracker, "predict_frame", self.tracker.track_frame)
+        return predict(frame)
+
+    def reset(self) -> None:
+        self._reset()
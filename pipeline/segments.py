@@ -0,0 +1,284 @@
+"""
+Segment-parallel tracking of long videos.
+
+The video is split into time segments that are tracked in separate processes
+(each with its own YOLO + ByteTrack). Consecutive segments overlap by a few
+frames; in that window both trackers see the same players, so their IDs are
+matched by box IoU and map-position distance and rewritten into one
+continuous set of IDs.
+
+Track rows are float64 arrays with columns TRACK_COLUMNS.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from pipeline.utils import box_iou
+
+TRACK_COLUMNS = ("frame", "id", "x1", "y1", "x2", "y2", "conf")
+_FRAME, _ID, _BOX, _CONF = 0, 1, slice(2, 6), 6
+
+
+def plan_segments(total_frames: int, num_segments: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Split [0, total_frames) into contiguous core ranges.
+
+    Returns:
+        [(start, end), ...] core ranges (end exclusive). Segment i is tracked on
+        [start, end + overlap) so it overlaps the next segment.
+    """
+    num_segments = max(1, min(num_segments, total_frames // max(1, 2 * overlap) or 1))
+    bounds = np.linspace(0, total_frames, num_segments + 1).astype(int)
+    return [(int(bounds[i]), int(bounds[i + 1])) for i in range(num_segments)]
+
+
+def limit_threads(threads: int) -> None:
+    """Keep each worker process to its share of the cores."""
+    cv2.setNumThreads(threads)
+    try:
+        import torch  # type: ignore
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def track_segment(job: Dict) -> np.ndarray:
+    """
+    Track frames [job["start"], job["stop"]) of a video (runs in a worker process).
+
+    Args:
+        job: {"video", "start", "stop", "source_points", "expand_ratio",
+              "model_path", "batch_size", "roi", "roi_imgsz", "backend", "scene_gate", "tiles"}
+
+    Returns:
+        (M, 7) track rows with global frame numbers, boundary-filtered
+    """
+    from pipeline.track import PlayerTracker
+    from pipeline.utils import BoundaryFilter, seek_frame
+
+    tracker = PlayerTracker(model_path=job["model_path"], batch_size=job["batch_size"],
+                            backend=job.get("backend", "torch"), threads=job.get("threads"))
+    tracker.set_roi(job.get("roi"), imgsz=job.get("roi_imgsz"))
+    boundary_filter = BoundaryFilter(job["source_points"], expand_ratio=job["expand_ratio"])
+
+    cap = cv2.VideoCapture(job["video"])
+    # Exact: the overlap windows of neighbouring segments must hold the same frames
+    seek_frame(cap, job["start"])
+    frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    if job.get("tiles") is not None:
+        from pipeline.tiles import plan_for
+        plan_for(tracker, job["source_points"], frame_size, **job["tiles"])
+    if job.get("scene_gate"):
+        from pipeline.scene import SceneGate, SceneGatedTracker
+        tracker = SceneGatedTracker(tracker, SceneGate(job["source_points"], frame_size))
+
+    rows = []
+    frame_idx = job["start"]
+    while frame_idx < job["stop"]:
+        frames = []
+        while len(frames) < job["batch_size"] and frame_idx + len(frames) < job["stop"]:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        if not frames:
+            break
+
+        batch_tracks = tracker.track_batch(frames) if len(frames) > 1 else [tracker.track_frame(frames[0])]
+        for tracks in batch_tracks:
+            for track in boundary_filter.filter_tracks(tracks):
+                rows.append([frame_idx] + list(track[:6]))
+            frame_idx += 1
+    cap.release()
+    return np.asarray(rows, dtype=np.float64).reshape(-1, len(TRACK_COLUMNS))
+
+
+def match_overlap(prev_rows: np.ndarray, next_rows: np.ndarray, transformer=None,
+                  min_iou: float = 0.3, max_map_distance: float = 15.0) -> Dict[int, int]:
+    """
+    Match the IDs of two trackers that saw the same frames.
+
+    Pairs are scored by their mean box IoU over the frames they share, and
+    gated by the mean distance of their foot positions on the map (if a
+    ViewTransformer is given). Pairs are accepted greedily, best first.
+
+    Args:
+        prev_rows / next_rows: Track rows of the two segments in the overlap window
+        transformer: Optional ViewTransformer for map-position gating
+        min_iou: Minimum mean IoU of a matched pair
+        max_map_distance: Maximum mean map distance (map pixels) of a matched pair
+
+    Returns:
+        {next_id: prev_id}
+    """
+    if len(prev_rows) == 0 or len(next_rows) == 0:
+        return {}
+    prev_ids, prev_idx = np.unique(prev_rows[:, _ID], return_inverse=True)
+    next_ids, next_idx = np.unique(next_rows[:, _ID], return_inverse=True)
+    iou_sum = np.zeros((len(prev_ids), len(next_ids)))
+    dist_sum = np.zeros_like(iou_sum)
+    counts = np.zeros_like(iou_sum)
+
+    def feet(rows):
+        boxes = rows[:, _BOX]
+        pts = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1)
+        return transformer.transform_points(pts) if transformer is not None else pts
+
+    prev_feet, next_feet = feet(prev_rows), feet(next_rows)
+    for frame in np.intersect1d(prev_rows[:, _FRAME], next_rows[:, _FRAME]):
+        pa = np.flatnonzero(prev_rows[:, _FRAME] == frame)
+        nb = np.flatnonzero(next_rows[:, _FRAME] == frame)
+        ia, ib = np.ix_(prev_idx[pa], next_idx[nb])
+        iou_sum[ia, ib] += box_iou(prev_rows[pa, _BOX], next_rows[nb, _BOX])
+        dist_sum[ia, ib] += np.linalg.norm(prev_feet[pa, None] - next_feet[None, nb], axis=2)
+        counts[ia, ib] += 1
+
+    seen = counts > 0
+    mean_iou = np.where(seen, iou_sum / np.maximum(counts, 1), 0.0)
+    mean_dist = np.where(seen, dist_sum / np.maximum(counts, 1), np.inf)
+    valid = seen & (mean_iou >= min_iou)
+    if transformer is not None:
+        valid &= mean_dist <= max_map_distance
+
+    matches = {}
+    used_prev, used_next = set(), set()
+    for flat in np.argsort(-mean_iou, axis=None):
+        i, j = np.unravel_index(flat, mean_iou.shape)
+        if not valid[i, j]:
+            continue
+        if i in used_prev or j in used_next:
+            continue
+        used_prev.add(i)
+        used_next.add(j)
+        matches[int(next_ids[j])] = int(prev_ids[i])
+    return matches
+
+
+def stitch_segments(segment_rows: Sequence[np.ndarray], segments: Sequence[Tuple[int, int]],
+                    overlap: int, transformer=None, **match_kwargs) -> np.ndarray:
+    """
+    Merge per-segment track rows into one track table with continuous IDs.
+
+    Each frame is taken from exactly one segment: the overlap window
+    [start_i, start_i + overlap) comes from segment i - 1, whose tracker is
+    already warmed up there.
+
+    Returns:
+        (M, 7) track rows sorted by frame, IDs renumbered from 1
+    """
+    stitched = []
+    next_global = 1
+    prev_global: Dict[int, int] = {}
+    prev_rows = None
+
+    for i, (rows, (start, end)) in enumerate(zip(segment_rows, segments)):
+        rows = rows.copy()
+        local_ids = np.unique(rows[:, _ID]).astype(int)
+
+        # Map local IDs of this segment to global IDs
+        matches = {}
+        if prev_rows is not None:
+            window = (start, start + overlap)
+            in_prev = (prev_rows[:, _FRAME] >= window[0]) & (prev_rows[:, _FRAME] < window[1])
+            in_next = (rows[:, _FRAME] >= window[0]) & (rows[:, _FRAME] < window[1])
+            matches = match_overlap(prev_rows[in_prev], rows[in_next], transformer, **match_kwargs)
+
+        global_ids = {}
+        for local_id in local_ids:
+            if local_id in matches:
+                global_ids[local_id] = prev_global[matches[local_id]]
+            else:
+                global_ids[local_id] = next_global
+                next_global += 1
+
+        # Keep only the frames this segment is responsible for
+        own_start = start + (overlap if i > 0 else 0)
+        own_end = end + (overlap if i < len(segments) - 1 else 0)
+        keep = (rows[:, _FRAME] >= own_start) & (rows[:, _FRAME] < own_end)
+        prev_rows = rows.copy()
+        if len(rows):
+            mapped = np.array([global_ids[local_id] for local_id in local_ids], dtype=np.float64)
+            rows[:, _ID] = mapped[np.searchsorted(local_ids, rows[:, _ID].astype(int))]
+        stitched.append(rows[keep])
+        prev_global = global_ids
+
+    table = np.concatenate(stitched) if stitched else np.empty((0, len(TRACK_COLUMNS)))
+    return table[np.argsort(table[:, _FRAME], kind="stable")]
+
+
+def track_video_parallel(video_path: str, source_points, num_segments: int,
+                         workers: Optional[int] = None, overlap: int = 30,
+                         model_path: str = "yolov8s.pt", batch_size: int = 1,
+                         expand_ratio: float = 0.15, transformer=None,
+                         roi=None, roi_imgsz: Optional[int] = None,
+                         backend: str = "torch", scene_gate: bool = False,
+                         tiles: Optional[Dict] = None) -> np.ndarray:
+    """
+    Track a whole video with a process pool, one time segment per job.
+
+    Args:
+        video_path: Input video
+        source_points: Calibration points (boundary filter)
+        num_segments: Number of time segments
+        workers: Pool size (defaults to num_segments, capped at the CPU count)
+        overlap: Frames shared by consecutive segments, used for ID stitching
+        model_path / batch_size / expand_ratio: As in the sequential pipeline
+        transformer: Optional ViewTransformer for map-position gating of matches
+        roi / roi_imgsz: Optional inference ROI, see PlayerTracker.set_roi()
+        backend: Detector backend (model_path must match it), see pipeline/backends.py
+        scene_gate: Skip non-main-camera shots and reset tracking on cuts (pipeline/scene.py)
+        tiles: plan_tiles() settings for tiled inference (pipeline/tiles.py), or None
+
+    Returns:
+        Stitched (M, 7) track rows, see TRACK_COLUMNS
+    """
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total_frames <= 0:
+        raise ValueError(f"Could not read frame count of {video_path}")
+
+    segments = plan_segments(total_frames, num_segments, overlap)
+    workers = workers or min(len(segments), os.cpu_count() or 1)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    jobs = [{
+        "video": video_path,
+        "start": start,
+        "stop": min(end + (overlap if i < len(segments) - 1 else 0), total_frames),
+        "source_points": source_points,
+        "expand_ratio": expand_ratio,
+        "model_path": model_path,
+        "batch_size": batch_size,
+        "roi": roi,
+        "roi_imgsz": roi_imgsz,
+        "backend": backend,
+        "scene_gate": scene_gate,
+        "tiles": tiles,
+        "threads": threads,
+    } for i, (start, end) in enumerate(segments)]
+
+    print(f"Tracking {total_frames} frames in {len(segments)} segments on {workers} processes...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=limit_threads, initargs=(threads,)) as pool:
+        segment_rows = list(pool.map(track_segment, jobs))
+
+    return stitch_segments(segment_rows, segments, overlap, transformer)
+
+
+class SegmentTrackReplay:
+    """Per-frame access to stitched track rows, in the track_frame() output format."""
+
+    def __init__(self, rows: np.ndarray):
+        self.rows = rows
+        frames = rows[:, _FRAME].astype(np.int64)
+        self._starts = np.searchsorted(frames, np.arange(int(frames.max()) + 2 if len(frames) else 1))
+
+    def __getitem__(self, frame_idx: int) -> List[list]:
+        """Tracks of one frame: [[id, x1, y1, x2, y2, conf], ...]"""
+        if frame_idx + 1 >= len(self._starts):
+            return []
+        block = self.rows[self._starts[frame_idx]:self._starts[frame_idx + 1]]
+        return [[int(r[_ID]), int(r[2]), int(r[3]), int(r[4]), int(r[5]), float(r[_CONF])] for r in block]
@@ -0,0 +1,424 @@
+"""
+Warm model worker service.
+
+For many short clips, loading the YOLO weights, parsing the tracker config
+and warming up the model cost more than the inference itself. Here a job
+server holds one shared job queue on a local socket
+(multiprocessing.managers); long-lived worker processes load and warm the
+model once, then pull jobs from the queue until they receive a stop marker.
+Any number of workers, on the same or on several processes, can share the
+queue.
+
+A job is a plain dict (see make_job()): the video, its calibration points
+and the output settings. The tracker is reset before every job, so no state
+carries over between clips. Each result is stored under the job id and lists
+the track file, the output video and the trajectory history it produced.
+
+The job server only accepts clients with its secret key (see
+load_authkey()): a random key is generated when the server is first started
+and stored in a user-only file, which local clients read; remote clients
+pass the key on the command line or in the CRICKET_AUTHKEY environment
+variable.
+
+A job with a checkpoint path is saved every checkpoint_interval frames
+(pipeline/checkpoint.py) and continues from its last checkpoint when it is
+run again, e.g. by the batch runner (pipeline/batch.py) after a crash.
+"""
+import os
+import queue
+import secrets
+import shutil
+import signal
+import socket
+import time
+import uuid
+from multiprocessing.managers import BaseManager, DictProxy
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_ADDRESS = ("127.0.0.1", 50055)
+AUTHKEY_ENV = "CRICKET_AUTHKEY"
+DEFAULT_AUTHKEY_FILE = os.path.join(os.path.expanduser("~"), ".cricket_tracking_authkey")
+MAP_SIZE = (400, 600)
+
+# Shared objects, living in the server process
+_jobs: "queue.Queue" = queue.Queue()
+_results: Dict[str, Dict] = {}
+
+
+def _get_jobs():
+    return _jobs
+
+
+def _get_results():
+    return _results
+
+
+class JobQueueManager(BaseManager):
+    """Serves the job queue and the result table over a local socket."""
+
+
+JobQueueManager.register("jobs", callable=_get_jobs)
+JobQueueManager.register("results", callable=_get_results, proxytype=DictProxy)
+
+
+def _ignore_sigint() -> None:
+    # Ctrl+C reaches the whole process group; only the launcher handles it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def load_authkey(value: Optional[str] = None, path: str = DEFAULT_AUTHKEY_FILE,
+                 create: bool = False) -> bytes:
+    """
+    Secret key of the job server.
+
+    Args:
+        value: Key given explicitly (e.g. --authkey); wins over everything else
+        path: Key file, used after the CRICKET_AUTHKEY environment variable
+        create: Generate a random key and save it to `path` (readable by the
+            current user only) if no key is found
+
+    Returns:
+        The key as bytes
+    """
+    value = value or os.environ.get(AUTHKEY_ENV)
+    if not value and os.path.exists(path):
+        with open(path) as f:
+            value = f.read().strip()
+    if not value:
+        if not create:
+            raise ValueError(f"No job server key: pass --authkey, set {AUTHKEY_ENV} or create {path}")
+        value = secrets.token_hex(16)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(value + "\n")
+    return value.encode()
+
+
+def start_server(address: Tuple[str, int] = DEFAULT_ADDRESS,
+                 authkey: Optional[bytes] = None) -> JobQueueManager:
+    """Start the job server in a background process (authkey defaults to load_authkey(create=True))."""
+    manager = JobQueueManager(address=address, authkey=authkey or load_authkey(create=True))
+    manager.start(initializer=_ignore_sigint)
+    return manager
+
+
+def connect(address: Tuple[str, int] = DEFAULT_ADDRESS,
+            authkey: Optional[bytes] = None) -> JobQueueManager:
+    """Connect to a running job server (authkey defaults to load_authkey())."""
+    manager = JobQueueManager(address=address, authkey=authkey or load_authkey())
+    manager.connect()
+    return manager
+
+
+def make_job(video: str, source_points: Sequence[Sequence[int]], output_dir: str = "output",
+             **config) -> Dict[str, Any]:
+    """
+    Build a job.
+
+    Args:
+        video: Input video path (as seen by the workers)
+        source_points: Calibration points of this clip's camera
+        output_dir: Directory for the job's output files
+        **config: Overrides of: expand_ratio (0.15), roi (False), roi_imgsz (None),
+            output_video (True), tracks_format ("csv" or "jsonl"), map_image (None),
+            reid (False), tiles (None, or plan_tiles() settings: tiled inference,
+            {} for the defaults), checkpoint (None: path of the job's checkpoint file),
+            checkpoint_interval (1500 frames)
+
+    Returns:
+        The job dict, with a unique "id"
+    """
+    job = {
+        "id": uuid.uuid4().hex,
+        "video": video,
+        "source_points": [[int(x), int(y)] for x, y in source_points],
+        "output_dir": output_dir,
+        "expand_ratio": 0.15,
+        "roi": False,
+        "roi_imgsz": None,
+        "output_video": True,
+        "tracks_format": "csv",
+        "map_image": None,
+        "reid": False,
+        "tiles": None,
+        "checkpoint": None,
+        "checkpoint_interval": 1500,
+    }
+    unknown = set(config) - set(job)
+    if unknown:
+        raise ValueError(f"Unknown job settings: {sorted(unknown)}")
+    job.update(config)
+    return job
+
+
+def submit(manager: JobQueueManager, job: Dict[str, Any]) -> str:
+    """Queue a job; returns its id."""
+    manager.jobs().put(job)
+    return job["id"]
+
+
+def wait_result(manager: JobQueueManager, job_id: str, timeout: Optional[float] = None,
+                poll_interval: float = 0.2) -> Dict[str, Any]:
+    """Block until a job's result is available and remove it from the server."""
+    results = manager.results()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        result = results.pop(job_id, None)
+        if result is not None:
+            return result
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"No result for job {job_id} after {timeout}s")
+        time.sleep(poll_interval)
+
+
+class ClipWorker:
+    """Loads and warms the tracker once, then processes jobs one after another."""
+
+    def __init__(self, model_path: str = "yolov8s.pt", batch_size: int = 1, backend: str = "torch",
+                 threads: Optional[int] = None, warmup_size: Tuple[int, int] = (1920, 1080)):
+        """
+        Args:
+            model_path / batch_size / backend / threads: As for PlayerTracker
+            warmup_size: (width, height) of the blank frame used for warm-up
+        """
+        from pipeline.track import PlayerTracker
+
+        self.tracker = PlayerTracker(model_path=model_path, batch_size=batch_size,
+                                     backend=backend, threads=threads)
+        self.batch_size = self.tracker.batch_size
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+
+        # One pass through detector + tracker builds the predictor and the ByteTrack state
+        start = time.perf_counter()
+        self.tracker.track_frame(np.zeros((warmup_size[1], warmup_size[0], 3), dtype=np.uint8))
+        self.tracker.reset()
+        print(f"[{self.name}] Model warm ({time.perf_counter() - start:.1f}s)")
+
+    @staticmethod
+    def _map_background(map_image: Optional[str]) -> np.ndarray:
+        if map_image:
+            image = cv2.imread(map_image)
+            if image is not None:
+                return cv2.resize(image, MAP_SIZE)
+        background = np.zeros((MAP_SIZE[1], MAP_SIZE[0], 3), dtype=np.uint8)
+        background[:] = (34, 139, 34)
+        return background
+
+    def _resume_key(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Job and worker settings a checkpoint is only valid for."""
+        keys = ("video", "source_points", "expand_ratio", "roi", "roi_imgsz", "output_video",
+                "tracks_format", "reid", "tiles")
+        # Another model or backend gives other detections and track IDs
+        return dict({key: job[key] for key in keys},
+                    model_path=self.tracker.model_path, backend=self.tracker.backend_name)
+
+    def process(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Track one clip and write its outputs. Raises on failure.
+
+        With job["checkpoint"], the clip continues from its last checkpoint;
+        the output video is then written in parts, one per checkpoint
+        interval, which are joined into one video when the clip is done.
+        """
+        from pipeline.checkpoint import load_checkpoint, remove_checkpoint, save_checkpoint
+        from pipeline.output import FrameCompositor, OutputWriter, VideoSink, concat_videos, track_sink
+        from pipeline.reid import IDMapper, ReIDGallery
+        from pipeline.render import MapRenderer, draw_tracks
+        from pipeline.tiles import plan_for
+        from pipeline.trajectory import TrajectoryStore
+        from pipeline.transformer import ViewTransformer
+        from pipeline.utils import BoundaryFilter, seek_frame
+
+        start = time.perf_counter()
+        # Fresh tracker state: no track from the previous clip may survive
+        self.tracker.reset()
+
+        cap = cv2.VideoCapture(job["video"])
+        if not cap.isOpened():
+            raise IOError(f"Could not open video file: {job['video']}")
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+        points = job["source_points"]
+        boundary_filter = BoundaryFilter(points, expand_ratio=job["expand_ratio"], frame_size=(width, height))
+        transformer = ViewTransformer(points)
+        roi = boundary_filter.bounding_rect((width, height)) if job["roi"] else None
+        self.tracker.set_roi(roi, imgsz=job["roi_imgsz"])
+        self.tracker.set_tiles(None)
+        if job["tiles"] is not None:
+            plan_for(self.tracker, points, (width, height), **job["tiles"])
+
+        os.makedirs(job["output_dir"], exist_ok=True)
+        stem = os.path.join(job["output_dir"], os.path.splitext(os.path.basename(job["video"]))[0])
+        checkpoint = job["checkpoint"]
+        outputs = {
+            "tracks": f"{stem}_tracks.{job['tracks_format']}",
+            "video": f"{stem}_tracked.mp4" if job["output_video"] else None,
+            "trajectories": f"{stem}_trajectories.npz",
+        }
+
+        compositor = map_renderer = None
+        if job["output_video"]:
+            compositor = FrameCompositor((width, height), MAP_SIZE, pool_size=2 * self.batch_size + 4)
+            map_renderer = MapRenderer(self._map_background(job["map_image"]))
+
+        def open_writer(first_frame: int, append: bool) -> OutputWriter:
+            sinks = [track_sink(outputs["tracks"], append)]
+            if compositor is not None:
+                path = f"{stem}_tracked_{first_frame:06d}.mp4" if checkpoint else outputs["video"]
+                sinks.append(VideoSink(path, fps, compositor.output_size))
+            return OutputWriter(sinks, compositor)
+
+        state = load_checkpoint(checkpoint) if checkpoint else None
+        if state is not None and state["job"] != self._resume_key(job):
+            print(f"[{self.name}] Checkpoint {checkpoint} is for other settings; starting over")
+            state = None
+        if state is not None and not (os.path.exists(outputs["tracks"])
+                                      and os.path.getsize(outputs["tracks"]) >= state["tracks_size"]):
+            print(f"[{self.name}] {outputs['tracks']} is missing or shorter than at the checkpoint; starting over")
+            state = None
+        if state is None:
+            id_mapper = IDMapper(ReIDGallery() if job["reid"] else None)
+            # Checkpointed history goes to disk, so a checkpoint never holds all of it
+            trajectories = TrajectoryStore(spill_dir=f"{stem}_chunks" if checkpoint else None)
+            frame_idx, video_parts, elapsed_before = 0, [], 0.0
+        else:
+            self.tracker.load_state(state["tracker"])
+            id_mapper, trajectories = state["id_mapper"], state["trajectories"]
+            frame_idx, video_parts, elapsed_before = state["frame"], state["video_parts"], state["elapsed"]
+            # Drop the rows written after the checkpoint; they are tracked again
+            with open(outputs["tracks"], "r+b") as f:
+                f.truncate(state["tracks_size"])
+            seek_frame(cap, frame_idx)
+            print(f"[{self.name}] Resuming {job['video']} at frame {frame_idx}")
+
+        writer = open_writer(frame_idx, append=state is not None)
+        part_start = frame_idx
+        try:
+            while True:
+                frames = []
+                while len(frames) < self.batch_size:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    frames.append(frame)
+                if not frames:
+                    break
+
+                for frame, tracks in zip(frames, self.tracker.track_batch(frames)):
+                    tracks = boundary_filter.filter_tracks(tracks)
+                    boxes = np.array([track[1:5] for track in tracks], dtype=np.int32).reshape(-1, 4)
+                    feet = np.stack([(boxes[:, 0] + boxes[:, 2]) // 2, boxes[:, 3]], axis=1)
+                    # Sub-pixel positions are stored; the map is drawn from truncated ones
+                    map_coords = transformer.transform_points(feet)
+                    map_points = map_coords.astype(np.int32).tolist()
+                    ids = id_mapper.assign(frame_idx, [track[0] for track in tracks], frame, boxes, map_coords)
+                    for player_id in id_mapper.pop_forgotten():
+                        trajectories.release(player_id)
+                    trajectories.append(frame_idx, ids, map_coords, [track[5] for track in tracks])
+
+                    canvas = None
+                    if compositor is not None:
+                        canvas = compositor.acquire()
+                        np.copyto(canvas.video, frame)
+                        draw_tracks(canvas.video, tracks, ids)
+                        map_renderer.draw(ids, map_points, out=canvas.map)
+                    writer.write(canvas, {
+                        "frame": frame_idx,
+                        "tracks": [[clean_id, int(t[1]), int(t[2]), int(t[3]), int(t[4]), round(float(t[5]), 3)]
+                                   for t, clean_id in zip(tracks, ids)],
+                    })
+                    frame_idx += 1
+
+                if checkpoint and frame_idx - part_start >= job["checkpoint_interval"]:
+                    # Close the outputs so that everything up to frame_idx is on disk
+                    writer.close()
+                    if compositor is not None:
+                        video_parts.append(f"{stem}_tracked_{part_start:06d}.mp4")
+                    save_checkpoint(checkpoint, {
+                        "job": self._resume_key(job),
+                        "frame": frame_idx,
+                        "tracker": self.tracker.save_state(),
+                        "id_mapper": id_mapper,
+                        "trajectories": trajectories,
+                        "tracks_size": os.path.getsize(outputs["tracks"]),
+                        "video_parts": video_parts,
+                        "elapsed": elapsed_before + time.perf_counter() - start,
+                    })
+                    writer = open_writer(frame_idx, append=True)
+                    part_start = frame_idx
+        finally:
+            cap.release()
+            writer.close()
+
+        if checkpoint and compositor is not None:
+            last_part = f"{stem}_tracked_{part_start:06d}.mp4"
+            if frame_idx > part_start:
+                video_parts.append(last_part)
+            elif os.path.exists(last_part):
+                os.remove(last_part)
+            # One video per clip, as without checkpoints; the parts are only
+            # deleted once the joined file is complete
+            if video_parts:
+                concat_videos(video_parts, outputs["video"], fps)
+                for part in video_parts:
+                    os.remove(part)
+            else:
+                outputs["video"] = None
+        trajectories.save_npz(outputs["trajectories"])
+        if checkpoint:
+            remove_checkpoint(checkpoint)
+            if trajectories.spill_dir:
+                shutil.rmtree(trajectories.spill_dir, ignore_errors=True)
+
+        run_seconds = time.perf_counter() - start
+        elapsed = elapsed_before + run_seconds
+        return {
+            "id": job["id"],
+            "status": "ok",
+            "video": job["video"],
+            "frames": frame_idx,
+            "resumed_from": state["frame"] if state is not None else 0,
+            "players": len(id_mapper),
+            "seconds": round(elapsed, 3),
+            "fps": round(frame_idx / elapsed, 2) if elapsed > 0 else 0.0,
+            "worker": self.name,
+            "outputs": outputs,
+        }
+
+
+def run_worker(address: Tuple[str, int] = DEFAULT_ADDRESS, authkey: Optional[bytes] = None,
+               threads: Optional[int] = None, **worker_config) -> None:
+    """
+    Worker process entry point: warm up, then serve jobs until a None job arrives.
+
+    Args:
+        address / authkey: Job server to connect to
+        threads: CPU threads for this worker (torch, OpenCV and the onnx/openvino backends)
+        **worker_config: ClipWorker arguments (model_path, batch_size, backend, ...)
+    """
+    from pipeline.segments import limit_threads
+
+    # Stopped with a None job, so the current clip is always finished
+    _ignore_sigint()
+    if threads:
+        limit_threads(threads)
+    worker = ClipWorker(threads=threads, **worker_config)
+    manager = connect(address, authkey)
+    jobs, results = manager.jobs(), manager.results()
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        print(f"[{worker.name}] Job {job['id'][:8]}: {job['video']}")
+        try:
+            result = worker.process(job)
+        except Exception as exc:  # report the failure, keep serving
+            result = {"id": job["id"], "status": "error", "video": job["video"],
+                      "error": f"{type(exc).__name__}: {exc}", "worker": worker.name}
+        results[job["id"]] = result
@@ -0,0 +1,219 @@
+"""
+Staged frame-processing engine.
+
+Decoding, inference, rendering and encoding run as separate workers joined
+by bounded queues, so a slow stage (usually YOLO) no longer leaves the
+others idle. Each stage has exactly one worker, which keeps frames in order,
+and full queues block the upstream stage (backpressure).
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Marker passed down the queues when the source is exhausted
+_END = object()
+
+# How often blocked workers wake up to check for a stop request (seconds)
+_POLL_INTERVAL = 0.1
+
+
+class Stage:
+    """A named processing step: takes one item, returns the item for the next stage."""
+
+    def __init__(self, name: str, fn: Callable[[Any], Any]):
+        """
+        Args:
+            name: Label used in the occupancy report
+            fn: Callable applied to every item passing through the stage
+        """
+        self.name = name
+        self.fn = fn
+        self.count = 0
+        self.busy_time = 0.0
+        self.wait_in_time = 0.0
+        self.wait_out_time = 0.0
+
+    def occupancy(self, elapsed: float) -> float:
+        """Fraction of the run this stage spent doing work."""
+        return self.busy_time / elapsed if elapsed > 0 else 0.0
+
+
+class StagedPipeline:
+    """
+    Runs a source and a chain of stages on worker threads.
+
+    The source iterable is consumed on its own thread (the decode stage), every
+    Stage gets its own thread, and the sink runs on the calling thread so that
+    GUI calls such as cv2.imshow stay on the main thread.
+    """
+
+    def __init__(self, source: Iterable, stages: List[Stage],
+                 queue_size: int = 4, source_name: str = "decode",
+                 sink_name: str = "encode"):
+        """
+        Args:
+            source: Iterable producing the items (e.g. decoded frames)
+            stages: Processing stages applied in order
+            queue_size: Capacity of each inter-stage queue
+            source_name: Label of the source stage in reports
+            sink_name: Label of the sink stage in reports
+        """
+        self.source = source
+        self.source_stage = Stage(source_name, lambda item: item)
+        self.stages = stages
+        self.sink_stage = Stage(sink_name, lambda item: item)
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+        self._elapsed = 0.0
+
+    def stop(self) -> None:
+        """Ask every worker to finish as soon as possible."""
+        self._stop.set()
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        """Blocking put that gives up when a stop is requested."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        """Blocking get that returns _END when a stop is requested."""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _run_source(self) -> None:
+        stage = self.source_stage
+        out_q = self.queues[0]
+        try:
+            iterator = iter(self.source)
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stage.busy_time += time.perf_counter() - start
+                stage.count += 1
+
+                start = time.perf_counter()
+                if not self._put(out_q, item):
+                    break
+                stage.wait_out_time += time.perf_counter() - start
+        except BaseException as e:  # propagate to the calling thread
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            self._put(out_q, _END)
+
+    def _run_stage(self, index: int) -> None:
+        stage = self.stages[index]
+        in_q, out_q = self.queues[index], self.queues[index + 1]
+        try:
+            while True:
+                start = time.perf_counter()
+                item = self._get(in_q)
+                stage.wait_in_time += time.perf_counter() - start
+                if item is _END:
+                    break
+
+                start = time.perf_counter()
+                result = stage.fn(item)
+                stage.busy_time += time.perf_counter() - start
+                stage.count += 1
+
+                start = time.perf_counter()
+                if not self._put(out_q, result):
+                    break
+                stage.wait_out_time += time.perf_counter() - start
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            self._put(out_q, _END)
+
+    def run(self, sink: Callable[[Any], Optional[bool]]) -> None:
+        """
+        Process every item from the source and hand the results to the sink.
+
+        Args:
+            sink: Called on the calling thread with each finished item, in
+                source order. Returning False stops the pipeline early.
+        """
+        workers = [threading.Thread(target=self._run_source, name=self.source_stage.name, daemon=True)]
+        for i, stage in enumerate(self.stages):
+            workers.append(threading.Thread(target=self._run_stage, args=(i,), name=stage.name, daemon=True))
+
+        run_start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+
+        stage = self.sink_stage
+        in_q = self.queues[-1]
+        try:
+            while True:
+                start = time.perf_counter()
+                item = self._get(in_q)
+                stage.wait_in_time += time.perf_counter() - start
+                if item is _END:
+                    break
+
+                start = time.perf_counter()
+                keep_going = sink(item)
+                stage.busy_time += time.perf_counter() - start
+                stage.count += 1
+                if keep_going is False:
+                    break
+        finally:
+            self._stop.set()
+            for worker in workers:
+                worker.join()
+            self._elapsed = time.perf_counter() - run_start
+
+        if self._errors:
+            raise self._errors[0]
+
+    def all_stages(self) -> List[Stage]:
+        return [self.source_stage] + self.stages + [self.sink_stage]
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-stage statistics of the last run.
+
+        Returns:
+            {stage_name: {"items", "busy_s", "occupancy", "wait_in_s", "wait_out_s"}}.
+            The stage with the highest occupancy is the bottleneck.
+        """
+        return {
+            stage.name: {
+                "items": stage.count,
+                "busy_s": stage.busy_time,
+                "occupancy": stage.occupancy(self._elapsed),
+                "wait_in_s": stage.wait_in_time,
+                "wait_out_s": stage.wait_out_time,
+            }
+            for stage in self.all_stages()
+        }
+
+    def format_report(self) -> str:
+        """Human-readable occupancy table for the last run."""
+        stats = self.report()
+        bottleneck = max(stats, key=lambda name: stats[name]["occupancy"])
+        lines = [f"Stage occupancy over {self._elapsed:.1f}s:"]
+        for name, s in stats.items():
+            marker = "  <- bottleneck" if name == bottleneck else ""
+            lines.append(
+                f"  {name:<8} {s['occupancy'] * 100:5.1f}% busy | "
+                f"{int(s['items'])} items | starved {s['wait_in_s']:.1f}s | "
+                f"blocked {s['wait_out_s']:.1f}s{marker}"
+            )
+        return "\n".join(lines)
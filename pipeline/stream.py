@@ -0,0 +1,410 @@
+"""
+Live stream ingestion with bounded latency.
+
+A reader thread pulls frames from any FrameSource (video file, RTSP/HTTP URL,
+raw BGR frames on a pipe, or a Python generator) into a small buffer, so a
+live source is drained at its own pace even when tracking falls behind. The
+StreamProcessor then hands frames to the tracker and applies a drop policy
+whenever a frame is older than the latency budget:
+
+* "drop_oldest":    discard buffered frames older than the budget
+* "latest":         always jump to the newest frame, discarding the rest
+* "skip_detection": keep every frame, but run the detector only on frames
+                    within the budget and predict tracks on the late ones
+
+Sources that are not live (a file read without realtime pacing, a
+generator) wait for the tracker instead, so no frame is dropped.
+
+run_pipeline.py sends the results to the same output sinks as file
+processing (pipeline/output.py). Code embedding the StreamProcessor can
+also give it a TrackChannel, which never blocks tracking and is read from a
+thread or with `async for`.
+"""
+import asyncio
+import queue
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+DROP_POLICIES = ("drop_oldest", "latest", "skip_detection")
+
+# Marker put in the buffer / channel when the stream ends
+_END = object()
+
+
+# ----------------------------------------------------------------------
+# Frame sources
+# ----------------------------------------------------------------------
+class FrameSource(ABC):
+    """
+    Iterable of BGR frames with the stream's frame size and nominal FPS.
+    `live` sources produce frames whether or not they are read (cameras,
+    network streams); the others wait for the reader.
+    """
+
+    width = 0
+    height = 0
+    fps = 0.0
+    live = True
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """Frames in stream order; ends with the stream."""
+
+    def close(self) -> None:
+        pass
+
+
+class VideoSource(FrameSource):
+    """A video file or network stream (RTSP/HTTP) read with cv2.VideoCapture."""
+
+    def __init__(self, uri: str, realtime: bool = False):
+        """
+        Args:
+            uri: File path or stream URL
+            realtime: Pace reading at the video's FPS, so a file behaves like
+                a live camera (frames keep coming whether or not we keep up)
+        """
+        self.uri = uri
+        self.realtime = realtime
+        # A local file is only live when paced like a camera
+        self.live = realtime or "://" in uri
+        self.cap = cv2.VideoCapture(uri)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video source: {uri}")
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = float(self.cap.get(cv2.CAP_PROP_FPS)) or 25.0
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        start = time.perf_counter()
+        index = 0
+        while True:
+            if self.realtime:
+                delay = start + index / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            ret, frame = self.cap.read()
+            if not ret:
+                return
+            index += 1
+            yield frame
+
+    def close(self) -> None:
+        self.cap.release()
+
+
+class PipeSource(FrameSource):
+    """
+    Raw bgr24 frames of a known size read from a binary stream, e.g.
+    `ffmpeg -i <input> -f rawvideo -pix_fmt bgr24 - | run_pipeline.py --input -`.
+    """
+
+    def __init__(self, stream, width: int, height: int, fps: float = 25.0):
+        self.stream = stream
+        self.width = width
+        self.height = height
+        self.fps = fps
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        frame_bytes = self.width * self.height * 3
+        while True:
+            frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+            view = memoryview(frame).cast("B")
+            filled = 0
+            while filled < frame_bytes:
+                count = self.stream.readinto(view[filled:])
+                if not count:
+                    return  # end of stream (a partial last frame is dropped)
+                filled += count
+            yield frame
+
+
+class GeneratorSource(FrameSource):
+    """Frames produced by any Python iterable (e.g. a generator)."""
+
+    def __init__(self, frames: Iterable[np.ndarray], width: int = 0, height: int = 0,
+                 fps: float = 25.0, live: bool = False):
+        """
+        Args:
+            frames: Iterable of BGR frames
+            width / height: Frame size (0 = taken from the first frame)
+            fps: Nominal frame rate
+            live: The iterable produces frames in real time (e.g. a camera
+                callback), so late frames may be dropped
+        """
+        self.frames = frames
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.live = live
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for frame in self.frames:
+            if not self.width:
+                self.height, self.width = frame.shape[:2]
+            yield frame
+
+
+def open_source(uri: str, realtime: bool = False, pipe_size: Optional[Tuple[int, int]] = None,
+                fps: float = 25.0) -> FrameSource:
+    """
+    Frame source for a command-line input: "-" reads raw frames from stdin
+    (pipe_size = (width, height) required), anything else goes to cv2.VideoCapture.
+    """
+    if uri == "-":
+        if not pipe_size:
+            raise ValueError("Reading raw frames from stdin needs the frame size (WIDTHxHEIGHT)")
+        return PipeSource(sys.stdin.buffer, pipe_size[0], pipe_size[1], fps)
+    return VideoSource(uri, realtime=realtime)
+
+
+# ----------------------------------------------------------------------
+# Output channel
+# ----------------------------------------------------------------------
+class TrackChannel:
+    """
+    Bounded, thread-safe channel of per-frame results.
+
+    publish() never blocks the pipeline: if consumers fall behind, the oldest
+    unread message is dropped. Consumers iterate over the channel from a
+    thread, or use `async for message in channel` inside an asyncio loop.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        with self._lock:
+            self._put(message)
+            self.published += 1
+
+    def close(self) -> None:
+        """Signal the end of the stream to consumers."""
+        with self._lock:
+            self._put(_END)
+
+    def _put(self, item: Any) -> None:
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next message, or None once the channel is closed."""
+        item = self._queue.get(timeout=timeout)
+        if item is _END:
+            # Leave the marker for any other consumer
+            self._queue.put(_END)
+            return None
+        return item
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        while True:
+            message = self.get()
+            if message is None:
+                return
+            yield message
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await loop.run_in_executor(None, self.get)
+            if message is None:
+                return
+            yield message
+
+
+# ----------------------------------------------------------------------
+# Processor
+# ----------------------------------------------------------------------
+class StreamFrame:
+    """One processed frame."""
+
+    __slots__ = ("index", "captured", "frame", "tracks", "detected", "lag")
+
+    def __init__(self, index: int, captured: float, frame: np.ndarray, tracks: List[list],
+                 detected: bool, lag: float):
+        self.index = index          # Position in the source stream (gaps = dropped frames)
+        self.captured = captured    # time.perf_counter() when the frame was read
+        self.frame = frame
+        self.tracks = tracks        # [id, x1, y1, x2, y2, conf]
+        self.detected = detected    # False if the tracks were predicted (skip_detection)
+        self.lag = lag              # Seconds between capture and the start of tracking
+
+
+class StreamProcessor:
+    """
+    Tracks a live source within a latency budget.
+
+    Iterating over the processor yields a StreamFrame for every frame that was
+    not dropped, in stream order.
+    """
+
+    def __init__(self, source: FrameSource, tracker, latency_budget: float = 0.5,
+                 policy: str = "drop_oldest", buffer_size: int = 8,
+                 channel: Optional[TrackChannel] = None, drop: Optional[bool] = None):
+        """
+        Args:
+            source: Frame source (read on a background thread)
+            tracker: PlayerTracker (anything with track_frame()); for
+                "skip_detection" it must also have predict_frame(), see
+                AdaptiveStrideTracker
+            latency_budget: Maximum age (seconds) of a frame when tracking starts
+            policy: One of DROP_POLICIES
+            buffer_size: Frames buffered between the reader and the tracker;
+                when full, the oldest frame is dropped (live sources) or the
+                reader waits
+            channel: Optional TrackChannel; every processed frame is published
+                on it as {"frame", "lag_ms", "detected", "tracks"} and it is
+                closed at the end of the stream
+            drop: Apply the drop policy. None: only for live sources
+                (source.live), so an offline file is never thinned out
+        """
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{policy}', expected one of {DROP_POLICIES}")
+        if policy == "skip_detection" and not hasattr(tracker, "predict_frame"):
+            raise ValueError("The skip_detection policy needs a tracker with predict_frame()")
+        self.source = source
+        self.tracker = tracker
+        self.latency_budget = latency_budget
+        self.policy = policy
+        self.channel = channel
+        self.drop = getattr(source, "live", True) if drop is None else drop
+        self.buffer_size = max(1, buffer_size)
+
+        maxlen = (1 if policy == "latest" else self.buffer_size) if self.drop else None
+        self._buffer: Deque[Any] = deque(maxlen=maxlen)
+        self._ready = threading.Condition()
+        self._stop = threading.Event()
+        self._reader: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.detections_skipped = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def stop(self) -> None:
+        """Stop reading; iteration ends after the current frame."""
+        self._stop.set()
+        with self._ready:
+            self._ready.notify_all()
+
+    def _read(self) -> None:
+        try:
+            for index, frame in enumerate(self.source):
+                if self._stop.is_set():
+                    break
+                with self._ready:
+                    if not self.drop:
+                        # Offline source: wait for the tracker instead of dropping
+                        while len(self._buffer) >= self.buffer_size and not self._stop.is_set():
+                            self._ready.wait(0.1)
+                    elif len(self._buffer) == self._buffer.maxlen:
+                        self.frames_dropped += 1  # deque drops the oldest
+                    self._buffer.append((index, time.perf_counter(), frame))
+                    self.frames_read += 1
+                    self._ready.notify()
+        except BaseException as exc:  # re-raised on the consumer side
+            self._error = exc
+        finally:
+            with self._ready:
+                self._append_end()
+                self._ready.notify_all()
+            # Closed by the reader itself, so the source is never released
+            # under a read() that is still blocked (common on RTSP)
+            self.source.close()
+
+    def _append_end(self) -> None:
+        # The end marker must never push out a frame, so it bypasses maxlen
+        frames = list(self._buffer)
+        self._buffer = deque(frames + [_END])
+
+    def _next(self) -> Optional[Tuple[int, float, np.ndarray]]:
+        """Next frame to process according to the drop policy, or None at the end."""
+        with self._ready:
+            while not self._buffer and not self._stop.is_set():
+                self._ready.wait(0.1)
+            if self._stop.is_set() or self._buffer[0] is _END:
+                return None
+
+            if self.drop and self.policy == "drop_oldest":
+                now = time.perf_counter()
+                # Skip stale frames as long as a newer frame is waiting
+                while (len(self._buffer) > 1 and self._buffer[1] is not _END
+                       and now - self._buffer[0][1] > self.latency_budget):
+                    self._buffer.popleft()
+                    self.frames_dropped += 1
+            item = self._buffer.popleft()
+            self._ready.notify_all()  # room for a waiting reader
+            return item
+
+    def __iter__(self) -> Iterator[StreamFrame]:
+        self._reader = threading.Thread(target=self._read, name="stream-reader", daemon=True)
+        self._reader.start()
+        try:
+            while True:
+                item = self._next()
+                if item is None:
+                    break
+                index, captured, frame = item
+                lag = time.perf_counter() - captured
+                detected = not (self.drop and self.policy == "skip_detection" and lag > self.latency_budget)
+                if detected:
+                    tracks = self.tracker.track_frame(frame)
+                else:
+                    tracks = self.tracker.predict_frame(frame)
+                    self.detections_skipped += 1
+
+                self.frames_processed += 1
+                self.total_lag += lag
+                self.max_lag = max(self.max_lag, lag)
+                if self.channel is not None:
+                    self.channel.publish({
+                        "frame": index,
+                        "lag_ms": round(1000 * lag, 1),
+                        "detected": detected,
+                        "tracks": [[int(t[0]), int(t[1]), int(t[2]), int(t[3]), int(t[4]), round(float(t[5]), 3)]
+                                   for t in tracks],
+                    })
+                yield StreamFrame(index, captured, frame, tracks, detected, lag)
+        finally:
+            self.stop()
+            if self.channel is not None:
+                self.channel.close()
+            # The reader closes the source once its current read() returns
+            self._reader.join(timeout=1.0)
+        if self._error is not None:
+            raise self._error
+
+    def stats(self) -> Dict[str, float]:
+        """Frame counts and latency of the run so far."""
+        return {
+            "frames_read": self.frames_read,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped,
+            "detections_skipped": self.detections_skipped,
+            "mean_lag_ms": 1000 * self.total_lag / self.frames_processed if self.frames_processed else 0.0,
+            "max_lag_ms": 1000 * self.max_lag,
+        }
@@ -0,0 +1,135 @@
+"""
+Synthetic cricket-like clips and a deterministic stand-in tracker.
+
+Used by the benchmark (scripts/benchmark.py) so throughput can be measured
+offline on CPU, without the match video or YOLO weights.
+"""
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+
+class SyntheticClip:
+    """
+    Player blobs walking on a green field, with known boxes and IDs.
+
+    The field is a trapezoid (far side narrower, like a broadcast camera view);
+    its corners are exposed as `source_points` for the ViewTransformer and
+    BoundaryFilter.
+    """
+
+    def __init__(self, width: int = 1280, height: int = 720, num_frames: int = 300,
+                 num_players: int = 22, seed: int = 0):
+        self.width = width
+        self.height = height
+        self.num_frames = num_frames
+        self.num_players = num_players
+
+        # Field corners: Top-Left, Top-Right, Bottom-Right, Bottom-Left
+        self.source_points = [
+            [int(width * 0.20), int(height * 0.15)],
+            [int(width * 0.80), int(height * 0.15)],
+            [int(width * 0.95), int(height * 0.90)],
+            [int(width * 0.05), int(height * 0.90)],
+        ]
+
+        rng = np.random.default_rng(seed)
+        # Smooth random walks in normalised field coordinates (u across, v down)
+        start = rng.uniform(0.1, 0.9, size=(num_players, 2))
+        steps = rng.normal(0, 0.002, size=(num_frames, num_players, 2))
+        uv = np.clip(start + np.cumsum(steps, axis=0), 0.02, 0.98)
+
+        # Field -> image: interpolate between the far and near edges
+        (tlx, tly), (trx, _), (brx, bry), (blx, _) = self.source_points
+        v = uv[..., 1]
+        left = tlx + (blx - tlx) * v
+        right = trx + (brx - trx) * v
+        foot_x = left + (right - left) * uv[..., 0]
+        foot_y = tly + (bry - tly) * v
+
+        # Players look bigger closer to the camera
+        box_h = height * (0.04 + 0.08 * v)
+        box_w = box_h * 0.4
+        self.boxes = np.stack([foot_x - box_w / 2, foot_y - box_h, foot_x + box_w / 2, foot_y],
+                              axis=-1).astype(np.float32)  # (frames, players, 4)
+        self.colors = rng.integers(0, 255, size=(num_players, 3))
+
+        self._background = np.zeros((height, width, 3), dtype=np.uint8)
+        self._background[:] = (30, 110, 40)
+        cv2.fillPoly(self._background, [np.array(self.source_points, dtype=np.int32)], (50, 160, 60))
+
+    def frame(self, index: int) -> np.ndarray:
+        """Render one frame (BGR)."""
+        frame = self._background.copy()
+        for (x1, y1, x2, y2), color in zip(self.boxes[index].astype(int), self.colors.tolist()):
+            center = ((x1 + x2) // 2, (y1 + y2) // 2)
+            axes = (max(1, (x2 - x1) // 2), max(1, (y2 - y1) // 2))
+            cv2.ellipse(frame, center, axes, 0, 0, 360, color, -1)
+        return frame
+
+    def write(self, path: str, fps: int = 25) -> None:
+        """Encode the clip to a video file (mp4v)."""
+        out = cv2.VideoWriter(path, 0x7634706D, fps, (self.width, self.height))
+        for i in range(self.num_frames):
+            out.write(self.frame(i))
+        out.release()
+
+
+class FakeTracker:
+    """
+    Deterministic stand-in for PlayerTracker that returns the clip's known
+    boxes (with seeded jitter and occasional misses). Frames are consumed in
+    order; the frame content is ignored.
+    """
+
+    def __init__(self, clip: SyntheticClip, jitter: float = 1.5, miss_rate: float = 0.02,
+                 seed: int = 0):
+        self.clip = clip
+        self.jitter = jitter
+        self.miss_rate = miss_rate
+        self.seed = seed
+        self.frame_index = 0
+
+    def _frame_detections(self, index: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rng = np.random.default_rng((self.seed, index))
+        boxes = self.clip.boxes[index % self.clip.num_frames]
+        boxes = boxes + rng.normal(0, self.jitter, size=boxes.shape)
+        conf = rng.uniform(0.4, 0.95, size=len(boxes))
+        keep = rng.random(len(boxes)) >= self.miss_rate
+        ids = np.arange(1, len(boxes) + 1)
+        return ids[keep], boxes[keep], conf[keep]
+
+    def track_frame(self, frame) -> List[list]:
+        """Same output as PlayerTracker.track_frame(): [id, x1, y1, x2, y2, conf]."""
+        ids, boxes, conf = self._frame_detections(self.frame_index)
+        self.frame_index += 1
+        return [[int(i), int(b[0]), int(b[1]), int(b[2]), int(b[3]), float(c)]
+                for i, b, c in zip(ids, boxes, conf)]
+
+    def track_batch(self, frames, batch_size=None) -> List[List[list]]:
+        return [self.track_frame(frame) for frame in frames]
+
+    def set_roi(self, roi, imgsz=None) -> None:
+        pass
+
+    def set_tiles(self, plan) -> None:
+        pass
+
+    def reset(self) -> None:
+        pass
+
+    def save_state(self) -> dict:
+        return {"frame_index": self.frame_index}
+
+    def load_state(self, state: dict) -> None:
+        self.frame_index = state["frame_index"]
+
+    def detect_frames(self, frames, batch_size=None) -> List[np.ndarray]:
+        """Same output as PlayerTracker.detect_frames(): (N, 5) per frame."""
+        detections = []
+        for _ in frames:
+            _, boxes, conf = self._frame_detections(self.frame_index)
+            self.frame_index += 1
+            detections.append(np.concatenate([boxes, conf[:, None]], axis=1).astype(np.float32))
+        return detections
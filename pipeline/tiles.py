@@ -0,0 +1,278 @@
+"""
+Tiled inference planned from the calibration geometry.
+
+A full-frame pass at imgsz=1280 spends the same resolution on every part of
+the frame, although only the far side of the pitch has small players. Here
+the expanded pitch boundary is covered with overlapping square tiles that
+are all run at the same model input size (tile_size), in one batched
+detector call:
+
+* Far rows get small tiles, so they are upscaled more; near rows get large
+  tiles, so they are downscaled. The tile side of a row is chosen so that a
+  player standing on that row is about target_height model pixels tall,
+  using the pixels per metre given by the calibration homography.
+* Tiles that do not touch the expanded boundary are not run at all.
+* Consecutive tiles overlap by more than the height of a player, so every
+  player is complete in at least one tile. Boxes cut by an inner tile edge
+  are dropped when another tile holds the complete player, then duplicates
+  from the overlaps are merged with NMS.
+
+The plan depends only on the calibration (and frame size), so it is made
+once per camera, or again when the camera moves (--track-camera).
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from pipeline.analytics import DEFAULT_FIELD_SIZE, MAP_RECT
+from pipeline.backends import nms
+from pipeline.transformer import ViewTransformer
+from pipeline.utils import BoundaryFilter
+
+# Samples along a row used to find its smallest players
+_ROW_SAMPLES = 16
+# Tile sizes tried by plan_tiles(tile_size=None), multiples of the model stride
+TILE_SIZES = tuple(range(256, 641, 32))
+
+
+class TilePlan:
+    """Tiles of one camera view, and the merging of their detections."""
+
+    def __init__(self, tiles, tile_size: int, bounds: Sequence[int]):
+        """
+        Args:
+            tiles: (K, 4) [x1, y1, x2, y2] tiles in frame pixels (x2 / y2 exclusive)
+            tile_size: Model input size every tile is letterboxed to
+            bounds: (x1, y1, x2, y2) area covered by the tiles; tile edges on
+                it are outer edges (no neighbouring tile beyond them)
+        """
+        self.tiles = np.asarray(tiles, dtype=np.int64).reshape(-1, 4)
+        if not len(self.tiles):
+            raise ValueError("A tile plan needs at least one tile")
+        self.tile_size = int(tile_size)
+        self.bounds = tuple(int(v) for v in bounds)
+        # (K, 4) left / top / right / bottom edge has a neighbouring tile
+        x1, y1, x2, y2 = self.bounds
+        self._inner_edges = np.stack([self.tiles[:, 0] > x1, self.tiles[:, 1] > y1,
+                                      self.tiles[:, 2] < x2, self.tiles[:, 3] < y2], axis=1)
+
+    def __len__(self) -> int:
+        return len(self.tiles)
+
+    @property
+    def pixels(self) -> int:
+        """Model input pixels per frame (the detector cost of the plan)."""
+        return len(self.tiles) * self.tile_size ** 2
+
+    def to_dict(self) -> Dict:
+        """Plain description (cache keys, segment jobs); TilePlan(**d) rebuilds it."""
+        return {"tiles": self.tiles.tolist(), "tile_size": self.tile_size, "bounds": list(self.bounds)}
+
+    def crops(self, frame: np.ndarray) -> List[np.ndarray]:
+        """The tiles of a frame (views, no copies)."""
+        return [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self.tiles]
+
+    def merge(self, tile_detections: Sequence[np.ndarray], iou: float = 0.45,
+              containment: float = 0.6, edge_margin: float = 2.0) -> np.ndarray:
+        """
+        Combine the detections of one frame's tiles.
+
+        Args:
+            tile_detections: One (N, 5) [x1, y1, x2, y2, score] array per tile,
+                in tile pixels (in the order of self.tiles)
+            iou: NMS threshold for duplicates from overlapping tiles
+            containment: A box cut by an inner tile edge is dropped when this
+                fraction of it lies inside a complete box from another tile
+            edge_margin: Pixels from a tile edge within which a box counts as cut
+
+        Returns:
+            (M, 5) float32 detections in frame pixels
+        """
+        counts = [len(d) for d in tile_detections]
+        if not sum(counts):
+            return np.empty((0, 5), dtype=np.float32)
+        detections = np.concatenate([d for d in tile_detections if len(d)]).astype(np.float32)
+        owner = np.repeat(np.arange(len(self.tiles)), counts)
+        tiles = self.tiles[owner]
+        detections[:, [0, 2]] += tiles[:, [0]]
+        detections[:, [1, 3]] += tiles[:, [1]]
+        boxes = detections[:, :4]
+
+        # Cut boxes: touching an edge that has a neighbouring tile
+        near_edge = np.stack([boxes[:, 0] <= tiles[:, 0] + edge_margin,
+                              boxes[:, 1] <= tiles[:, 1] + edge_margin,
+                              boxes[:, 2] >= tiles[:, 2] - edge_margin,
+                              boxes[:, 3] >= tiles[:, 3] - edge_margin], axis=1)
+        cut = (near_edge & self._inner_edges[owner]).any(axis=1)
+
+        keep = np.ones(len(detections), dtype=bool)
+        if cut.any() and (~cut).any():
+            partial, whole = np.flatnonzero(cut), np.flatnonzero(~cut)
+            a, b = boxes[partial], boxes[whole]
+            inter_w = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+            inter_h = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+            inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+            area = np.maximum((a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]), 1e-9)
+            covered = (inter / area[:, None] >= containment) & (owner[partial][:, None] != owner[whole][None, :])
+            keep[partial[covered.any(axis=1)]] = False
+
+        detections = detections[keep]
+        return detections[nms(detections[:, :4], detections[:, 4], iou)]
+
+
+def _pixels_per_metre(transformer: ViewTransformer, points: np.ndarray,
+                      field_size: Tuple[float, float]) -> np.ndarray:
+    """
+    Image pixels per metre on the ground at frame points, along the less
+    foreshortened ground axis (about the scale of a standing player there).
+    Points are first clamped onto the calibrated rectangle, so rows beyond
+    the pitch (or above the horizon) get the scale of its nearest edge.
+    """
+    map_x, map_y, map_w, map_h = MAP_RECT
+    ground = transformer.transform_points(points)
+    ground[:, 0] = ground[:, 0].clip(map_x, map_x + map_w)
+    ground[:, 1] = ground[:, 1].clip(map_y, map_y + map_h)
+    step = np.array([map_w / field_size[0], map_h / field_size[1]])  # map pixels per metre
+    origin = transformer.inverse_transform_points(ground)
+    along_x = transformer.inverse_transform_points(ground + [step[0], 0.0])
+    along_y = transformer.inverse_transform_points(ground + [0.0, step[1]])
+    return np.maximum(np.linalg.norm(along_x - origin, axis=1), np.linalg.norm(along_y - origin, axis=1))
+
+
+def _spread(start: int, stop: int, side: int, overlap: int) -> List[int]:
+    """Tile origins covering [start, stop) with tiles of `side`, overlapping by at least `overlap`."""
+    if stop - start <= side:
+        return [start]
+    count = int(np.ceil((stop - start - side) / max(1, side - overlap))) + 1
+    return [int(round(v)) for v in np.linspace(start, stop - side, count)]
+
+
+def plan_tiles(source_points: Sequence[Sequence[float]], frame_size: Tuple[int, int],
+               tile_size: Optional[int] = None, target_height: Optional[float] = None, imgsz: int = 1280,
+               player_height: float = 1.8, field_size: Tuple[float, float] = DEFAULT_FIELD_SIZE,
+               expand_ratio: float = 0.15, min_zoom: float = 0.2, max_zoom: float = 2.0) -> TilePlan:
+    """
+    Plan the tiles of a camera view.
+
+    Args:
+        source_points: Calibration points (Top-Left, Top-Right, Bottom-Right, Bottom-Left)
+        frame_size: (width, height) of the video
+        tile_size: Model input size of every tile. None: the size in TILE_SIZES
+            with the fewest model pixels per frame (use the model's size for
+            exported models with a fixed input shape)
+        target_height: Model pixels of a player at the far edge of each band.
+            None: the height a full-frame pass at `imgsz` gives the farthest
+            players, so distant players get at least that resolution
+        imgsz: Full-frame inference size the default target is taken from
+        player_height: Player height in metres
+        field_size: (width, length) in metres of the calibrated rectangle
+        expand_ratio: Boundary expansion, as for the BoundaryFilter
+        min_zoom / max_zoom: Limits of the tile scale factor
+
+    Returns:
+        TilePlan (tiles ordered far to near, left to right)
+
+    Raises:
+        ValueError: The expanded pitch boundary does not overlap the frame
+    """
+    if tile_size is None:
+        plans = [plan_tiles(source_points, frame_size, size, target_height, imgsz, player_height,
+                            field_size, expand_ratio, min_zoom, max_zoom) for size in TILE_SIZES]
+        return min(plans, key=lambda plan: plan.pixels)
+
+    width, height = frame_size
+    boundary_filter = BoundaryFilter(source_points, expand_ratio=expand_ratio, frame_size=frame_size)
+    bounds = boundary_filter.bounding_rect(frame_size)
+    x1, y1, x2, y2 = bounds
+    polygon = boundary_filter.boundary.astype(np.float32)
+    if x2 <= x1 or y2 <= y1 or cv2.intersectConvexConvex(
+            np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32), polygon)[0] <= 0:
+        raise ValueError(f"The pitch lies outside the {width}x{height} frame, there is nothing to tile; "
+                         f"check the calibration points {np.asarray(source_points).tolist()}")
+    transformer = ViewTransformer(source_points)
+
+    def row_scale(y: float, reduce) -> float:
+        xs = np.linspace(x1, x2 - 1, _ROW_SAMPLES)
+        points = np.stack([xs, np.full_like(xs, y)], axis=1)
+        inside = [cv2.pointPolygonTest(polygon, (float(x), float(y)), False) >= 0 for x in xs]
+        if any(inside):
+            points = points[inside]
+        return float(reduce(_pixels_per_metre(transformer, points, field_size)))
+
+    if target_height is None:
+        # Farthest players of a full-frame run: letterboxed by imgsz / longest side
+        target_height = player_height * row_scale(y1, np.min) * imgsz / max(width, height)
+
+    tiles = []
+    top = y1
+    while True:
+        # Smallest players of the band are on its top row
+        zoom = float(np.clip(target_height / (player_height * row_scale(top, np.min)), min_zoom, max_zoom))
+        side = int(min(np.ceil(tile_size / zoom), x2 - x1, y2 - y1))
+        band_top = min(top, y2 - side)
+        # Overlap: the tallest player of the band (on its bottom row), so none is cut in both tiles
+        overlap = int(np.ceil(1.2 * player_height * row_scale(min(band_top + side, y2) - 1, np.max)))
+        overlap = min(overlap, side // 2)
+        for left in _spread(x1, x2, side, overlap):
+            rect = np.array([[left, band_top], [left + side, band_top], [left + side, band_top + side],
+                             [left, band_top + side]], dtype=np.float32)
+            area, _ = cv2.intersectConvexConvex(rect, polygon)
+            if area > 0:
+                tiles.append([left, band_top, left + side, band_top + side])
+        if band_top + side >= y2:
+            break
+        top = band_top + side - overlap
+    return TilePlan(tiles, tile_size, bounds)
+
+
+def full_frame_pixels(frame_size: Tuple[int, int], imgsz: int = 1280) -> int:
+    """Model input pixels of a full-frame pass: longest side at imgsz, short side padded to the stride."""
+    width, height = frame_size
+    return imgsz * int(np.ceil(imgsz * min(width, height) / max(width, height) / 32) * 32)
+
+
+def describe(plan: TilePlan, frame_size: Tuple[int, int], imgsz: int = 1280) -> str:
+    """One-line summary of a plan against a full-frame pass at imgsz."""
+    sides = plan.tiles[:, 2] - plan.tiles[:, 0]
+    full = full_frame_pixels(frame_size, imgsz)
+    return (f"{len(plan)} tiles at {plan.tile_size}px (scale {plan.tile_size / sides.max():.2f} near "
+            f"to {plan.tile_size / sides.min():.2f} far), {plan.pixels / 1e6:.2f} MPix per frame "
+            f"vs {full / 1e6:.2f} MPix at imgsz={imgsz}")
+
+
+def plan_for(tracker, source_points: Sequence[Sequence[float]], frame_size: Tuple[int, int],
+             force: bool = False, **settings) -> Optional[TilePlan]:
+    """
+    Plan the tiles of a camera view and switch a PlayerTracker to them.
+
+    Exported models with a fixed input shape letterbox every tile to that
+    shape anyway, so their size is used as tile_size. When the plan costs
+    more model pixels than a full-frame pass (a view with little
+    perspective), the tracker stays on whole-frame inference unless force is set.
+
+    Args:
+        tracker: PlayerTracker
+        source_points / frame_size: As for plan_tiles()
+        force: Use the tiles even when they cost more than a full-frame pass
+        **settings: Other plan_tiles() arguments (e.g. a camera's "tiling" calibration entry)
+
+    Returns:
+        The TilePlan now used by the tracker, or None for whole-frame inference
+
+    Raises:
+        ValueError: The pitch lies outside the frame (see plan_tiles())
+    """
+    backend = getattr(tracker, "backend", None)
+    imgsz = settings.get("imgsz", 1280)
+    if backend is not None and getattr(backend, "static_shape", False):
+        settings["tile_size"] = imgsz = backend.imgsz
+    plan = plan_tiles(source_points, frame_size, **settings)
+    if not force and plan.pixels > full_frame_pixels(frame_size, imgsz):
+        print(f"Tiled inference not used: {describe(plan, frame_size, imgsz)}. This view has too little "
+              "perspective for tiles to save work; whole-frame inference is cheaper. Use --force-tiles "
+              "(or \"force\": true in the camera's tiling settings) to tile anyway")
+        tracker.set_tiles(None)
+        return None
+    tracker.set_tiles(plan)
+    return plan
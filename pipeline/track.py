@@ -1,71 +1,452 @@
 from ultralytics import YOLO  # type: ignore
 import cv2
 import os
+import numpy as np
+
+from pipeline.backends import create_backend
+
+# Detection settings shared by tracking, plain detection and the detection cache
+DETECTION_PARAMS = {
+    'conf': 0.25,      # Lower confidence to catch more players
+    'iou': 0.45,       # Adjusted IoU for better overlap handling
+    'imgsz': 1280,     # Higher resolution for better accuracy
+    'classes': [0],    # Only track persons (class 0)
+}
+
+
+def resolve_tracker_config(verbose=True):
+    """
+    Path to the custom ByteTrack config (optimized for cricket),
+    falling back to the ultralytics default if it doesn't exist.
+    """
+    tracker_config = os.path.join(
+        os.path.dirname(__file__), 
+        'custom_bytetrack.yaml'
+    )
+    
+    if not os.path.exists(tracker_config):
+        if verbose:
+            print("Warning: Custom tracker config not found, using default bytetrack.yaml")
+        return "bytetrack.yaml"
+    if verbose:
+        print(f"Using custom tracker config: {tracker_config}")
+    return tracker_config
+
+
+class _Detections:
+    """
+    Minimal stand-in for ultralytics Boxes, holding (N, 5) [x1, y1, x2, y2, score]
+    rows. BYTETracker.update() only needs these attributes and boolean indexing.
+    """
+
+    def __init__(self, data):
+        self.data = np.asarray(data, dtype=np.float32).reshape(-1, 5)
+
+    @property
+    def xyxy(self):
+        return self.data[:, :4]
+
+    @property
+    def xywh(self):
+        xyxy = self.data[:, :4]
+        return np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+
+    @property
+    def conf(self):
+        return self.data[:, 4]
+
+    @property
+    def cls(self):
+        return np.zeros(len(self.data), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        return _Detections(self.data[index])
+
+
+class ByteTrackStep:
+    """
+    Standalone ByteTrack: turns per-frame detections into tracks without
+    running YOLO, e.g. when replaying detections from the cache.
+    """
+
+    def __init__(self, tracker_config=None, frame_rate=30):
+        """
+        tracker_config: ByteTrack YAML (defaults to the custom cricket config).
+        frame_rate: Frame rate given to ByteTrack (ultralytics tracking uses 30).
+        """
+        from ultralytics.trackers.byte_tracker import BYTETracker  # type: ignore
+        from ultralytics.utils import IterableSimpleNamespace  # type: ignore
+        from ultralytics.utils.checks import check_yaml  # type: ignore
+        try:
+            from ultralytics.utils import YAML  # type: ignore
+            yaml_load = YAML.load
+        except ImportError:  # ultralytics < 8.3.x
+            from ultralytics.utils import yaml_load  # type: ignore
+
+        self.tracker_config = tracker_config or resolve_tracker_config(verbose=False)
+        self.frame_rate = frame_rate
+        args = IterableSimpleNamespace(**yaml_load(check_yaml(self.tracker_config)))
+
+        def make_tracker():
+            try:
+                return BYTETracker(args=args, frame_rate=frame_rate)
+            except TypeError:  # newer ultralytics: no frame_rate argument
+                return BYTETracker(args=args)
+
+        self._make_tracker = make_tracker
+        self.tracker = self._make_tracker()
+        # IDs restart after a reset; shifting them keeps every ID unique per instance
+        self._id_base = 0
+        self._max_id = 0
+
+    def update(self, detections):
+        """
+        detections: (N, 5) array of [x1, y1, x2, y2, score] for one frame.
+        Output: A list of tracks: [id, x1, y1, x2, y2, conf]
+        """
+        tracks = self.tracker.update(_Detections(detections))
+        # Rows are [x1, y1, x2, y2, id, score, cls, idx]
+        tracks = [
+            [int(t[4]) + self._id_base, int(t[0]), int(t[1]), int(t[2]), int(t[3]), float(t[5])]
+            for t in np.asarray(tracks).reshape(-1, 8)
+        ]
+        for track in tracks:
+            self._max_id = max(self._max_id, track[0])
+        return tracks
+
+    def reset(self):
+        """Forget all tracks (new video, scene cut, ...). New tracks get IDs not used before."""
+        self.tracker = self._make_tracker()
+        self._id_base = self._max_id
+
+    def save_state(self):
+        """Picklable tracking state (the ByteTrack tracks and the ID shift), see load_state()."""
+        return {'tracker': self.tracker, 'id_base': self._id_base, 'max_id': self._max_id}
+
+    def load_state(self, state):
+        """Continue from a state returned by save_state()."""
+        self.tracker = state['tracker']
+        self._id_base = state['id_base']
+        self._max_id = state['max_id']
+
 
 class PlayerTracker:
-    def __init__(self, model_path='yolov8n.pt'):
+    def __init__(self, model_path='yolov8n.pt', batch_size=1, backend='torch', threads=None):
         """
         Initialize the Tracker with the YOLO model.
         Uses custom ByteTrack configuration for improved ID consistency.
+
+        batch_size: Default number of frames per forward pass in track_batch().
+        backend: 'torch' (ultralytics detection + tracking), or 'onnx' / 'openvino'
+                 with model_path pointing at an exported model. Exported backends
+                 only detect; tracking then goes through the standalone ByteTrack.
+        threads: Intra-op thread count for the onnx / openvino backends.
         """
-        print(f"Loading YOLOv8 model with Tracking: {model_path}...")
-        self.model = YOLO(model_path)
+        print(f"Loading YOLOv8 model with Tracking: {model_path} ({backend})...")
+        self.model_path = model_path
+        self.backend_name = backend
+        if backend == 'torch':
+            self.model = YOLO(model_path)
+            self.backend = None
+        else:
+            self.model = None
+            self.backend = create_backend(backend, model_path, DETECTION_PARAMS['imgsz'], threads)
+        self.batch_size = max(1, int(batch_size))
         
         # Path to custom tracker config (optimized for cricket)
-        self.tracker_config = os.path.join(
-            os.path.dirname(__file__), 
-            'custom_bytetrack.yaml'
-        )
-        
-        # Fallback to default if custom config doesn't exist
-        if not os.path.exists(self.tracker_config):
-            print("Warning: Custom tracker config not found, using default bytetrack.yaml")
-            self.tracker_config = "bytetrack.yaml"
+        self.tracker_config = resolve_tracker_config()
+
+        # Standalone ByteTrack used by track_detections() (created on first use)
+        self.byte_track = None
+
+        # ID shift applied after reset() (ultralytics restarts track IDs at 1)
+        self._id_base = 0
+        self._max_id = 0
+
+        # Optional region of interest: inference runs on this crop only
+        self.roi = None
+        self.roi_imgsz = None
+
+        # Optional tiled inference (pipeline/tiles.py TilePlan); replaces the ROI
+        self.tiles = None
+
+    def set_roi(self, roi, imgsz=None):
+        """
+        Restrict inference to a region of the frame, e.g. the bounding
+        rectangle of the expanded pitch boundary (BoundaryFilter.bounding_rect()).
+        Boxes are mapped back to full-frame coordinates.
+
+        roi: (x1, y1, x2, y2) in frame pixels, or None for the full frame.
+        imgsz: Inference size for the crop. None keeps the pixel scale of a
+               full-frame run (fewer pixels -> lower latency); a larger value
+               letterboxes the crop to that size for a higher effective
+               resolution on distant players.
+        """
+        self.roi = None if roi is None else tuple(int(v) for v in roi)
+        if imgsz and self._fixed_imgsz() and imgsz != self._fixed_imgsz():
+            print(f"Warning: --roi-imgsz {imgsz} is ignored, the exported model has a fixed "
+                  f"{self._fixed_imgsz()}px input")
+            imgsz = None
+        self.roi_imgsz = imgsz
+
+    def _fixed_imgsz(self):
+        """Input size of an exported model with a static shape, else None."""
+        if self.backend is not None and getattr(self.backend, "static_shape", False):
+            return self.backend.imgsz
+        return None
+
+    def set_tiles(self, plan):
+        """
+        Detect on the tiles of a TilePlan (pipeline/tiles.py) instead of the
+        whole frame: all tiles of a batch go through the detector in one call,
+        their boxes are merged, and tracking runs on the merged detections
+        through the standalone ByteTrack.
+
+        plan: TilePlan, or None for whole-frame (or ROI) inference.
+        """
+        self.tiles = plan
+
+    def _crop(self, frame):
+        """The ROI part of a frame (a view, no copy)."""
+        if self.roi is None:
+            return frame
+        x1, y1, x2, y2 = self.roi
+        return frame[y1:y2, x1:x2]
+
+    def _detection_params(self, frame):
+        """DETECTION_PARAMS, with the inference size adjusted for the ROI."""
+        params = dict(DETECTION_PARAMS)
+        if self._fixed_imgsz():
+            # Every input is letterboxed to the graph's size anyway
+            params['imgsz'] = self._fixed_imgsz()
+            return params
+        if self.roi is None:
+            return params
+        if self.roi_imgsz:
+            params['imgsz'] = int(self.roi_imgsz)
         else:
-            print(f"Using custom tracker config: {self.tracker_config}")
+            x1, y1, x2, y2 = self.roi
+            scale = max(x2 - x1, y2 - y1) / max(frame.shape[:2])
+            # Same pixel scale as the full frame, rounded up to the model stride
+            params['imgsz'] = int(np.ceil(DETECTION_PARAMS['imgsz'] * scale / 32) * 32)
+        return params
 
-    def track_frame(self, frame):
+    def _roi_offset(self):
+        return (0, 0) if self.roi is None else self.roi[:2]
+
+    def _track(self, source):
         """
-        Takes a frame, tracks players, and returns the results.
-        Output: A list of tracks: [id, x1, y1, x2, y2]
-        
+        Runs YOLO + ByteTrack on one frame or a list of frames.
+
         Optimized parameters for cricket player tracking:
         - persist=True: Maintain track state across frames (crucial for ID consistency)
         - conf=0.25: Lower threshold to detect partially occluded/distant players
         - iou=0.45: Better handling of overlapping players
         - imgsz=1280: Higher resolution for better detection accuracy
+
+        A list of frames is letterboxed into a single batch and goes through
+        the network in one forward pass; the tracker is then updated with each
+        frame's detections in list order, exactly as consecutive calls would.
         """
-        results = self.model.track(
-            frame, 
+        first = source[0] if isinstance(source, list) else source
+        if isinstance(source, list):
+            source = [self._crop(frame) for frame in source]
+        else:
+            source = self._crop(source)
+
+        return self.model.track(
+            source, 
             persist=True, 
             tracker=self.tracker_config,
-            conf=0.25,       # Lower confidence to catch more players
-            iou=0.45,        # Adjusted IoU for better overlap handling
-            classes=[0],     # Only track persons (class 0)
-            imgsz=1280,      # Higher resolution for better accuracy
-            verbose=False
+            verbose=False,
+            **self._detection_params(first)
         )
+
+    @staticmethod
+    def _parse_result(result, offset=(0, 0)):
+        """
+        Converts one ultralytics result into a list of [id, x1, y1, x2, y2, conf].
+        offset: (x, y) added to the boxes (ROI origin).
+        """
+        dx, dy = offset
+        tracked_objects = []
+        if result.boxes is None or result.boxes.id is None:
+            return tracked_objects
+            
+        # Get the boxes and IDs
+        boxes = result.boxes.xyxy.cpu().numpy()  # type: ignore
+        track_ids = result.boxes.id.cpu().numpy()  # type: ignore
+        confidences = result.boxes.conf.cpu().numpy()  # type: ignore
+        
+        for box, track_id, conf in zip(boxes, track_ids, confidences):
+            x1, y1, x2, y2 = box
+            # Include confidence for potential filtering
+            tracked_objects.append([
+                int(track_id), 
+                int(x1) + dx, int(y1) + dy, 
+                int(x2) + dx, int(y2) + dy,
+                float(conf)
+            ])
+        return tracked_objects
+
+    def track_frame(self, frame):
+        """
+        Takes a frame, tracks players, and returns the results.
+        Output: A list of tracks: [id, x1, y1, x2, y2, conf]
+        """
+        if self.backend is not None or self.tiles is not None:
+            return self.track_detections(self.detect_frames([frame])[0])
+
+        results = self._track(frame)
         
         tracked_objects = []
 
         # Parse the results
         for result in results:
-            if result.boxes is None or result.boxes.id is None:
-                continue
-                
-            # Get the boxes and IDs
-            boxes = result.boxes.xyxy.cpu().numpy()  # type: ignore
-            track_ids = result.boxes.id.cpu().numpy()  # type: ignore
-            confidences = result.boxes.conf.cpu().numpy()  # type: ignore
-            
-            for box, track_id, conf in zip(boxes, track_ids, confidences):
-                x1, y1, x2, y2 = box
-                # Include confidence for potential filtering
-                tracked_objects.append([
-                    int(track_id), 
-                    int(x1), int(y1), 
-                    int(x2), int(y2),
-                    float(conf)
-                ])
+            tracked_objects.extend(self._parse_result(result, self._roi_offset()))
         
-        return tracked_objects
\ No newline at end of file
+        return self._unique_ids(tracked_objects)
+
+    def track_batch(self, frames, batch_size=None):
+        """
+        Tracks a sequence of consecutive frames, batch_size frames per forward pass.
+        IDs are identical to calling track_frame() on each frame in turn.
+
+        Output: One list of tracks [id, x1, y1, x2, y2, conf] per input frame.
+        """
+        batch_size = max(1, int(batch_size or self.batch_size))
+        frames = list(frames)
+
+        if self.backend is not None or self.tiles is not None:
+            return [self.track_detections(dets) for dets in self.detect_frames(frames, batch_size)]
+
+        all_tracks = []
+        for start in range(0, len(frames), batch_size):
+            results = self._track(frames[start:start + batch_size])
+            all_tracks.extend(self._unique_ids(self._parse_result(result, self._roi_offset()))
+                              for result in results)
+        return all_tracks
+
+    def _unique_ids(self, tracks):
+        """Shift IDs by the base set in reset(), so IDs from before a reset are never reused."""
+        for track in tracks:
+            track[0] += self._id_base
+            self._max_id = max(self._max_id, track[0])
+        return tracks
+
+    def reset(self):
+        """
+        Forget all tracks, e.g. after a scene cut, so stale tracks are not
+        carried over (persist=True) onto the new shot.
+        """
+        predictor = getattr(self.model, 'predictor', None)
+        for tracker in getattr(predictor, 'trackers', None) or []:
+            tracker.reset()
+        self._id_base = self._max_id
+        if self.byte_track is not None:
+            self.byte_track.reset()
+
+    def save_state(self):
+        """
+        Picklable tracking state, e.g. for a checkpoint: the ByteTrack
+        trackers (active, lost and removed tracks with their Kalman state)
+        and the ID counters. Detector weights are not included.
+        """
+        from ultralytics.trackers.basetrack import BaseTrack  # type: ignore
+
+        predictor = getattr(self.model, 'predictor', None)
+        return {
+            'trackers': list(getattr(predictor, 'trackers', None) or []),
+            'byte_track': self.byte_track.save_state() if self.byte_track is not None else None,
+            'track_count': BaseTrack._count,
+            'id_base': self._id_base,
+            'max_id': self._max_id,
+        }
+
+    def load_state(self, state):
+        """
+        Continue tracking from a state returned by save_state(). The torch
+        backend needs one tracked frame first (e.g. a warm-up frame followed
+        by reset()), so that the predictor exists.
+        """
+        from ultralytics.trackers.basetrack import BaseTrack  # type: ignore
+
+        if state['trackers']:
+            predictor = getattr(self.model, 'predictor', None)
+            if predictor is None:
+                raise RuntimeError("Track one frame before loading a tracker state")
+            # persist=True keeps these trackers instead of creating new ones
+            predictor.trackers = list(state['trackers'])
+        if state['byte_track'] is not None:
+            if self.byte_track is None:
+                self.byte_track = ByteTrackStep(self.tracker_config)
+            self.byte_track.load_state(state['byte_track'])
+        BaseTrack._count = state['track_count']
+        self._id_base = state['id_base']
+        self._max_id = state['max_id']
+
+    def detect_frames(self, frames, batch_size=None):
+        """
+        Runs only the detector (same settings as tracking) on consecutive frames.
+        Output: One (N, 5) float32 array of [x1, y1, x2, y2, score] per frame.
+        """
+        batch_size = max(1, int(batch_size or self.batch_size))
+        frames = list(frames)
+        if self.tiles is not None:
+            return self._detect_tiles(frames, batch_size)
+
+        all_detections = []
+        for start in range(0, len(frames), batch_size):
+            batch = frames[start:start + batch_size]
+            crops = [self._crop(frame) for frame in batch]
+            if self.backend is not None:
+                batch_detections = self.backend.detect(crops, **self._detection_params(batch[0]))
+            else:
+                batch_detections = [self._result_detections(result) for result in
+                                    self.model.predict(crops, verbose=False, **self._detection_params(batch[0]))]
+            for detections in batch_detections:
+                # Map ROI boxes back to full-frame coordinates before tracking
+                detections[:, [0, 2]] += self._roi_offset()[0]
+                detections[:, [1, 3]] += self._roi_offset()[1]
+                all_detections.append(detections)
+        return all_detections
+
+    def _detect_tiles(self, frames, batch_size):
+        """detect_frames() on the tiles: one detector call for all tiles of batch_size frames."""
+        plan = self.tiles
+        params = dict(DETECTION_PARAMS, imgsz=plan.tile_size)
+        all_detections = []
+        for start in range(0, len(frames), batch_size):
+            crops = [crop for frame in frames[start:start + batch_size] for crop in plan.crops(frame)]
+            if self.backend is not None:
+                tile_detections = self.backend.detect(crops, **params)
+            else:
+                tile_detections = [self._result_detections(result) for result in
+                                   self.model.predict(crops, verbose=False, **params)]
+            for i in range(0, len(tile_detections), len(plan)):
+                all_detections.append(plan.merge(tile_detections[i:i + len(plan)], iou=params['iou']))
+        return all_detections
+
+    @staticmethod
+    def _result_detections(result):
+        """Converts one ultralytics result into an (N, 5) float32 array of [x1, y1, x2, y2, score]."""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return np.empty((0, 5), dtype=np.float32)
+        return np.concatenate([
+            boxes.xyxy.cpu().numpy(),  # type: ignore
+            boxes.conf.cpu().numpy()[:, None],  # type: ignore
+        ], axis=1).astype(np.float32)
+
+    def track_detections(self, detections):
+        """
+        Feeds one frame's detections (from detect_frames() or the detection
+        cache) through the standalone ByteTrack.
+        Output: A list of tracks: [id, x1, y1, x2, y2, conf]
+        """
+        if self.byte_track is None:
+            self.byte_track = ByteTrackStep(self.tracker_config)
+        return self.byte_track.update(detections)
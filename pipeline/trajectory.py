@@ -0,0 +1,203 @@
+"""
+Columnar trajectory storage for tracked players.
+
+Two views of the same data are kept:
+* a fixed-size ring buffer per player with the most recent map positions,
+  used for drawing trails (O(1) append, zero-copy "last K points" views);
+* the full-length (frame, id, x, y, conf) history as columnar chunks, which
+  can be spilled to disk so memory stays bounded on multi-hour sessions.
+"""
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+HISTORY_DTYPE = np.dtype([
+    ("frame", np.int64),
+    ("id", np.int32),
+    ("x", np.float32),
+    ("y", np.float32),
+    ("conf", np.float32),
+])
+
+
+class TrajectoryStore:
+    """
+    Recent trails + full history of player map positions.
+
+    Each player's ring buffer has 2*K slots and every point is written twice
+    (at i and i+K), so the last K points are always one contiguous slice and
+    recent() can return a view instead of copying or rolling.
+    """
+
+    def __init__(self, recent_length: int = 50, initial_players: int = 64,
+                 chunk_size: int = 65536, spill_dir: Optional[str] = None, keep_history: bool = True):
+        """
+        Args:
+            recent_length: Number of recent points kept per player (K)
+            initial_players: Initial ring-buffer capacity, doubled when exceeded
+            chunk_size: Rows per history chunk
+            spill_dir: If set, full history chunks are written here as .npy files
+                instead of being kept in memory
+            keep_history: Record the full history (False: recent trails only)
+        """
+        self.recent_length = recent_length
+        self.keep_history = keep_history
+        self.chunk_size = chunk_size
+        self.spill_dir = spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+        self._ring = np.zeros((initial_players, 2 * recent_length, 2), dtype=np.float32)
+        self._counts = np.zeros(initial_players, dtype=np.int64)
+        self._slots: Dict[int, int] = {}
+        self._free_slots: List[int] = []
+
+        self._chunks: List[np.ndarray] = []       # full chunks kept in memory
+        self._spilled: List[str] = []             # full chunks written to disk
+        self._chunk = np.empty(chunk_size, dtype=HISTORY_DTYPE)
+        self._chunk_rows = 0
+        self._total_rows = 0
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def _slot_for(self, player_id: int) -> int:
+        slot = self._slots.get(player_id)
+        if slot is not None:
+            return slot
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._slots)
+            if slot >= len(self._ring):
+                self._grow()
+        self._counts[slot] = 0
+        self._slots[player_id] = slot
+        return slot
+
+    def _grow(self) -> None:
+        capacity = len(self._ring) * 2
+        ring = np.zeros((capacity,) + self._ring.shape[1:], dtype=np.float32)
+        ring[:len(self._ring)] = self._ring
+        counts = np.zeros(capacity, dtype=np.int64)
+        counts[:len(self._counts)] = self._counts
+        self._ring, self._counts = ring, counts
+
+    def append(self, frame_idx: int, ids, points, confs=None) -> None:
+        """
+        Record the map positions of every player seen in one frame.
+
+        Args:
+            frame_idx: Frame number
+            ids: (N,) player IDs
+            points: (N, 2) map coordinates
+            confs: Optional (N,) detection confidences
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        n = len(ids)
+        if n == 0:
+            return
+        points = np.asarray(points, dtype=np.float32).reshape(n, 2)
+
+        # Recent trails: write each point at i and i + K of its ring
+        slots = np.fromiter((self._slot_for(int(i)) for i in ids), dtype=np.int64, count=n)
+        positions = self._counts[slots] % self.recent_length
+        self._ring[slots, positions] = points
+        self._ring[slots, positions + self.recent_length] = points
+        self._counts[slots] += 1
+
+        # Full history
+        if self.keep_history:
+            self._append_history(frame_idx, ids, points, confs)
+
+    def _append_history(self, frame_idx, ids, points, confs) -> None:
+        n = len(ids)
+        written = 0
+        while written < n:
+            take = min(n - written, self.chunk_size - self._chunk_rows)
+            rows = self._chunk[self._chunk_rows:self._chunk_rows + take]
+            rows["frame"] = frame_idx
+            rows["id"] = ids[written:written + take]
+            rows["x"] = points[written:written + take, 0]
+            rows["y"] = points[written:written + take, 1]
+            rows["conf"] = 1.0 if confs is None else np.asarray(confs, dtype=np.float32).reshape(-1)[written:written + take]
+            self._chunk_rows += take
+            written += take
+            if self._chunk_rows == self.chunk_size:
+                self._flush_chunk()
+        self._total_rows += n
+
+    def _flush_chunk(self) -> None:
+        chunk = self._chunk[:self._chunk_rows]
+        if self.spill_dir:
+            path = os.path.join(self.spill_dir, f"trajectory_chunk_{len(self._spilled):05d}.npy")
+            np.save(path, chunk)
+            self._spilled.append(path)
+        else:
+            self._chunks.append(chunk.copy())
+        self._chunk_rows = 0
+
+    def release(self, player_id: int) -> None:
+        """Free a player's ring buffer (its full history is kept)."""
+        slot = self._slots.pop(player_id, None)
+        if slot is not None:
+            self._free_slots.append(slot)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def __contains__(self, player_id: int) -> bool:
+        return player_id in self._slots
+
+    def __len__(self) -> int:
+        """Total number of recorded (frame, id) rows."""
+        return self._total_rows
+
+    def ids(self) -> List[int]:
+        """Players that currently have a recent trail."""
+        return list(self._slots)
+
+    def recent(self, player_id: int, k: Optional[int] = None) -> np.ndarray:
+        """
+        Last k map points of a player, oldest first.
+
+        Returns:
+            (n, 2) float32 view into the ring buffer (n <= k); do not keep it
+            across appends, as the underlying slots are reused.
+        """
+        slot = self._slots.get(player_id)
+        if slot is None:
+            return self._ring[0, :0]
+        k = self.recent_length if k is None else min(k, self.recent_length)
+        count = int(self._counts[slot])
+        n = min(count, k)
+        end = (count - 1) % self.recent_length + self.recent_length + 1
+        return self._ring[slot, end - n:end]
+
+    def history(self) -> Dict[str, np.ndarray]:
+        """
+        Full-length history as columns.
+
+        Returns:
+            {"frame", "id", "x", "y", "conf"} arrays, in recording order
+        """
+        parts = [np.load(path, mmap_mode="r") for path in self._spilled]
+        parts += self._chunks
+        parts.append(self._chunk[:self._chunk_rows])
+        table = np.concatenate(parts) if parts else np.empty(0, dtype=HISTORY_DTYPE)
+        return {name: np.ascontiguousarray(table[name]) for name in HISTORY_DTYPE.names}
+
+    def save_npz(self, path: str, compressed: bool = True) -> None:
+        """Export the full history as a columnar .npz file (one array per column)."""
+        columns = self.history()
+        if compressed:
+            np.savez_compressed(path, **columns)
+        else:
+            np.savez(path, **columns)
+
+    @staticmethod
+    def load_npz(path: str) -> Dict[str, np.ndarray]:
+        """Load columns written by save_npz()."""
+        with np.load(path) as data:
+            return {name: data[name] for name in HISTORY_DTYPE.names}
@@ -6,9 +6,6 @@ class ViewTransformer:
         """
         source_points: List of 4 (x, y) tuples from the video.
         """
-        # Define the SOURCE (Video Coordinates)
-        self.src_points = np.array(source_points, dtype=np.float32)
-        
         # Define the DESTINATION (2D Map Coordinates)
         # We assume a map size of 400x600 pixels
         # We map the pitch to fit nicely inside with some padding
@@ -23,8 +20,53 @@ class ViewTransformer:
             [padding, padding + height]     # Bottom-Left on Map
         ], dtype=np.float32)
         
-        # Calculate the Perspective Matrix
+        self.set_source_points(source_points)
+
+    def set_source_points(self, source_points):
+        """
+        Recompute the projection for new video corners of the pitch, e.g. when
+        the camera pans or zooms (see calibration.HomographyTracker).
+        """
+        self.src_points = np.array(source_points, dtype=np.float32)
+        # Calculate the Perspective Matrix (and its inverse for map -> video)
         self.matrix = cv2.getPerspectiveTransform(self.src_points, self.dst_points)
+        self.inverse_matrix = cv2.getPerspectiveTransform(self.dst_points, self.src_points)
+
+    @staticmethod
+    def _project(points, matrix, as_int):
+        """
+        Applies a 3x3 homography to an array of points with plain matrix math.
+        points: array-like of shape (..., 2). Returns the same shape.
+        """
+        pts = np.asarray(points, dtype=np.float64)
+        shape = pts.shape
+        pts = pts.reshape(-1, 2)
+
+        # Homogeneous coordinates: [x, y, 1] @ M.T, then divide by w
+        projected = pts @ matrix[:, :2].T + matrix[:, 2]
+        projected = projected[:, :2] / projected[:, 2:3]
+
+        if as_int:
+            # Truncate like int() does in transform_point
+            projected = projected.astype(np.int32)
+        return projected.reshape(shape)
+
+    def transform_points(self, points, as_int=False):
+        """
+        Converts many points from video to map in one call.
+
+        points: (N, 2) array of video (x, y) coordinates, e.g. every foot position
+                in a frame or a whole clip's worth of positions.
+        as_int: Return int32 coordinates (for drawing) instead of float64.
+        """
+        return self._project(points, self.matrix, as_int)
+
+    def inverse_transform_points(self, points, as_int=False):
+        """
+        Converts map (x, y) points back to video coordinates, e.g. to draw map
+        overlays on the video frame. Same input/output format as transform_points.
+        """
+        return self._project(points, self.inverse_matrix, as_int)
 
     def transform_point(self, point):
         """
@@ -1,9 +1,11 @@
 """
 Utility functions for cricket player tracking pipeline.
 """
+from collections import deque
+
 import cv2
 import numpy as np
-from typing import Tuple, List
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 
 def generate_color(player_id: int) -> Tuple[int, int, int]:
@@ -49,75 +51,254 @@ def draw_styled_box(frame: np.ndarray, x1: int, y1: int, x2: int, y2: int,
     cv2.putText(frame, label, (x1 + 2, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
 
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    IoU matrix of two sets of boxes.
+
+    Args:
+        a: (N, 4) boxes [x1, y1, x2, y2]
+        b: (M, 4) boxes [x1, y1, x2, y2]
+
+    Returns:
+        (N, M) intersection over union
+    """
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def seek_frame(cap: cv2.VideoCapture, frame_idx: int) -> None:
+    """
+    Position a VideoCapture so that the next read() returns frame frame_idx.
+
+    CAP_PROP_POS_FRAMES seeks snap to a keyframe on most codecs, so the
+    position is read back after the seek and the remaining frames are
+    decoded forward (grab() without conversion). If the capture reports a
+    position past the target, or none at all, it is rewound to the start.
+
+    Raises:
+        IOError: The video ends before frame_idx
+    """
+    position = 0
+    if frame_idx > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if not 0 <= position <= frame_idx:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        position = 0
+    while position < frame_idx:
+        if not cap.grab():
+            raise IOError(f"Could not seek to frame {frame_idx}: the video ends at frame {position}")
+        position += 1
+
+
 class BoundaryFilter:
     """
     Filters detections to only include players within the cricket pitch boundary.
-    Uses point-in-polygon test with expanded boundary for better coverage.
+
+    The expanded boundary (and any extra zones such as the inner circle or the
+    boundary rope) is rasterised once into a bit mask, so filtering a frame is a
+    single vectorized lookup instead of one point-in-polygon test per track.
+    Each zone owns one bit of the mask, which keeps the lookup cost independent
+    of the number of zones (up to 8).
     """
     
-    def __init__(self, boundary_points: List[List[int]], expand_ratio: float = 0.15):
+    MAX_ZONES = 8
+
+    def __init__(self, boundary_points: List[List[int]], expand_ratio: float = 0.15,
+                 frame_size: Optional[Tuple[int, int]] = None, downscale: int = 1):
         """
         Initialize with boundary points.
         
         Args:
             boundary_points: List of 4 corner points [[x,y], ...] defining the pitch
             expand_ratio: How much to expand the boundary (0.15 = 15% expansion)
+            frame_size: Optional (width, height) of the video frames. Defaults to
+                the extent of the zone polygons (points beyond it are outside anyway).
+            downscale: Integer factor by which the mask is smaller than the frame
+                (2 = half resolution, 4x less memory, slightly coarser edges)
+        """
+        self.frame_size = frame_size
+        self.downscale = max(1, int(downscale))
+        self.expand_ratio = expand_ratio
+
+        # Zone name -> (bit, polygon); the expanded pitch boundary is always zone "boundary"
+        self.zones: Dict[str, Tuple[int, np.ndarray]] = {}
+        self.set_boundary(boundary_points)
+
+    def set_boundary(self, boundary_points: List[List[int]]) -> None:
+        """
+        Move the pitch boundary, e.g. when the camera pans or zooms
+        (see calibration.HomographyTracker). The mask is rebuilt on the next lookup.
+
+        Args:
+            boundary_points: The 4 corner points [[x,y], ...] in frame coordinates
         """
         self.original_points = np.array(boundary_points, dtype=np.float32)
-        
         # Expand the boundary to include players near the edges
-        self.boundary = self._expand_polygon(self.original_points, expand_ratio)
+        self.boundary = self._expand_polygon(self.original_points, self.expand_ratio)
+        self.zones["boundary"] = (1, self.boundary)
+        self.mask = None
         
     def _expand_polygon(self, points: np.ndarray, ratio: float) -> np.ndarray:
         """Expand polygon outward from its center."""
         center = points.mean(axis=0)
-        expanded = []
-        for point in points:
-            direction = point - center
-            new_point = point + direction * ratio
-            expanded.append(new_point)
+        expanded = points + (points - center) * ratio
         return np.array(expanded, dtype=np.int32)
+
+    def bounding_rect(self, frame_size: Optional[Tuple[int, int]] = None,
+                      margin: int = 0) -> Tuple[int, int, int, int]:
+        """
+        Axis-aligned rectangle around the expanded boundary.
+
+        Args:
+            frame_size: Optional (width, height) to clip the rectangle to
+            margin: Extra pixels added on every side
+
+        Returns:
+            (x1, y1, x2, y2) with x2/y2 exclusive
+        """
+        x1, y1 = self.boundary.min(axis=0) - margin
+        x2, y2 = self.boundary.max(axis=0) + margin + 1
+        frame_size = frame_size or self.frame_size
+        if frame_size is not None:
+            width, height = frame_size
+            x1, x2 = np.clip([x1, x2], 0, width)
+            y1, y2 = np.clip([y1, y2], 0, height)
+        return max(int(x1), 0), max(int(y1), 0), int(x2), int(y2)
+
+    def add_zone(self, name: str, points: List[List[int]], expand_ratio: float = 0.0) -> None:
+        """
+        Register an additional polygon zone (inner circle, boundary rope, ...).
+
+        Args:
+            name: Zone name used in filter_tracks(zone=...)
+            points: Polygon corners [[x,y], ...] in frame coordinates
+            expand_ratio: Optional outward expansion, as for the boundary
+        """
+        if name in self.zones:
+            bit = self.zones[name][0]
+        elif len(self.zones) >= self.MAX_ZONES:
+            raise ValueError(f"BoundaryFilter supports at most {self.MAX_ZONES} zones")
+        else:
+            bit = 1 << len(self.zones)
+        polygon = self._expand_polygon(np.array(points, dtype=np.float32), expand_ratio)
+        self.zones[name] = (bit, polygon)
+        self.mask = None  # rebuilt on next lookup
+
+    def _build_mask(self) -> np.ndarray:
+        """Rasterise every zone polygon into its bit of a uint8 mask."""
+        if self.frame_size is not None:
+            width, height = self.frame_size
+        else:
+            extent = np.max([polygon.max(axis=0) for _, polygon in self.zones.values()], axis=0)
+            width, height = int(extent[0]) + 1, int(extent[1]) + 1
+
+        ds = self.downscale
+        mask = np.zeros(((height + ds - 1) // ds, (width + ds - 1) // ds), dtype=np.uint8)
+        layer = np.empty_like(mask)
+        for bit, polygon in self.zones.values():
+            layer.fill(0)
+            cv2.fillPoly(layer, [(polygon // ds).astype(np.int32)], bit)
+            mask |= layer
+        return mask
+
+    def zone_bits(self, points: np.ndarray) -> np.ndarray:
+        """
+        Look up the zone bits of many points at once.
+
+        Args:
+            points: (N, 2) array of (x, y) frame coordinates
+
+        Returns:
+            (N,) uint8 array; bit b is set when the point is inside the zone owning bit b.
+            Points outside the mask get 0.
+        """
+        if self.mask is None:
+            self.mask = self._build_mask()
+
+        pts = np.asarray(points).reshape(-1, 2)
+        cols = np.floor_divide(pts[:, 0], self.downscale).astype(np.int64)
+        rows = np.floor_divide(pts[:, 1], self.downscale).astype(np.int64)
+        mask_h, mask_w = self.mask.shape
+
+        valid = (cols >= 0) & (cols < mask_w) & (rows >= 0) & (rows < mask_h)
+        bits = np.zeros(len(pts), dtype=np.uint8)
+        bits[valid] = self.mask[rows[valid], cols[valid]]
+        return bits
+
+    def _zone_mask(self, zone: Union[str, Sequence[str]]) -> int:
+        names = [zone] if isinstance(zone, str) else zone
+        return int(np.bitwise_or.reduce([self.zones[name][0] for name in names]))
     
-    def is_inside(self, x: int, y: int) -> bool:
+    def is_inside(self, x: int, y: int, zone: Union[str, Sequence[str]] = "boundary") -> bool:
         """
-        Check if a point is inside the boundary polygon.
+        Check if a point is inside the boundary polygon (or another zone).
         
         Args:
             x, y: Point coordinates (typically player foot position)
+            zone: Zone name, or several names (inside any of them)
             
         Returns:
             True if point is inside the boundary
         """
-        result = cv2.pointPolygonTest(self.boundary, (float(x), float(y)), False)
-        return result >= 0
+        return bool(self.zone_bits(np.array([[x, y]]))[0] & self._zone_mask(zone))
+
+    def filter_indices(self, tracks, use_foot_position: bool = True,
+                       zone: Union[str, Sequence[str]] = "boundary") -> np.ndarray:
+        """
+        Indices of the tracks inside the zone(s).
+
+        Args:
+            tracks: List or (N, >=5) array of tracks [id, x1, y1, x2, y2, ...]
+            use_foot_position: If True, use bottom-center of box (foot position),
+                otherwise the center of the box
+            zone: Zone name, or several names (inside any of them)
+
+        Returns:
+            int64 array of indices into tracks
+        """
+        if len(tracks) == 0:
+            return np.empty(0, dtype=np.int64)
+        boxes = np.asarray([track[1:5] for track in tracks] if isinstance(tracks, list)
+                           else np.asarray(tracks)[:, 1:5], dtype=np.float64)
+
+        # Use foot position (bottom-center of bounding box) or center of bounding box
+        check_x = (boxes[:, 0] + boxes[:, 2]) / 2
+        check_y = boxes[:, 3] if use_foot_position else (boxes[:, 1] + boxes[:, 3]) / 2
+
+        bits = self.zone_bits(np.stack([check_x, check_y], axis=1))
+        return np.flatnonzero(bits & self._zone_mask(zone))
     
-    def filter_tracks(self, tracks: List, use_foot_position: bool = True) -> List:
+    def filter_tracks(self, tracks, use_foot_position: bool = True,
+                      zone: Union[str, Sequence[str]] = "boundary",
+                      return_indices: bool = False):
         """
         Filter tracks to only include those inside the boundary.
         
         Args:
-            tracks: List of tracks [id, x1, y1, x2, y2, ...]
+            tracks: List or (N, >=5) array of tracks [id, x1, y1, x2, y2, ...]
             use_foot_position: If True, use bottom-center of box (foot position)
+            zone: Zone name, or several names (inside any of them)
+            return_indices: Also return the indices of the kept tracks
             
         Returns:
-            Filtered list of tracks inside the boundary
+            Filtered tracks inside the boundary (same type as the input), or
+            (filtered, indices) when return_indices is True
         """
-        filtered = []
-        for track in tracks:
-            x1, y1, x2, y2 = track[1], track[2], track[3], track[4]
-            
-            if use_foot_position:
-                # Use foot position (bottom-center of bounding box)
-                check_x = int((x1 + x2) / 2)
-                check_y = int(y2)
-            else:
-                # Use center of bounding box
-                check_x = int((x1 + x2) / 2)
-                check_y = int((y1 + y2) / 2)
-            
-            if self.is_inside(check_x, check_y):
-                filtered.append(track)
+        indices = self.filter_indices(tracks, use_foot_position, zone)
+        if isinstance(tracks, np.ndarray):
+            filtered = tracks[indices]
+        else:
+            filtered = [tracks[i] for i in indices]
                 
+        if return_indices:
+            return filtered, indices
         return filtered
 
 
@@ -126,7 +307,7 @@ class FPSCounter:
     
     def __init__(self, avg_frames: int = 30):
         self.prev_time = cv2.getTickCount()
-        self.fps_history = []
+        self.fps_history = deque(maxlen=avg_frames)
         self.avg_frames = avg_frames
     
     def update(self) -> float:
@@ -138,8 +319,6 @@ class FPSCounter:
         if time_diff > 0:
             current_fps = 1.0 / time_diff
             self.fps_history.append(current_fps)
-            if len(self.fps_history) > self.avg_frames:
-                self.fps_history.pop(0)
         
         return self.get_fps()
     
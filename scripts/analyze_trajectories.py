@@ -0,0 +1,60 @@
+"""
+Per-player distance, speed, sprint and heatmap metrics for a whole match.
+
+Reads a trajectory history written by `run_pipeline.py --trajectories` (or
+by the worker service) and computes every metric in one vectorized pass.
+
+Usage:
+    python scripts/analyze_trajectories.py output/trajectories.npz --fps 25 --output output/analytics.json
+"""
+import argparse
+import json
+import os
+import sys
+
+# Add parent directory to path so we can import from pipeline folder
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.analytics import PitchGeometry, analyze_history, save_heatmaps, summary_records
+from pipeline.trajectory import TrajectoryStore
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Player analytics from a trajectory history.")
+    parser.add_argument("trajectories", help=".npz written by --trajectories")
+    parser.add_argument("--fps", type=float, required=True, help="Frame rate of the video")
+    parser.add_argument("--field-size", default="60x100",
+                        help="Real WIDTHxLENGTH in metres of the calibrated rectangle")
+    parser.add_argument("--cell-size", type=float, default=2.0, help="Heatmap cell size in metres")
+    parser.add_argument("--window", type=int, default=5, help="Position smoothing window (frames)")
+    parser.add_argument("--max-gap", type=int, default=10,
+                        help="Missing frames after which a player's path is not joined up")
+    parser.add_argument("--sprint-speed", type=float, default=7.0, help="Sprint threshold in m/s")
+    parser.add_argument("--sprint-frames", type=int, default=5, help="Fast frames that make a sprint")
+    parser.add_argument("--output", default=None,
+                        help="JSON output path (heatmaps go next to it as .npz); default: print")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    field_size = tuple(float(v) for v in args.field_size.lower().split("x"))
+    geometry = PitchGeometry(field_size=field_size, cell_size=args.cell_size)
+
+    history = TrajectoryStore.load_npz(args.trajectories)
+    results = analyze_history(history, args.fps, geometry, window=args.window, max_gap=args.max_gap,
+                              sprint_speed=args.sprint_speed, sprint_frames=args.sprint_frames)
+    report = {"fps": args.fps, "field_size": list(field_size), "players": summary_records(results)}
+
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+        return
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    heatmap_path = os.path.splitext(args.output)[0] + "_heatmaps.npz"
+    save_heatmaps(heatmap_path, results, geometry)
+    print(f"Analytics for {len(report['players'])} players saved to: {args.output} (heatmaps: {heatmap_path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Offline throughput benchmark.
+
+Generates synthetic cricket-like clips at several resolutions and player
+counts, runs them through the pipeline stages with a deterministic stand-in
+tracker (no weights, CPU only) and times every stage
+(mean and p50/p95/p99 per frame). Rendering and encoding go through the same
+compositor, drawing and writer code as run_pipeline.py, so the render and
+encode numbers track the real output path.
+
+Every case runs several times (round-robin over the cases), each run after
+a few untimed warm-up frames. A stage counts as a regression only when even
+its fastest run is slower than the baseline's median run by more than the
+tolerance and the noise floor, and still is after the case has been
+measured again, so back-to-back runs on an unchanged tree pass.
+
+Usage:
+    python scripts/benchmark.py --output bench_results.json
+    python scripts/benchmark.py --compare bench_results.json   # fails on regressions
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+# Add parent directory to path so we can import from pipeline folder
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.instrument import Instrumentation
+from pipeline.output import FrameCompositor, OutputWriter, VideoSink
+from pipeline.render import MapRenderer, draw_tracks
+from pipeline.synthetic import FakeTracker, SyntheticClip
+from pipeline.transformer import ViewTransformer
+from pipeline.utils import BoundaryFilter
+
+STAGES = ("decode", "track", "filter", "transform", "render", "encode")
+MAP_WIDTH, MAP_HEIGHT = 400, 600
+QUEUE_SIZE = 4  # Frames queued for the writer (run_pipeline.py's --queue-size default)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline per-stage throughput benchmark.")
+    parser.add_argument("--resolutions", default="1280x720,1920x1080",
+                        help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument("--players", default="11,22,30", help="Comma-separated player counts")
+    parser.add_argument("--frames", type=int, default=150, help="Frames per synthetic clip")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed frames at the start of every run")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    parser.add_argument("--compare", default=None,
+                        help="Baseline JSON; exit with status 1 if any case got slower")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed slowdown against the baseline (0.15 = 15%%)")
+    parser.add_argument("--noise-floor", type=float, default=0.25,
+                        help="Slowdowns below this many ms/frame are never reported")
+    return parser.parse_args()
+
+
+def case_name(width, height, players):
+    return f"{width}x{height}_p{players}"
+
+
+def summarize(runs, warmup):
+    """
+    Combine the runs of one case. Per stage, ms_per_frame is the median over
+    the runs and min_ms_per_frame the fastest run.
+    """
+    stages = {}
+    for stage in runs[0]["stages"]:
+        per_run = [run["stages"][stage]["ms_per_frame"] for run in runs]
+        # Latency percentiles of the median run of this stage
+        middle = runs[int(np.argsort(per_run)[len(per_run) // 2])]["stages"][stage]
+        stages[stage] = dict(middle, ms_per_frame=float(np.median(per_run)), min_ms_per_frame=min(per_run))
+    return {
+        "frames": runs[0]["frames"],
+        "warmup": warmup,
+        "repeats": len(runs),
+        "fps": float(np.median([run["fps"] for run in runs])),
+        "stages": stages,
+    }
+
+
+def run_once(clip, video_path, workdir, warmup):
+    """
+    One timed pass over a clip; the first `warmup` frames are not recorded.
+    Rendering and encoding use the pipeline's own output path: pooled
+    FrameCompositor canvases, draw_tracks / MapRenderer.draw(out=) in place,
+    and an OutputWriter whose VideoSink is timed as "encode" on the writer thread.
+    """
+    width, height = clip.width, clip.height
+    tracker = FakeTracker(clip)
+    transformer = ViewTransformer(clip.source_points)
+    boundary_filter = BoundaryFilter(clip.source_points, expand_ratio=0.15)
+    bg_img = np.zeros((MAP_HEIGHT, MAP_WIDTH, 3), dtype=np.uint8)
+    cv2.rectangle(bg_img, (0, 0), (MAP_WIDTH, MAP_HEIGHT), (34, 139, 34), -1)
+    map_renderer = MapRenderer(bg_img)
+
+    compositor = FrameCompositor((width, height), (MAP_WIDTH, MAP_HEIGHT), pool_size=QUEUE_SIZE + 2)
+    sink = VideoSink(os.path.join(workdir, "out.mp4"), 25, compositor.output_size)
+    instrumentation = Instrumentation(enabled=False)
+    writer = OutputWriter([sink], compositor, queue_size=QUEUE_SIZE, instrumentation=instrumentation)
+    cap = cv2.VideoCapture(video_path)
+    frames = 0
+    run_start = None
+
+    try:
+        while True:
+            if frames == warmup:
+                # Warm-up done: let the writer catch up (a sink error surfaces
+                # on the next write), then start recording
+                deadline = time.perf_counter() + 10.0
+                while writer.frames_written < frames and time.perf_counter() < deadline:
+                    time.sleep(0.001)
+                instrumentation = writer.instrumentation = Instrumentation()
+                run_start = time.perf_counter()
+            t0 = time.perf_counter()
+            ret, frame = cap.read()
+            t1 = time.perf_counter()
+            if not ret:
+                break
+            instrumentation.record("decode", t1 - t0)
+
+            tracks = tracker.track_frame(frame)
+            t2 = time.perf_counter()
+            instrumentation.record("track", t2 - t1)
+
+            tracks = boundary_filter.filter_tracks(tracks)
+            t3 = time.perf_counter()
+            instrumentation.record("filter", t3 - t2)
+
+            boxes = np.array([track[1:5] for track in tracks], dtype=np.int32).reshape(-1, 4)
+            feet = np.stack([(boxes[:, 0] + boxes[:, 2]) // 2, boxes[:, 3]], axis=1)
+            map_points = transformer.transform_points(feet, as_int=True)
+            t4 = time.perf_counter()
+            instrumentation.record("transform", t4 - t3)
+
+            # Waiting for a free canvas is backpressure from the encoder, not rendering
+            canvas = compositor.acquire()
+            t5 = time.perf_counter()
+            ids = [track[0] for track in tracks]
+            np.copyto(canvas.video, frame)
+            draw_tracks(canvas.video, tracks, ids)
+            map_renderer.draw(ids, map_points, out=canvas.map)
+            instrumentation.record("render", time.perf_counter() - t5)
+
+            writer.write(canvas, {"frame": frames})
+            frames += 1
+        if frames <= warmup:
+            raise ValueError(f"--warmup ({warmup}) must be smaller than the clip length ({frames} frames)")
+    finally:
+        cap.release()
+        writer.close()  # flushes the queue: the run ends when the last frame is encoded
+    elapsed = time.perf_counter() - run_start
+
+    timed = frames - warmup
+    return {
+        "frames": timed,
+        "fps": timed / elapsed if elapsed > 0 else 0.0,
+        "stages": {
+            stage: dict(stats, ms_per_frame=1000 * stats["total_s"] / max(timed, 1))
+            for stage, stats in instrumentation.snapshot()["stages"].items()
+        },
+    }
+
+
+def compare(results, baseline, tolerance, noise_floor=0.25):
+    """
+    Per-stage changes against a baseline.
+
+    The fastest current run of each stage is compared with the baseline's
+    median run: noise only ever makes a run slower, so a stage is only
+    reported when even its best run is slower than a typical baseline run.
+    Slowdowns under noise_floor ms/frame are ignored.
+
+    Returns:
+        {case name: [regression messages]}
+    """
+    regressions = {}
+    for name, case in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            continue
+        for stage in STAGES:
+            now = case["stages"][stage].get("min_ms_per_frame", case["stages"][stage]["ms_per_frame"])
+            before = base["stages"][stage]["ms_per_frame"]
+            change = (now - before) / before if before > 0 else 0.0
+            if change > tolerance and now - before > noise_floor:
+                regressions.setdefault(name, []).append(
+                    f"{name} {stage}: {before:.2f} -> {now:.2f} ms/frame (+{change * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    resolutions = [tuple(int(v) for v in r.lower().split("x")) for r in args.resolutions.split(",")]
+    player_counts = [int(p) for p in args.players.split(",")]
+
+    results = {
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "cases": {},
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        clips = {}
+        for width, height in resolutions:
+            for players in player_counts:
+                clip = SyntheticClip(width, height, num_frames=args.frames, num_players=players)
+                video_path = os.path.join(workdir, f"{case_name(width, height, players)}.mp4")
+                clip.write(video_path)
+                clips[case_name(width, height, players)] = (clip, video_path)
+
+        def measure(names, runs):
+            # Round-robin over the cases, so a slow spell of the machine hits
+            # one run of every case instead of every run of one case
+            for _ in range(max(1, args.repeats)):
+                for name in names:
+                    clip, video_path = clips[name]
+                    runs.setdefault(name, []).append(run_once(clip, video_path, workdir, args.warmup))
+            for name in names:
+                clip = clips[name][0]
+                results["cases"][name] = dict(width=clip.width, height=clip.height, players=clip.num_players,
+                                              **summarize(runs[name], args.warmup))
+
+        runs = {}
+        measure(list(clips), runs)
+        for name, case in results["cases"].items():
+            per_stage = " | ".join(f"{s} {case['stages'][s]['ms_per_frame']:.2f}" for s in STAGES)
+            print(f"{name:<16} {case['fps']:7.1f} FPS | ms/frame: {per_stage}")
+
+        regressions = {}
+        if baseline is not None:
+            regressions = compare(results, baseline, args.tolerance, args.noise_floor)
+            if regressions:
+                # Confirm: a real regression is still there after more runs
+                print(f"Re-measuring {', '.join(regressions)} to rule out noise...")
+                measure(list(regressions), runs)
+                regressions = compare(results, baseline, args.tolerance, args.noise_floor)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if baseline is not None:
+        if regressions:
+            print("Performance regressions:")
+            for lines in regressions.values():
+                for line in lines:
+                    print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
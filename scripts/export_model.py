@@ -0,0 +1,213 @@
+"""
+Export the YOLO weights for the ONNX Runtime / OpenVINO backends and check
+that the exported model still detects the same players as PyTorch.
+
+The parity check runs both backends on frames sampled from the match video
+and matches their boxes by IoU; it exits with status 1 if too many PyTorch
+detections are missing from the exported model or the scores drift.
+
+--synthetic checks the shared numpy pre/post-processing (letterbox, class
+filter, NMS, undoing the letterbox) against ultralytics' own on a synthetic
+clip, with a raw model output built from known boxes; it needs neither
+weights nor a video, and runs before every export.
+
+Usage:
+    python scripts/export_model.py --synthetic                           # no weights needed
+    python scripts/export_model.py --backend onnx
+    python scripts/export_model.py --backend openvino --int8 --input data/cricket_match.mp4
+    python scripts/export_model.py --backend onnx --model yolov8s.onnx   # parity check only
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path so we can import from pipeline folder
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.backends import create_backend, export_model, postprocess, preprocess, sample_frames
+from pipeline.synthetic import FakeTracker, SyntheticClip
+from pipeline.track import DETECTION_PARAMS
+from pipeline.utils import box_iou
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export YOLO for onnx / openvino and check parity.")
+    parser.add_argument("--weights", default="yolov8s.pt", help="ultralytics .pt weights")
+    parser.add_argument("--backend", choices=("onnx", "openvino"), default=None,
+                        help="Export target (required unless --synthetic)")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Only check the numpy pre/post-processing against ultralytics (no weights)")
+    parser.add_argument("--input", default="data/cricket_match.mp4",
+                        help="Video used for INT8 calibration and the parity check")
+    parser.add_argument("--imgsz", type=int, default=DETECTION_PARAMS['imgsz'],
+                        help="Input size of the exported graph")
+    parser.add_argument("--int8", action="store_true", help="Quantise to INT8 with calibration frames")
+    parser.add_argument("--calibration-frames", type=int, default=64,
+                        help="Frames sampled from --input for INT8 calibration")
+    parser.add_argument("--model", default=None, help="Already exported model to check (skips the export)")
+    parser.add_argument("--check-frames", type=int, default=16, help="Frames used by the parity check")
+    parser.add_argument("--min-recall", type=float, default=None,
+                        help="Fraction of PyTorch boxes the export must find (default 0.95, 0.85 for INT8)")
+    parser.add_argument("--max-score-diff", type=float, default=None,
+                        help="Allowed mean |score difference| of matched boxes (default 0.02, 0.08 for INT8)")
+    args = parser.parse_args()
+    if args.backend is None and not args.synthetic:
+        parser.error("--backend is required unless --synthetic is given")
+    if args.min_recall is None:
+        args.min_recall = 0.85 if args.int8 else 0.95
+    if args.max_score_diff is None:
+        args.max_score_diff = 0.08 if args.int8 else 0.02
+    return args
+
+
+def parity(reference, candidate, min_iou=0.5):
+    """
+    Greedy IoU matching of per-frame detections.
+
+    Returns:
+        (reference boxes, matched boxes, mean |score difference| of matches)
+    """
+    total = matched = 0
+    score_diffs = []
+    for ref, cand in zip(reference, candidate):
+        total += len(ref)
+        if len(ref) == 0 or len(cand) == 0:
+            continue
+        iou = box_iou(ref[:, :4], cand[:, :4])
+        for _ in range(min(len(ref), len(cand))):
+            i, j = np.unravel_index(np.argmax(iou), iou.shape)
+            if iou[i, j] < min_iou:
+                break
+            matched += 1
+            score_diffs.append(abs(float(ref[i, 4]) - float(cand[j, 4])))
+            iou[i, :] = -1
+            iou[:, j] = -1
+    return total, matched, float(np.mean(score_diffs)) if score_diffs else 0.0
+
+
+def synthetic_output(detections, transforms, imgsz, num_classes=80, seed=0):
+    """
+    Raw YOLOv8 output (N, 4 + num_classes, anchors) built from known detections.
+
+    Every detection becomes a person anchor, with jittered duplicates at lower
+    scores (for NMS) and a copy that scores higher as another class (for the
+    class filter); low-score background anchors fill the rest.
+    """
+    rng = np.random.default_rng(seed)
+    per_frame = []
+    for dets, (ratio, (pad_x, pad_y)) in zip(detections, transforms):
+        boxes = dets[:, :4] * ratio + [pad_x, pad_y, pad_x, pad_y]
+        n = len(boxes)
+        parts = []  # (xyxy boxes, class scores)
+
+        scores = np.zeros((n, num_classes))
+        scores[:, 0] = dets[:, 4]
+        parts.append((boxes, scores))
+        for _ in range(3):
+            scores = np.zeros((n, num_classes))
+            scores[:, 0] = dets[:, 4] * rng.uniform(0.5, 0.95, size=n)
+            parts.append((boxes + rng.normal(0, 2.0, size=boxes.shape), scores))
+        scores = np.zeros((n, num_classes))
+        scores[:, 0] = dets[:, 4] * 0.8
+        scores[np.arange(n), rng.integers(1, num_classes, size=n)] = dets[:, 4]
+        parts.append((boxes + rng.normal(0, 2.0, size=boxes.shape), scores))
+
+        # Inside the letterboxed image, not on the padding
+        corner = rng.uniform([pad_x, pad_y], [imgsz - pad_x - 60, imgsz - pad_y - 60], size=(300, 2))
+        background = np.concatenate([corner, corner + rng.uniform(5, 60, size=(300, 2))], axis=1)
+        parts.append((background, rng.uniform(0, 0.3, size=(300, num_classes))))
+
+        xyxy = np.concatenate([b for b, _ in parts])
+        xywh = np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+        per_frame.append(np.concatenate([xywh, np.concatenate([c for _, c in parts])], axis=1))
+
+    # Same anchor count for every frame: pad with empty anchors
+    anchors = max(len(rows) for rows in per_frame)
+    output = np.zeros((len(per_frame), 4 + num_classes, anchors), dtype=np.float32)
+    for i, rows in enumerate(per_frame):
+        output[i, :, :len(rows)] = rows.T
+    return output
+
+
+def synthetic_check(imgsz, num_frames=16, conf=DETECTION_PARAMS['conf'], iou=DETECTION_PARAMS['iou']):
+    """
+    Compare preprocess() / postprocess() with ultralytics' letterbox and NMS on
+    a synthetic clip. No weights or video needed.
+
+    Returns:
+        True if both paths agree
+    """
+    import torch  # type: ignore
+    from ultralytics.data.augment import LetterBox  # type: ignore
+    from ultralytics.utils.ops import scale_boxes  # type: ignore
+    try:
+        from ultralytics.utils.nms import non_max_suppression  # type: ignore
+    except ImportError:  # older ultralytics
+        from ultralytics.utils.ops import non_max_suppression  # type: ignore
+
+    clip = SyntheticClip(1280, 720, num_frames=num_frames)
+    frames = [clip.frame(i) for i in range(num_frames)]
+
+    batch, transforms = preprocess(frames, imgsz)
+    letterbox = LetterBox(new_shape=(imgsz, imgsz), auto=False)
+    reference = np.stack([letterbox(image=frame)[..., ::-1].transpose(2, 0, 1) for frame in frames])
+    pixel_diff = float(np.abs(batch * 255.0 - reference).max())
+
+    output = synthetic_output(FakeTracker(clip).detect_frames(frames), transforms, imgsz)
+    candidate = postprocess(output, frames, transforms, conf, iou, classes=(0,))
+    expected = []
+    for det, frame in zip(non_max_suppression(torch.from_numpy(output), conf, iou, classes=[0]), frames):
+        det = det.numpy()
+        boxes = scale_boxes((imgsz, imgsz), det[:, :4].copy(), frame.shape[:2])
+        expected.append(np.concatenate([boxes, det[:, 4:5]], axis=1))
+
+    total, matched, score_diff = parity(expected, candidate, min_iou=0.95)
+    extra = sum(map(len, candidate)) - matched
+    box_error = max((float(np.abs(e[:, :4] - c[:, :4]).max()) for e, c in zip(expected, candidate)
+                     if len(e) and len(e) == len(c)), default=0.0)
+    print(f"Synthetic check on {num_frames} frames: letterbox max pixel diff {pixel_diff:.0f}, "
+          f"{matched}/{total} ultralytics boxes matched, {extra} extra, "
+          f"max box diff {box_error:.2f} px, mean |score diff| {score_diff:.6f}")
+    return pixel_diff <= 1 and matched == total and extra == 0 and box_error <= 1.0 and score_diff < 1e-5
+
+
+def main():
+    args = parse_args()
+    if not synthetic_check(args.imgsz):
+        print("Synthetic check FAILED: the numpy pre/post-processing differs from ultralytics")
+        sys.exit(1)
+    if args.synthetic:
+        print("Synthetic check passed.")
+        return
+    if not os.path.exists(args.input):
+        print(f"Error: Could not open video file: {args.input}")
+        sys.exit(1)
+    frames = sample_frames(args.input, max(args.calibration_frames if args.int8 else 0, args.check_frames))
+
+    model = args.model
+    if model is None:
+        calibration = frames[:args.calibration_frames] if args.int8 else None
+        model = export_model(args.weights, args.backend, imgsz=args.imgsz, int8=args.int8,
+                             calibration_frames=calibration)
+        print(f"Exported: {model}")
+
+    check = frames[:args.check_frames]
+    reference = create_backend("torch", args.weights, args.imgsz).detect(check, **DETECTION_PARAMS)
+    exported = create_backend(args.backend, model, args.imgsz)
+    candidate = [exported.detect([frame], **DETECTION_PARAMS)[0] for frame in check]
+
+    total, matched, score_diff = parity(reference, candidate)
+    recall = matched / total if total else 1.0
+    print(f"Parity on {len(check)} frames: {matched}/{total} PyTorch boxes matched "
+          f"(recall {recall:.3f}), {sum(map(len, candidate))} exported boxes, "
+          f"mean |score diff| {score_diff:.4f}")
+    if recall < args.min_recall or score_diff > args.max_score_diff:
+        print(f"Parity check FAILED (min recall {args.min_recall}, max score diff {args.max_score_diff})")
+        sys.exit(1)
+    print("Parity check passed.")
+
+
+if __name__ == "__main__":
+    main()
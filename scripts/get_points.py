@@ -1,38 +1,55 @@
+import argparse
+import os
+import sys
+
 import cv2
 import numpy as np
 
-# Global variables to store scale
+# Add parent directory to path so we can import from pipeline folder
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.calibration import CalibrationStore, camera_name
+
+# Global variables to store scale and the clicked points
 scale_factor = 1.0
+clicked_points = []
 
 def click_event(event, x, y, flags, params):
     if event == cv2.EVENT_LBUTTONDOWN:
         # 1. Scale the click BACK to original size
         real_x = int(x / scale_factor)
         real_y = int(y / scale_factor)
-        
+        clicked_points.append([real_x, real_y])
+
         print(f"✅ Clicked at: [{real_x}, {real_y}]")
-        
+
         # Draw on the small image so you can see where you clicked
         cv2.circle(img_display, (x, y), 5, (0, 0, 255), -1)
-        cv2.putText(img_display, str(real_x) + ',' + str(real_y), (x,y), 
+        cv2.putText(img_display, str(real_x) + ',' + str(real_y), (x,y),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
         cv2.imshow('Click 4 Corners', img_display)
 
+parser = argparse.ArgumentParser(description="Click the 4 pitch corners and cache them for the camera.")
+parser.add_argument("--input", default="data/cricket_match.mp4", help="Video to calibrate")
+parser.add_argument("--camera", default=None, help="Camera name (default: video file name)")
+parser.add_argument("--calibration-dir", default="calibration", help="Calibration cache directory")
+args = parser.parse_args()
+
 # Load video
-cap = cv2.VideoCapture('data/cricket_match.mp4')
+cap = cv2.VideoCapture(args.input)
 ret, frame = cap.read() # Read the first frame
 
 if ret:
     # --- RESIZE LOGIC ---
     original_height, original_width = frame.shape[:2]
-    
+
     # Force the display width to 960px (fits on almost all laptops)
     target_width = 960
     scale_factor = target_width / original_width
-    
+
     new_width = int(original_width * scale_factor)
     new_height = int(original_height * scale_factor)
-    
+
     img_display = cv2.resize(frame, (new_width, new_height))
     # --------------------
 
@@ -47,8 +64,17 @@ if ret:
 
     cv2.imshow('Click 4 Corners', img_display)
     cv2.setMouseCallback('Click 4 Corners', click_event)
-    
+
     cv2.waitKey(0)
     cv2.destroyAllWindows()
+
+    # Cache the calibration (with this frame as reference) for run_pipeline.py
+    if len(clicked_points) >= 4:
+        camera = args.camera or camera_name(args.input)
+        store = CalibrationStore(args.calibration_dir)
+        store.save(camera, clicked_points[-4:], (original_width, original_height), frame)
+        print(f"Calibration for camera '{camera}' saved to {store.index_path}: {clicked_points[-4:]}")
+    else:
+        print(f"Only {len(clicked_points)} points clicked; calibration not saved.")
 else:
-    print("Error: Could not read video file.")
\ No newline at end of file
+    print("Error: Could not read video file.")
@@ -0,0 +1,72 @@
+"""
+Track a whole batch of matches (e.g. a tournament) with resumable jobs.
+
+Every match is checkpointed while it runs; run the same command again after
+a crash or Ctrl+C and finished matches are skipped, interrupted ones
+continue from their last checkpoint.
+
+Usage:
+    python scripts/run_batch.py data/tournament/ --output-dir output/tournament --workers 2
+    python scripts/run_batch.py matches.json --workers 3 --threads 4 --pin-cores --no-video
+"""
+import argparse
+import json
+import os
+import sys
+
+# Add parent directory to path so we can import from pipeline folder
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.backends import BACKENDS
+from pipeline.batch import load_matches, plan_jobs, run_batch
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Track a batch of matches with checkpoints.")
+    parser.add_argument("source", help="Directory of videos or a JSON manifest of matches")
+    parser.add_argument("--output-dir", default="output/batch", help="One sub-directory per match is created here")
+    parser.add_argument("--calibration-dir", default="calibration",
+                        help="Calibration cache for matches without explicit points")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (each loads the model once)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="torch / OpenCV threads per worker (default: cores / workers)")
+    parser.add_argument("--pin-cores", action="store_true", help="Pin every worker to its own cores (Linux)")
+    parser.add_argument("--checkpoint-interval", type=int, default=1500, help="Frames between checkpoints")
+    parser.add_argument("--force", action="store_true", help="Re-run finished matches from the start")
+    parser.add_argument("--model", default="yolov8s.pt", help="Weights or exported model")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Inference backend")
+    parser.add_argument("--batch-size", type=int, default=1, help="Frames per detector call")
+    parser.add_argument("--no-video", action="store_true", help="Only write tracks and trajectories")
+    parser.add_argument("--tracks-format", choices=("csv", "jsonl"), default="csv", help="Track file format")
+    parser.add_argument("--expand-ratio", type=float, default=0.15, help="Boundary expansion")
+    parser.add_argument("--roi", action="store_true", help="Run detection on the pitch ROI crop only")
+    parser.add_argument("--reid", action="store_true", help="Re-identify players after ID changes")
+    parser.add_argument("--tiles", action="store_true", help="Tiled inference planned from the calibration")
+    parser.add_argument("--map-image", default=None, help="Ground image for the map")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    matches = load_matches(args.source)
+    jobs = plan_jobs(matches, args.output_dir, args.calibration_dir, force=args.force,
+                     checkpoint_interval=args.checkpoint_interval, output_video=not args.no_video,
+                     tracks_format=args.tracks_format, expand_ratio=args.expand_ratio, roi=args.roi,
+                     reid=args.reid, tiles={} if args.tiles else None,
+                     map_image=os.path.abspath(args.map_image) if args.map_image else None)
+    print(f"{len(matches)} match(es), {len(jobs)} to track")
+
+    failed = 0
+    try:
+        for result in run_batch(jobs, workers=args.workers, threads=args.threads, pin_cores=args.pin_cores,
+                                model_path=args.model, backend=args.backend, batch_size=args.batch_size):
+            failed += result["status"] != "ok"
+            print(json.dumps(result))
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume from the last checkpoints.")
+        sys.exit(130)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
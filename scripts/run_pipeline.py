@@ -1,19 +1,143 @@
+import argparse
+import json
 import cv2
 import sys
 import os
+import shutil
 import numpy as np
 
 # Add parent directory to path so we can import from pipeline folder
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from pipeline.track import PlayerTracker
+from pipeline.track import DETECTION_PARAMS, ByteTrackStep, PlayerTracker
 from pipeline.transformer import ViewTransformer
 from pipeline.utils import BoundaryFilter
+from pipeline.stages import Stage, StagedPipeline
+from pipeline.trajectory import TrajectoryStore
+from pipeline.render import MapRenderer, draw_tracks
+from pipeline.cache import DetectionCache
+from pipeline.segments import SegmentTrackReplay, track_video_parallel
+from pipeline.adaptive import AdaptiveStrideTracker
+from pipeline.instrument import Instrumentation
+from pipeline.backends import BACKENDS, exported_model_path
+from pipeline.scene import SceneGate, SceneGatedTracker
+from pipeline.stream import DROP_POLICIES, StreamProcessor, open_source
+from pipeline.output import FrameCompositor, OutputWriter, PreviewSink, VideoSink, track_sink
+from pipeline.calibration import CalibrationStore, HomographyTracker, camera_name
+from pipeline.reid import IDMapper, ReIDGallery
+from pipeline.analytics import PitchGeometry, PlayerAnalytics, save_heatmaps, summary_records
+from pipeline.tiles import describe, plan_for
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cricket player detection, tracking and top-view map.")
+    parser.add_argument("--input", default="data/cricket_match.mp4", help="Input video path")
+    parser.add_argument("--output", default="output/tracked_video_with_map.mp4", help="Output video path")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="Capacity of the queues between pipeline stages")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Frames per detector forward pass (IDs are the same as frame-by-frame)")
+    parser.add_argument("--trajectories", default=None,
+                        help="Optional .npz path for the full (frame, id, x, y, conf) trajectory history")
+    parser.add_argument("--detection-cache", default=None,
+                        help="Directory of the detection cache; re-runs on the same video replay "
+                             "cached detections instead of running YOLO")
+    parser.add_argument("--segments", type=int, default=1,
+                        help="Split the video into this many time segments tracked in parallel processes")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Process pool size for --segments (default: one per segment, up to the CPU count)")
+    parser.add_argument("--overlap", type=int, default=30,
+                        help="Frames shared by consecutive segments, used to stitch track IDs")
+    parser.add_argument("--adaptive-stride", type=int, default=1,
+                        help="Maximum detector stride; >1 runs YOLO only on keyframes and predicts tracks "
+                             "in between, shrinking the stride when motion or track churn increases")
+    parser.add_argument("--roi", action="store_true",
+                        help="Run inference only on the bounding rectangle of the expanded pitch boundary")
+    parser.add_argument("--roi-imgsz", type=int, default=None,
+                        help="Inference size for the ROI crop (default: same pixel scale as the full frame)")
+    parser.add_argument("--tiles", action="store_true",
+                        help="Detect on overlapping tiles of the pitch, far tiles at a higher scale than near "
+                             "ones, planned from the calibration (replaces --roi)")
+    parser.add_argument("--tile-size", type=int, default=None,
+                        help="Model input size of every tile (default: the cheapest plan)")
+    parser.add_argument("--force-tiles", action="store_true",
+                        help="With --tiles, tile even when the plan costs more than a whole-frame pass")
+    parser.add_argument("--tile-target", type=float, default=None,
+                        help="Model pixel height of the farthest players with --tiles (default: as in a "
+                             "full-frame imgsz=1280 pass)")
+    parser.add_argument("--metrics", default=None,
+                        help="Record per-stage latency histograms and write JSON snapshots to this path")
+    parser.add_argument("--metrics-interval", type=float, default=10.0,
+                        help="Seconds between periodic --metrics snapshots")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="Detector inference backend (onnx / openvino need an exported model, "
+                             "see scripts/export_model.py)")
+    parser.add_argument("--backend-model", default=None,
+                        help="Exported model for --backend onnx / openvino "
+                             "(default: yolov8s.onnx / yolov8s_openvino_model)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Intra-op CPU threads for the onnx / openvino backends")
+    parser.add_argument("--scene-gate", action="store_true",
+                        help="Skip inference on replays, crowd shots, close-ups and graphics, and reset "
+                             "tracking on scene cuts")
+    parser.add_argument("--stream", action="store_true",
+                        help="Live mode: --input may also be an RTSP/HTTP URL or '-' (raw bgr24 frames on "
+                             "stdin); frames over the latency budget are handled by --drop-policy")
+    parser.add_argument("--realtime", action="store_true",
+                        help="With --stream, play a file input at its own FPS like a live camera")
+    parser.add_argument("--latency-budget", type=float, default=0.5,
+                        help="With --stream, maximum age in seconds of a frame when tracking starts")
+    parser.add_argument("--drop-policy", choices=DROP_POLICIES, default="drop_oldest",
+                        help="With --stream, what to do with frames over the latency budget")
+    parser.add_argument("--stream-buffer", type=int, default=8,
+                        help="With --stream, frames buffered between the reader and the tracker")
+    parser.add_argument("--pipe-size", default=None,
+                        help="Frame size WIDTHxHEIGHT of raw frames read from stdin (--input -)")
+    parser.add_argument("--pipe-fps", type=float, default=25.0,
+                        help="Frame rate of raw frames read from stdin (--input -)")
+    parser.add_argument("--tracks-out", default=None,
+                        help="Write per-frame tracks to this path: CSV if it ends in .csv, "
+                             "else JSON lines ('-' = stdout)")
+    parser.add_argument("--headless", action="store_true",
+                        help="No preview window (automatic on Linux without a display)")
+    parser.add_argument("--no-video", action="store_true", help="Do not write the output video")
+    parser.add_argument("--preview-scale", type=float, default=0.5, help="Size of the preview window")
+    parser.add_argument("--camera", default=None,
+                        help="Camera name in the calibration cache (default: input file name)")
+    parser.add_argument("--calibration-dir", default="calibration",
+                        help="Calibration cache written by get_points.py")
+    parser.add_argument("--track-camera", action="store_true",
+                        help="Follow camera pans / zooms and keep the pitch corners up to date")
+    parser.add_argument("--reid", action="store_true",
+                        help="Re-identify players that got a new tracker ID after an occlusion")
+    parser.add_argument("--reid-gallery", type=int, default=64, help="Lost players kept for --reid")
+    parser.add_argument("--analytics", default=None,
+                        help="Write per-player distance / speed / sprint metrics to this JSON path "
+                             "(occupancy heatmaps go next to it as .npz)")
+    parser.add_argument("--field-size", default="60x100",
+                        help="Real WIDTHxLENGTH in metres of the calibrated rectangle (for --analytics)")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Run decode/track/render/encode one after another on a single thread")
+    args = parser.parse_args()
+    args.batch_size = max(1, args.batch_size)
+    if args.pipe_size:
+        args.pipe_size = tuple(int(v) for v in args.pipe_size.lower().split("x"))
+    args.field_size = tuple(float(v) for v in args.field_size.lower().split("x"))
+    if args.segments > 1 and args.adaptive_stride > 1:
+        parser.error("--adaptive-stride cannot be combined with --segments (segment workers detect every frame)")
+    if args.stream and (args.segments > 1 or args.detection_cache):
+        print("Warning: --segments and --detection-cache are ignored in --stream mode")
+        args.segments = 1
+        args.detection_cache = None
+    return args
+
 
 def main():
+    args = parse_args()
+
     # --- FILE PATHS ---
-    input_video_path = "data/cricket_match.mp4"
-    output_video_path = "output/tracked_video_with_map.mp4"
+    input_video_path = args.input
+    output_video_path = args.output
     
     # Create output directory if it doesn't exist
     output_dir = os.path.dirname(output_video_path)
@@ -41,30 +165,149 @@ def main():
     ]
     # ---------------------------------------------
 
+    # Calibration cached for this camera by get_points.py replaces the points above
+    camera = args.camera or camera_name(input_video_path)
+    calibration = CalibrationStore(args.calibration_dir).get(camera)
+    reference_frame = None
+    if calibration:
+        SOURCE_POINTS = calibration["source_points"]
+        reference_frame = CalibrationStore.reference_frame(calibration)
+        print(f"Using cached calibration of camera '{camera}': {SOURCE_POINTS}")
+    if args.track_camera and args.roi:
+        print("Warning: --roi is ignored with --track-camera (the pitch moves in the frame)")
+        args.roi = False
+
+    # Tiled inference settings: the camera's "tiling" calibration entry, then the command line
+    tiling = None
+    if args.tiles:
+        if args.roi:
+            print("Warning: --roi is ignored with --tiles (the tiles only cover the pitch already)")
+            args.roi = False
+        tiling = dict((calibration or {}).get("tiling", {}))
+        tiling.setdefault("field_size", args.field_size)
+        if args.tile_size:
+            tiling["tile_size"] = args.tile_size
+        if args.tile_target:
+            tiling["target_height"] = args.tile_target
+        if args.force_tiles:
+            tiling["force"] = True
+
     # Initialize Modules
     # Use yolov8s (small) model for better detection of distant players
-    tracker = PlayerTracker(model_path='yolov8s.pt')
-    transformer = ViewTransformer(SOURCE_POINTS)
+    model_path = 'yolov8s.pt'
+    if args.backend != 'torch':
+        # Exported copy of the same weights (ultralytics export naming)
+        model_path = args.backend_model or exported_model_path(model_path, args.backend)
+        print(f"Detector backend: {args.backend} ({model_path})")
     
-    # Initialize boundary filter to exclude detections outside the pitch
-    boundary_filter = BoundaryFilter(SOURCE_POINTS, expand_ratio=0.15)
-    print("Boundary filter initialized - will exclude players outside pitch area")
-
     # Setup Video
-    cap = cv2.VideoCapture(input_video_path)
-    if not cap.isOpened():
-        print(f"Error: Could not open video file: {input_video_path}")
-        return
-    
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    cap = source = None
+    if args.stream:
+        try:
+            source = open_source(input_video_path, realtime=args.realtime, pipe_size=args.pipe_size,
+                                 fps=args.pipe_fps)
+        except (IOError, ValueError) as e:
+            print(f"Error: {e}")
+            return
+        width, height, fps = source.width, source.height, int(source.fps)
+    else:
+        cap = cv2.VideoCapture(input_video_path)
+        if not cap.isOpened():
+            print(f"Error: Could not open video file: {input_video_path}")
+            return
+
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = int(cap.get(cv2.CAP_PROP_FPS))
     
     if width == 0 or height == 0:
         print("Error: Invalid video dimensions. Please check the video file.")
-        cap.release()
+        (source.close if source else cap.release)()
         return
+
+    if calibration:
+        # Calibrated on a frame of another size: scale the points and the reference to this video
+        SOURCE_POINTS = CalibrationStore.points_for(calibration, (width, height), camera)
+        if reference_frame is not None and reference_frame.shape[:2] != (height, width):
+            reference_frame = cv2.resize(reference_frame, (width, height), interpolation=cv2.INTER_AREA)
     
+    # Initialize boundary filter to exclude detections outside the pitch
+    boundary_filter = BoundaryFilter(SOURCE_POINTS, expand_ratio=0.15)
+    print("Boundary filter initialized - will exclude players outside pitch area")
+
+    # Optional ROI: run inference only on the rectangle around the expanded boundary,
+    # clipped to the frame (the expanded corners may lie outside it)
+    roi = boundary_filter.bounding_rect((width, height)) if args.roi else None
+    detection_params = dict(DETECTION_PARAMS)
+    if args.backend != 'torch':
+        detection_params['backend'] = args.backend
+    if roi is not None:
+        print(f"Inference restricted to ROI {roi}")
+        detection_params.update(roi=roi, roi_imgsz=args.roi_imgsz)
+    if tiling is not None:
+        # The plan follows from the calibration: other points give other tiles and detections
+        detection_params['tiles'] = dict(tiling, source_points=[[float(x), float(y)] for x, y in SOURCE_POINTS])
+
+    # Detection cache: replay stored detections through a standalone ByteTrack
+    # (no YOLO at all) or record them on this run
+    cache_reader = cache_writer = None
+    if args.detection_cache and args.segments > 1:
+        print("Warning: --detection-cache is ignored when tracking in --segments")
+    elif args.detection_cache:
+        cache = DetectionCache(args.detection_cache, input_video_path, model_path, detection_params)
+        if cache.is_complete():
+            print(f"Replaying detections from cache: {cache.path}")
+            cache_reader = cache.reader()
+        else:
+            print(f"Recording detections to cache: {cache.path}")
+            cache_writer = cache.writer()
+
+    transformer = ViewTransformer(SOURCE_POINTS)
+
+    # Segment-parallel mode: track time segments in a process pool, stitch the
+    # IDs, then render the stitched tracks below instead of running the tracker
+    segment_replay = None
+    tracker = player_tracker = None
+    if args.segments > 1:
+        segment_rows = track_video_parallel(
+            input_video_path, SOURCE_POINTS, args.segments, workers=args.workers,
+            overlap=args.overlap, model_path=model_path, batch_size=args.batch_size,
+            transformer=transformer, roi=roi, roi_imgsz=args.roi_imgsz, backend=args.backend,
+            scene_gate=args.scene_gate, tiles=tiling,
+        )
+        segment_replay = SegmentTrackReplay(segment_rows)
+    elif cache_reader is not None:
+        byte_track = ByteTrackStep()
+    else:
+        tracker = PlayerTracker(model_path=model_path, batch_size=args.batch_size,
+                                backend=args.backend, threads=args.threads)
+        tracker.set_roi(roi, imgsz=args.roi_imgsz)
+        player_tracker = tracker
+        if cache_writer is None and (args.adaptive_stride > 1 or
+                                     (args.stream and args.drop_policy == "skip_detection")):
+            # Detect only on keyframes, predict tracks with constant velocity in between
+            # (skip_detection also uses the prediction for frames over the latency budget)
+            tracker = AdaptiveStrideTracker(tracker, max_stride=args.adaptive_stride)
+
+    # Falls back to whole-frame inference when the tiles would cost more (unless --force-tiles)
+    tile_plan = None
+    if tiling is not None and player_tracker is not None:
+        try:
+            tile_plan = plan_for(player_tracker, SOURCE_POINTS, (width, height), **tiling)
+        except ValueError as e:
+            print(f"Error: {e}")
+            (source.close if source else cap.release)()
+            return
+        if tile_plan is not None:
+            print(f"Tiled inference: {describe(tile_plan, (width, height))}")
+
+    scene_gate = None
+    if args.scene_gate and tracker is not None and cache_writer is None:
+        # Only the calibrated main-camera view reaches the detector; cuts reset ByteTrack.
+        # The calibration frame cached by get_points.py is the main-view reference.
+        scene_gate = SceneGate(SOURCE_POINTS, (width, height), reference=reference_frame)
+        tracker = SceneGatedTracker(tracker, scene_gate)
+
     # Map Output Dimensions
     map_width = 400
     map_height = 600
@@ -85,129 +328,328 @@ def main():
         bg_img = np.zeros((map_height, map_width, 3), dtype=np.uint8)
         cv2.rectangle(bg_img, (0, 0), (map_width, map_height), (34, 139, 34), -1)
 
-    # Setup Output Video
-    # Use integer codec for mp4v (0x7634706D) or let OpenCV choose with -1
-    fourcc = 0x7634706D  # 'mp4v' codec
-    out = cv2.VideoWriter(output_video_path, fourcc, fps, (out_width, max(height, map_height)))
-    
-    if not out.isOpened():
-        print(f"Error: Could not create output video file: {output_video_path}")
-        cap.release()
+    # Output sinks: video, preview window and track files are written on a
+    # background thread; sinks that are not used cost nothing
+    headless = args.headless
+    if not headless and sys.platform.startswith("linux") and not (
+            os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        print("No display found - running headless (no preview window)")
+        headless = True
+    out_size = (out_width, max(height, map_height))
+    sinks = []
+    try:
+        if not args.no_video:
+            sinks.append(VideoSink(output_video_path, fps, out_size))
+        if not headless:
+            sinks.append(PreviewSink(out_size, scale=args.preview_scale))
+        if args.tracks_out:
+            sinks.append(track_sink(args.tracks_out))
+    except IOError as e:
+        print(f"Error: {e}")
+        (source.close if source else cap.release)()
         return
+    preview = next((sink for sink in sinks if isinstance(sink, PreviewSink)), None)
 
-    id_map = {}
-    next_id = 1 
+    # Reused side-by-side output frames; enough for every frame that can be in
+    # flight between the render stage and the writer. None if no sink needs pixels.
+    compositor = None
+    if any(sink.needs_frames for sink in sinks):
+        compositor = FrameCompositor((width, height), (map_width, map_height),
+                                     pool_size=(2 * args.queue_size + 2) * args.batch_size)
+
+    # Raw tracker IDs -> clean player IDs (bounded); --reid repairs fragmented IDs
+    id_mapper = IDMapper(ReIDGallery(capacity=args.reid_gallery) if args.reid else None)
     
-    # Trajectory storage: {player_id: [(map_x, map_y), ...]}
-    trajectories = {}
-    max_trajectory_length = 50  # Maximum number of points to store per player
+    # Trajectory storage: recent trail per player + full (frame, id, x, y, conf) history.
+    # The history is only kept for --trajectories, and spilled next to it so that
+    # memory stays bounded on long sessions.
+    max_trajectory_length = 50  # Maximum number of points drawn per player
+    spill_dir = os.path.splitext(args.trajectories)[0] + "_chunks" if args.trajectories else None
+    trajectories = TrajectoryStore(recent_length=max_trajectory_length, spill_dir=spill_dir,
+                                   keep_history=bool(args.trajectories))
+    rendered_frames = 0
+
+    # Per-player metrics in metres, updated incrementally (only with --analytics)
+    pitch_geometry = PitchGeometry(field_size=args.field_size)
+    analytics = PlayerAnalytics(fps or 25.0, pitch_geometry) if args.analytics else None
+
+    # Map renderer: cached palette + incrementally updated, fading trail layer
+    map_renderer = MapRenderer(bg_img, trail_length=max_trajectory_length)
+
+    # Per-stage latency histograms (no-ops unless --metrics is given)
+    instrumentation = Instrumentation(enabled=bool(args.metrics), snapshot_path=args.metrics,
+                                      snapshot_interval=args.metrics_interval)
+    if tracker is not None:
+        instrumentation.wrap(tracker, "track_frame")
+        instrumentation.wrap(tracker, "track_batch")
+    elif cache_reader is not None:
+        instrumentation.wrap(byte_track, "update", "byte_track")
+    instrumentation.wrap(boundary_filter, "filter_tracks", "filter")
+    instrumentation.wrap(transformer, "transform_points", "transform")
+    instrumentation.wrap(map_renderer, "draw", "map_render")
+    writer = OutputWriter(sinks, compositor, queue_size=args.queue_size, instrumentation=instrumentation)
 
     # Progress tracking
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap is not None else 0
     frame_count = 0
     
     print(f"Processing video ({total_frames} frames)... Press 'q' to stop.")
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break 
-        
+    # --- STAGES ---
+    # decode -> track -> render -> encode. Each stage is a plain function so the
+    # same code runs either on the staged engine or one step at a time.
+
+    # Items travelling through the stages are batches of consecutive frames so
+    # the tracker can run one forward pass per batch (--batch-size).
+
+    decoded_frames = 0
+    tracked_frames = 0
+    stream_finished = False
+
+    def read_frames():
+        """Decode stage: yields batches of frames until the end of the video."""
+        nonlocal decoded_frames, stream_finished
+        batch = []
+        while cap.isOpened():
+            with instrumentation.stage("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            decoded_frames += 1
+            batch.append(frame)
+            if len(batch) == args.batch_size:
+                yield batch
+                batch = []
+        stream_finished = True
+        if batch:
+            yield batch
+
+    camera_tracker = None
+    planned_points = np.array(SOURCE_POINTS, dtype=np.float32)
+
+    def follow_camera(frame, tracks):
+        """
+        --track-camera: move the pitch corners with the camera and update the
+        boundary filter, the scene gate's pitch area and the tiles. Returns
+        this frame's corners (None without --track-camera).
+        """
+        nonlocal camera_tracker, planned_points
+        if not args.track_camera:
+            return None
+        if camera_tracker is None:
+            # Without a cached reference frame the first frame is the reference
+            reference = reference_frame if reference_frame is not None else frame
+            camera_tracker = HomographyTracker(SOURCE_POINTS, reference)
+        with instrumentation.stage("camera"):
+            points = camera_tracker.update(frame, [track[1:5] for track in tracks])
+        if np.abs(points - boundary_filter.original_points).max() > 0.5:
+            boundary_filter.set_boundary(points)  # mask is rebuilt on the next lookup
+            if scene_gate is not None:
+                scene_gate.set_pitch(points)  # grass / view tests follow the pitch
+        if tile_plan is not None and np.abs(points - planned_points).max() > 16:
+            # Re-plan once the pitch has moved by a fair part of a far tile's overlap; the run
+            # stays on tiles (switching to whole-frame mid-run would restart the tracks) and
+            # keeps the tile size of the first plan instead of searching TILE_SIZES again
+            try:
+                plan_for(player_tracker, points, (width, height),
+                         **dict(tiling, force=True, tile_size=tile_plan.tile_size))
+                planned_points = points.copy()
+            except ValueError:
+                pass  # pitch out of the frame: keep the last plan until it comes back
+        return points
+
+    def track_stage(frames):
+        """Inference stage: detect + track, then drop players outside the pitch."""
+        nonlocal tracked_frames
+        if cache_reader is not None:
+            # Replay cached detections - no YOLO
+            batch_tracks = [byte_track.update(cache_reader[tracked_frames + i]) for i in range(len(frames))]
+        elif segment_replay is not None:
+            # Tracks were computed by the segment workers
+            batch_tracks = [segment_replay[tracked_frames + i] for i in range(len(frames))]
+        elif cache_writer is not None:
+            # Detect, record, then track the same detections
+            batch_detections = tracker.detect_frames(frames)
+            for detections in batch_detections:
+                cache_writer.append(detections)
+            batch_tracks = [tracker.track_detections(detections) for detections in batch_detections]
+        elif len(frames) == 1:
+            batch_tracks = [tracker.track_frame(frames[0])]
+        else:
+            batch_tracks = tracker.track_batch(frames)
+        tracked_frames += len(frames)
+        items = []
+        for frame, tracks in zip(frames, batch_tracks):
+            points = follow_camera(frame, tracks)
+            items.append((frame, boundary_filter.filter_tracks(tracks), points))
+        return items
+
+    def render_stage(items):
+        """Render stage: renders every frame of a tracked batch."""
+        rendered = []
+        for frame, tracks, points in items:
+            with instrumentation.stage("render"):
+                rendered.append(render_frame(frame, tracks, source_points=points))
+        return rendered
+
+    def render_frame(frame, tracks, frame_idx=None, source_points=None):
+        """
+        ID cleaning, trajectories, and (if a sink needs pixels) boxes and the map
+        drawn straight into a pooled side-by-side frame. frame_idx defaults to
+        the number of frames rendered so far (stream mode passes the source index);
+        source_points are this frame's pitch corners with --track-camera.
+        Returns (canvas or None, per-frame track record).
+        """
+        nonlocal rendered_frames
+        if frame_idx is None:
+            frame_idx = rendered_frames
+        if source_points is not None:
+            # The track stage may already be frames ahead: project with this frame's corners
+            transformer.set_source_points(source_points)
+
+        # Transform every foot position (bottom-center of box) to Map Coordinates in one call
+        boxes = np.array([track[1:5] for track in tracks], dtype=np.int32).reshape(-1, 4)
+        feet = np.stack([(boxes[:, 0] + boxes[:, 2]) // 2, boxes[:, 3]], axis=1)
+        map_coords = transformer.transform_points(feet)
+        # Stored and analysed with sub-pixel precision; truncated like as_int=True only for drawing
+        map_points = map_coords.astype(np.int32).tolist()
+
+        # ID Cleaning Logic (new raw IDs are re-identified first with --reid)
+        clean_ids = id_mapper.assign(frame_idx, [track[0] for track in tracks], frame, boxes, map_coords)
+        for player_id in id_mapper.pop_forgotten():
+            trajectories.release(player_id)
+
+        # Update trajectories of every player in this frame
+        trajectories.append(frame_idx, clean_ids, map_coords, [track[5] for track in tracks])
+        if analytics is not None:
+            analytics.update(frame_idx, clean_ids, map_coords)
+        record = {
+            "frame": frame_idx,
+            "tracks": [[clean_id, int(track[1]), int(track[2]), int(track[3]), int(track[4]),
+                        round(float(track[5]), 3)] for track, clean_id in zip(tracks, clean_ids)],
+        }
+        rendered_frames += 1
+
+        if compositor is None:
+            return None, record
+
+        # Video on the left of a pooled output frame, boxes drawn in place
+        canvas = compositor.acquire()
+        np.copyto(canvas.video, frame)
+        draw_tracks(canvas.video, tracks, clean_ids)
+
+        # Draw the map (new trail segments, fading trail layer, current dots) on the right
+        map_renderer.draw(clean_ids, map_points, out=canvas.map)
+        return canvas, record
+
+    def encode_stage(rendered):
+        """Encode stage: hands a batch of frames to the writer. Returns False to stop."""
+        for canvas, record in rendered:
+            if not encode_frame(canvas, record):
+                return False
+        return True
+
+    def encode_frame(canvas, record):
+        """Queue one frame for the sinks, refresh the preview and report progress. Returns False to stop."""
+        nonlocal frame_count
         frame_count += 1
         
         # Progress indicator (every 30 frames)
         if frame_count % 30 == 0:
             progress = (frame_count / total_frames) * 100 if total_frames > 0 else 0
-            print(f"\rProgress: {frame_count}/{total_frames} ({progress:.1f}%) | Players tracked: {len(id_map)}", end="")
+            print(f"\rProgress: {frame_count}/{total_frames} ({progress:.1f}%) | Players tracked: {len(id_mapper)}", end="")
 
-        # 2. Reset the map for this frame (Crucial Step!)
-        pitch_map = bg_img.copy()
+        writer.write(canvas, record)
 
-        # 3. Track Players
-        tracks = tracker.track_frame(frame)
-        
-        # 4. Filter tracks to only include players inside the pitch boundary
-        tracks = boundary_filter.filter_tracks(tracks)
-
-        for track in tracks:
-            # New format: [id, x1, y1, x2, y2, confidence]
-            raw_id, x1, y1, x2, y2 = track[0], track[1], track[2], track[3], track[4]
-            
-            # ID Cleaning Logic
-            if raw_id not in id_map:
-                id_map[raw_id] = next_id
-                next_id += 1
-            clean_id = id_map[raw_id]
-            
-            # Draw Box on Video
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(frame, f"ID: {clean_id}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-            
-            # Transform to Map Coordinates
-            foot_x = int((x1 + x2) / 2)
-            foot_y = int(y2)
-            map_x, map_y = transformer.transform_point((foot_x, foot_y))
-            
-            # Update trajectory for this player
-            if clean_id not in trajectories:
-                trajectories[clean_id] = []
-            trajectories[clean_id].append((map_x, map_y))
-            
-            # Limit trajectory length
-            if len(trajectories[clean_id]) > max_trajectory_length:
-                trajectories[clean_id].pop(0)
-            
-            # Draw trajectory path (fading effect)
-            if len(trajectories[clean_id]) > 1:
-                points = np.array(trajectories[clean_id], dtype=np.int32)
-                # Generate a unique, visible color for each player using HSV
-                # This ensures colors are always bright and distinguishable
-                hue = (clean_id * 45) % 180  # Spread hues evenly
-                # Create HSV color and convert to BGR
-                hsv_color = np.uint8([[[hue, 255, 230]]])  # Full saturation, high value
-                bgr_color = cv2.cvtColor(hsv_color, cv2.COLOR_HSV2BGR)[0][0]
-                color = (int(bgr_color[0]), int(bgr_color[1]), int(bgr_color[2]))
-                
-                # Draw trajectory line connecting all points
-                for i in range(1, len(points)):
-                    # Fade older points (lighter color for older segments)
-                    alpha = i / len(points)
-                    faded_color = tuple(int(c * (0.3 + 0.7 * alpha)) for c in color)
-                    cv2.line(pitch_map, tuple(points[i-1]), tuple(points[i]), faded_color, 2)
-            
-            # Draw Red Dot on Map (current position)
-            cv2.circle(pitch_map, (map_x, map_y), 8, (0, 0, 255), -1) 
-            cv2.circle(pitch_map, (map_x, map_y), 9, (255, 255, 255), 1) # White border
-            cv2.putText(pitch_map, str(clean_id), (map_x + 10, map_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-
-        # 4. Combine Video + Map side-by-side
-        final_frame = np.zeros((max(height, map_height), out_width, 3), dtype=np.uint8)
-        
-        # Paste Video
-        final_frame[:height, :width] = frame
-        
-        # Paste Map
-        final_frame[:map_height, width:] = pitch_map
+        if preview is None:
+            return True
+        with instrumentation.stage("display"):
+            return preview.show()
 
-        out.write(final_frame)
-        
-        # Smart Resize for Display (Fits screen)
-        scale_percent = 50 
-        new_width = int(final_frame.shape[1] * scale_percent / 100)
-        new_height = int(final_frame.shape[0] * scale_percent / 100)
-        display_frame = cv2.resize(final_frame, (new_width, new_height))
-        
-        cv2.imshow("Cricket Tracking + Real Map", display_frame)
+    if args.stream:
+        # Live mode: the reader thread keeps draining the source, late frames are
+        # dropped or only predicted; track records carry the source frame index
+        processor = StreamProcessor(source, tracker, latency_budget=args.latency_budget,
+                                    policy=args.drop_policy, buffer_size=args.stream_buffer)
+        if not processor.drop:
+            print("Input is a file read at full speed: every frame is tracked, --drop-policy only "
+                  "applies to live sources (use --realtime to pace the file like a camera)")
+        for item in processor:
+            points = follow_camera(item.frame, item.tracks)
+            tracks = boundary_filter.filter_tracks(item.tracks)
+            with instrumentation.stage("render"):
+                canvas, record = render_frame(item.frame, tracks, item.index, points)
+            record.update(lag_ms=round(1000 * item.lag, 1), detected=item.detected)
+            if not encode_frame(canvas, record):
+                processor.stop()
+        stats = processor.stats()
+        print(f"\nStream: {stats['frames_processed']}/{stats['frames_read']} frames processed, "
+              f"{stats['frames_dropped']} dropped, {stats['detections_skipped']} without detection, "
+              f"lag mean {stats['mean_lag_ms']:.0f} ms / max {stats['max_lag_ms']:.0f} ms")
+    elif args.sequential:
+        # One step at a time (useful for debugging and as a speed baseline)
+        for frames in read_frames():
+            if not encode_stage(render_stage(track_stage(frames))):
+                break
+    else:
+        engine = StagedPipeline(
+            read_frames(),
+            [Stage("track", track_stage), Stage("render", render_stage)],
+            queue_size=args.queue_size,
+        )
+        engine.run(encode_stage)
+        print("\n" + engine.format_report())
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    if scene_gate is not None:
+        stats = scene_gate.stats()
+        print(f"\nScene gate: {stats['cuts']} cuts, {stats['skipped_frames']} of {stats['frames']} frames "
+              f"skipped as non-pitch shots")
+
+    if camera_tracker is not None:
+        stats = camera_tracker.stats()
+        print(f"\nCamera tracking: {stats['reestimates']} full re-estimates in {stats['frames']} frames")
+
+    adaptive = tracker.tracker if isinstance(tracker, SceneGatedTracker) else tracker
+    if isinstance(adaptive, AdaptiveStrideTracker):
+        stats = adaptive.stats()
+        print(f"\nAdaptive stride: {stats['detector_calls']} detector calls for {stats['frames']} frames "
+              f"({stats['calls_per_frame']:.2f} per frame)")
+
+    if cache_writer is not None:
+        cache_writer.close(complete=stream_finished and tracked_frames == decoded_frames)
 
-    cap.release()
-    out.release()
+    if cap is not None:
+        cap.release()
+    # Flush the frames still queued for the sinks
+    writer.close()
     cv2.destroyAllWindows()
     print(f"\n\nDone! Processed {frame_count} frames.")
-    print(f"Total unique players tracked: {len(id_map)}")
-    print(f"Video saved to: {output_video_path}")
+    print(f"Total unique players tracked: {len(id_mapper)}")
+    if id_mapper.gallery is not None:
+        print(f"Re-identified after an ID change: {id_mapper.gallery.matches}")
+    if not args.no_video:
+        print(f"Video saved to: {output_video_path}")
+    if args.tracks_out and args.tracks_out != "-":
+        print(f"Tracks saved to: {args.tracks_out}")
+
+    if args.trajectories:
+        trajectories.save_npz(args.trajectories)
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        print(f"Trajectories saved to: {args.trajectories}")
+
+    if analytics is not None:
+        results = analytics.results()
+        with open(args.analytics, "w") as f:
+            json.dump({"fps": analytics.fps, "field_size": list(args.field_size),
+                       "players": summary_records(results)}, f, indent=2)
+        heatmap_path = os.path.splitext(args.analytics)[0] + "_heatmaps.npz"
+        save_heatmaps(heatmap_path, results, pitch_geometry)
+        print(f"Player analytics saved to: {args.analytics} (heatmaps: {heatmap_path})")
+
+    if instrumentation.enabled:
+        instrumentation.write_snapshot()
+        print("\n" + instrumentation.format_summary())
+        print(f"Stage metrics saved to: {args.metrics}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
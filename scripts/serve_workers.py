@@ -0,0 +1,86 @@
+"""
+Start the job server and a pool of warm tracking workers.
+
+Every worker loads and warms the model once, then takes clips from the
+shared job queue until the server is stopped (Ctrl+C). More workers can
+join the same queue from another shell with --join.
+
+Usage:
+    python scripts/serve_workers.py --workers 2 --threads 4
+    python scripts/serve_workers.py --join --workers 1            # add workers to a running server
+    python scripts/submit_jobs.py data/clip_01.mp4 data/clip_02.mp4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+
+# Add parent directory to path so we can import from pipeline folder
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.backends import BACKENDS
+from pipeline.service import AUTHKEY_ENV, DEFAULT_ADDRESS, DEFAULT_AUTHKEY_FILE, connect, load_authkey, run_worker, start_server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve tracking jobs with warm model workers.")
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0], help="Job server address")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1], help="Job server port")
+    parser.add_argument("--authkey", default=None,
+                        help=f"Shared secret of the job server (default: $CRICKET_AUTHKEY or {DEFAULT_AUTHKEY_FILE}, "
+                             "generated on first start)")
+    parser.add_argument("--join", action="store_true",
+                        help="Only start workers for an already running job server")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (each loads the model once)")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads per worker")
+    parser.add_argument("--model", default="yolov8s.pt", help="Weights or exported model")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Inference backend")
+    parser.add_argument("--batch-size", type=int, default=1, help="Frames per detector call")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    address = (args.host, args.port)
+    try:
+        authkey = load_authkey(args.authkey, create=not args.join)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    manager = None
+    if not args.join:
+        manager = start_server(address, authkey)
+        print(f"Job server listening on {args.host}:{args.port}")
+        # Clients on this machine read the key file; remote ones need the key itself
+        print(f"Auth key: {authkey.decode()} (clients: --authkey, ${AUTHKEY_ENV} or {DEFAULT_AUTHKEY_FILE})")
+
+    worker_config = dict(model_path=args.model, backend=args.backend, batch_size=args.batch_size)
+    # Spawned (not forked) so each worker initialises torch / OpenCV threads itself
+    context = mp.get_context("spawn")
+    workers = [context.Process(target=run_worker, args=(address, authkey, args.threads),
+                               kwargs=worker_config, name=f"worker-{i}")
+               for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    print(f"Started {len(workers)} worker(s); Ctrl+C to stop")
+
+    try:
+        while any(worker.is_alive() for worker in workers):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("\nStopping workers...")
+        # One stop marker per worker; each finishes its current clip first
+        jobs = connect(address, authkey).jobs()
+        for _ in workers:
+            jobs.put(None)
+    finally:
+        for worker in workers:
+            worker.join()
+        if manager is not None:
+            manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Submit clips to the warm worker service and wait for the results.
+
+Usage:
+    python scripts/submit_jobs.py data/clip_01.mp4 data/clip_02.mp4 \
+        --points 255,140,1890,145,2050,980,120,980 --output-dir output/clips
+"""
+import argparse
+import json
+import os
+import sys
+
+# Add parent directory to path so we can import from pipeline folder
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pipeline.service import DEFAULT_ADDRESS, DEFAULT_AUTHKEY_FILE, connect, load_authkey, make_job, submit, wait_result
+
+# Same default calibration as run_pipeline.py
+DEFAULT_POINTS = "255,140,1890,145,2050,980,120,980"
+
+
+def parse_points(text):
+    values = [int(v) for v in text.split(",")]
+    if len(values) != 8:
+        raise argparse.ArgumentTypeError("--points needs 8 comma-separated values (4 x,y corners)")
+    return [values[i:i + 2] for i in range(0, 8, 2)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Submit tracking jobs to the worker service.")
+    parser.add_argument("videos", nargs="+", help="Video paths (as seen by the workers)")
+    parser.add_argument("--points", type=parse_points, default=parse_points(DEFAULT_POINTS),
+                        help="Calibration points x1,y1,...,x4,y4 (Top-Left, Top-Right, Bottom-Right, Bottom-Left)")
+    parser.add_argument("--output-dir", default="output", help="Directory for the output files")
+    parser.add_argument("--no-video", action="store_true", help="Only write tracks and trajectories")
+    parser.add_argument("--tracks-format", choices=("csv", "jsonl"), default="csv", help="Track file format")
+    parser.add_argument("--expand-ratio", type=float, default=0.15, help="Boundary expansion")
+    parser.add_argument("--roi", action="store_true", help="Run detection on the pitch ROI crop only")
+    parser.add_argument("--reid", action="store_true", help="Re-identify players after ID changes")
+    parser.add_argument("--tiles", action="store_true", help="Tiled inference planned from the calibration")
+    parser.add_argument("--map-image", default=None, help="Ground image for the map (as seen by the workers)")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds to wait for each result")
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0], help="Job server address")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1], help="Job server port")
+    parser.add_argument("--authkey", default=None,
+                        help=f"Shared secret of the job server (default: $CRICKET_AUTHKEY or {DEFAULT_AUTHKEY_FILE})")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        authkey = load_authkey(args.authkey)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    manager = connect((args.host, args.port), authkey)
+
+    job_ids = []
+    for video in args.videos:
+        job = make_job(os.path.abspath(video), args.points, os.path.abspath(args.output_dir),
+                       expand_ratio=args.expand_ratio, roi=args.roi,
+                       output_video=not args.no_video, tracks_format=args.tracks_format, reid=args.reid,
+                       tiles={} if args.tiles else None,
+                       map_image=os.path.abspath(args.map_image) if args.map_image else None)
+        job_ids.append(submit(manager, job))
+    print(f"Submitted {len(job_ids)} job(s)")
+
+    failed = 0
+    for job_id in job_ids:
+        result = wait_result(manager, job_id, timeout=args.timeout)
+        failed += result["status"] != "ok"
+        print(json.dumps(result))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()